@@ -3,6 +3,9 @@ from datetime import datetime
 import re
 from typing import Tuple
 from backend.db import users, db
+from backend.partitioning import partition_hash
+from backend.projections import ID_VIEW, PROFILE_VIEW
+from backend.nextDue import refresh_next_due_at
 
 # DBsaving.py
 # works on creating and updating users based on form submissions. this includes medicine and caregivers.
@@ -138,6 +141,7 @@ def setup_user():
         'phone': data['phone'],
         'medications': data['medications'],
         'caregivers': data.get('caregivers', []),
+        'partition_hash': partition_hash(data['phone']),  # picks the scheduler worker that owns this user
         'updated_at': datetime.utcnow()
     }
     # Use update_one with upsert to handle both new and existing users
@@ -149,8 +153,10 @@ def setup_user():
         },
         upsert=True  # Create if doesn't exist, update if exists
     )
+    # keeps the scheduler's indexed next_due_at and next_missed_check_at in step with the new schedule
+    refresh_next_due_at({'phone': data['phone']})
     # Get the user to return the correct ID
-    user = users.find_one({'phone': data['phone']})
+    user = users.find_one({'phone': data['phone']}, ID_VIEW)
     mongo_id = str(user['_id']) if user else None
     
     print(f"User {'updated' if result.matched_count > 0 else 'created'}: {data['phone']}")
@@ -161,7 +167,7 @@ def setup_user():
 @user_setup_bp.route('/api/user/<user_id>', methods=['GET'])
 def get_user(user_id):
     """Get user information by custom user_id"""
-    user = users.find_one({'user_id': user_id})
+    user = users.find_one({'user_id': user_id}, PROFILE_VIEW)
     if not user:
         return jsonify({'error': 'User not found'})
     
@@ -186,6 +192,8 @@ def update_medications(user_id):
     # check if user was actually found
     if result.matched_count == 0:
         return jsonify({'error': 'User not found'})
+
+    refresh_next_due_at({'user_id': user_id})
     
     return jsonify({'success': True})
 
@@ -202,5 +210,8 @@ def update_caregivers(user_id):
     
     if result.matched_count == 0:
         return jsonify({'error': 'User not found'})
+
+    # who gets told about missed doses decides when the scheduler next checks
+    refresh_next_due_at({'user_id': user_id})
     
     return jsonify({'success': True})
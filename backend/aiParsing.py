@@ -1,22 +1,326 @@
 import os
 import json
 import re
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from backend.loggingStack import WEEKDAY_ALIASES
+from backend.metrics import REGISTRY
+from backend.notifications import _str_to_bool
+from backend.parseCache import AI_PARSE_CACHE_ENABLED, parse_cache
 #this is tackling the logic of user simply typing edit
 # sarah will type edit : vitamin a 8 am thursday or i will take vitamin a on thursday at 8 00 and ai will 
 # parse the data into a strucuted json output. 
 
 load_dotenv()
 #basic layout: ai response just like normal , then becomes json, check if broken format, make data look the same which will help our other logic and return the data which will go to DB 
-ai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=30)
+# the openai package is slow to import, so the client is built on the first parse instead of at startup
+ai_client = None
+
+
+def _get_ai_client():
+    global ai_client
+    if ai_client is None:
+        from openai import OpenAI
+        ai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=30)
+    return ai_client
+
+
+# most edit/add texts are just "<name> <time(s)> [day]", which the rule parser
+# below reads in microseconds; only messages it is not sure about go to the model
+RULE_PARSE_ENABLED = _str_to_bool(os.getenv("AI_RULE_PARSE", "true"))
+MAX_NAME_WORDS = 4
+
+PARSES = REGISTRY.counter(
+    "ai_parse_requests_total", "Medicine parses by the path that answered them.", ["path"]
+)
+PARSE_DURATION = REGISTRY.histogram(
+    "ai_parse_duration_seconds", "Time to parse an edit/add message.", ["path"]
+)
+MODEL_ANSWERS = REGISTRY.counter(
+    "ai_parse_model_answers_total",
+    "Model answers by format: plain json, json recovered from surrounding text, or none.",
+    ["format"],
+)
+
+_TIME_TOKEN = re.compile(r"^(\d{1,2})(?::([0-5]\d))?(am|pm|a\.m\.|p\.m\.)?$")
+_TIME_TEXT = re.compile(r"^(\d{1,2})(?::([0-5]\d))?\s*(am|pm|a\.m\.|p\.m\.)?$")
+_CLOCK_TIME = re.compile(r"^\d{2}:\d{2}$")
+_MERIDIEM = {"am": "am", "a.m.": "am", "pm": "pm", "p.m.": "pm"}
+_FILLER_WORDS = {"at", "@", "on", "and", "every", "daily", "everyday"}
+# words that mean a sentence rather than "<name> <time>", left to the model
+_SENTENCE_WORDS = {
+    "i", "me", "my", "take", "taking", "remind", "please", "change", "to", "from", "instead",
+    "of", "the", "in", "for", "tomorrow", "today", "tonight", "morning", "afternoon",
+    "evening", "night", "noon", "midnight", "not", "no", "after", "before", "with",
+}
+_NAME_TOKEN = re.compile(r"^[a-z0-9][a-z0-9\-\.'/+]*$")
+
+
+def _clock(hour, minute, meridiem):
+    """24h "HH:MM", the format the logging stack and the setup form use, or None if out of range."""
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if _MERIDIEM[meridiem] == "pm" else 0)
+    elif hour > 23:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def canonicalTime(time_str):
+    """'8 am', '8:30 P.M.' or '16:30' as "HH:MM"; anything else is returned stripped and lowercased."""
+    text = time_str.strip().lower()
+    match = _TIME_TEXT.match(text)
+    return (match and _clock(*match.groups())) or text
+
+
+def _is_clock_time(value):
+    """True for a time canonicalTime turns into "HH:MM"; "morning" or "with dinner" are not."""
+    return isinstance(value, str) and bool(_CLOCK_TIME.match(canonicalTime(value)))
+
+
+def _read_time(tokens, index):
+    """Returns (time string, tokens used) for a time at tokens[index], or (None, 0)."""
+    match = _TIME_TOKEN.match(tokens[index])
+    if not match:
+        return None, 0
+    hour, minute, meridiem = match.groups()
+    used = 1
+    if meridiem is None and index + 1 < len(tokens) and tokens[index + 1] in _MERIDIEM:
+        meridiem = tokens[index + 1]
+        used = 2
+    # a bare "8" could be a dose or a time; only 24h clock times are taken without am/pm
+    if meridiem is None and minute is None:
+        return None, 0
+    time_str = _clock(hour, minute, meridiem)
+    return (time_str, used) if time_str else (None, 0)
+
+
+def ruleParseMedicine(message_text):
+    """
+    Reads the common "<medicine name> <time> [<time> ...] [day]" messages, e.g.
+    "vitamin d 8 am monday" or "metformin 8am and 8pm", without the model.
+    Returns the aiParseMedicine dict (with every time under "times" as well),
+    or None when the message does not clearly follow that grammar.
+    """
+    tokens = message_text.strip().lower().replace(",", " ").split()
+    name_runs = [[]]
+    times = []
+    days = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        time_str, used = _read_time(tokens, index)
+        if time_str:
+            times.append(time_str)
+            name_runs.append([])
+            index += used
+            continue
+        day = token[:-1] if token.endswith("s") and token[:-1] in WEEKDAY_ALIASES else token
+        if day in WEEKDAY_ALIASES:
+            days.append(day)
+            name_runs.append([])
+        elif token in _FILLER_WORDS:
+            name_runs.append([])
+        elif token in _SENTENCE_WORDS or not _NAME_TOKEN.match(token):
+            return None
+        else:
+            name_runs[-1].append(token)
+        index += 1
+
+    name_runs = [run for run in name_runs if run]
+    # exactly one name, at least one time, at most one day
+    if len(name_runs) != 1 or not times or len(days) > 1:
+        return None
+    name = name_runs[0]
+    if len(name) > MAX_NAME_WORDS or not any(ch.isalpha() for ch in " ".join(name)):
+        return None
+
+    return {
+        "medicine_name": " ".join(name),
+        "time": times[0],
+        "times": list(dict.fromkeys(times)),
+        "day": days[0] if days else "",
+    }
+
 
 def aiParseMedicine(message_text):
     """
     Parses an incoming SMS message like:
     "vitamin a 8:10 pm monday"
     and returns structured JSON data for MongoDB.
+    Simple messages are read by ruleParseMedicine; the rest go to the model,
+    whose valid answers are cached by normalized text.
+    Raises ValueError when the message cannot hold both a name and a time.
     """
+    if len(message_text.split()) < 2:
+        PARSES.inc(path="rejected")
+        raise ValueError("Please include the medicine name and a time, e.g. 'aspirin 9am'.")
+
+    if RULE_PARSE_ENABLED:
+        started = time.perf_counter()
+        parsed = ruleParseMedicine(message_text)
+        if parsed is not None:
+            PARSE_DURATION.observe(time.perf_counter() - started, path="rule")
+            PARSES.inc(path="rule")
+            print("Rule-based parse:", parsed)
+            return parsed
+
+    if AI_PARSE_CACHE_ENABLED:
+        started = time.perf_counter()
+        cached = parse_cache.get(message_text)
+        if cached is not None:
+            PARSE_DURATION.observe(time.perf_counter() - started, path="cache")
+            PARSES.inc(path="cache")
+            return cached
+
+    started = time.perf_counter()
+    parsed = _llmParseMedicine(message_text)
+    PARSE_DURATION.observe(time.perf_counter() - started, path="llm")
+    PARSES.inc(path="llm")
+    if not _is_valid_parse(parsed):
+        return None
+    if AI_PARSE_CACHE_ENABLED:
+        parse_cache.put(message_text, parsed)
+    return parsed
+
+
+def _is_valid_parse(parsed):
+    """Only complete answers with clock times are used or cached; a bad parse is asked for again next time."""
+    return (
+        isinstance(parsed, dict)
+        and isinstance(parsed.get("medicine_name"), str) and parsed["medicine_name"].strip() != ""
+        and _is_clock_time(parsed.get("time"))
+        and all(_is_clock_time(t) for t in parsed.get("times") or [])
+        and (parsed.get("day") is None or isinstance(parsed.get("day"), str))
+    )
+
+
+def aiParseMedicines(message_text):
+    """
+    Parses a message that may name several medicines, e.g.
+    "metformin 8am and 8pm, lisinopril 9am", into a list of
+    {"medicine_name", "time", "times", "day", "days"} entries, or None.
+    Each comma separated part the rule parser can read is read locally; if
+    any part is unclear the whole message goes to the model in one call.
+    Raises ValueError when the message cannot hold both a name and a time.
+    """
+    if len(message_text.split()) < 2:
+        PARSES.inc(path="rejected")
+        raise ValueError("Please include the medicine name and a time, e.g. 'aspirin 9am'.")
+
+    if RULE_PARSE_ENABLED:
+        started = time.perf_counter()
+        entries = ruleParseMedicines(message_text)
+        if entries is not None:
+            PARSE_DURATION.observe(time.perf_counter() - started, path="rule")
+            PARSES.inc(path="rule")
+            print("Rule-based parse:", entries)
+            return entries
+
+    if AI_PARSE_CACHE_ENABLED:
+        started = time.perf_counter()
+        cached = parse_cache.get(message_text, kind="batch")
+        if cached is not None:
+            PARSE_DURATION.observe(time.perf_counter() - started, path="cache")
+            PARSES.inc(path="cache")
+            return cached["medications"]
+
+    started = time.perf_counter()
+    entries = _llmParseMedicines(message_text)
+    PARSE_DURATION.observe(time.perf_counter() - started, path="llm")
+    PARSES.inc(path="llm")
+    if AI_PARSE_CACHE_ENABLED and entries:
+        parse_cache.put(message_text, {"medications": entries}, kind="batch")
+    return entries
+
+
+def _withDays(parsed):
+    parsed["days"] = [parsed["day"]] if parsed.get("day") else []
+    return parsed
+
+
+def ruleParseMedicines(message_text):
+    whole = ruleParseMedicine(message_text)
+    if whole is not None:
+        return [_withDays(whole)]
+    parts = [part for part in re.split(r"[,;]", message_text) if part.strip()]
+    if len(parts) < 2:
+        return None
+    entries = []
+    for part in parts:
+        parsed = ruleParseMedicine(part)
+        if parsed is None:
+            return None
+        entries.append(_withDays(parsed))
+    return entries
+
+
+def _cleanList(value):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        return None
+    return list(dict.fromkeys(item.strip().lower() for item in value if item.strip()))
+
+
+def _llmParseMedicines(message_text):
+    prompt = (
+        "You are an intelligent assistant that extracts medicine reminder details "
+        "from user SMS messages. A message names one or more medicines, each with "
+        "one or more times and optionally days of the week.\n\n"
+        "Return ONLY a valid JSON object in the format:\n"
+        "{\n"
+        '  "medications": [\n'
+        '    {"medicine_name": "<string>", "times": ["<string>", ...], "days": ["<string>", ...]}\n'
+        "  ]\n"
+        "}\n\n"
+        "Examples:\n"
+        '"Vitamin D 10 pm" → {"medications": [{"medicine_name": "vitamin d", "times": ["10 pm"], "days": []}]}\n'
+        '"metformin 8am and 8pm, lisinopril 9am monday" → {"medications": ['
+        '{"medicine_name": "metformin", "times": ["8am", "8pm"], "days": []}, '
+        '{"medicine_name": "lisinopril", "times": ["9am"], "days": ["monday"]}]}\n\n'
+        f"Message:\n{message_text}"
+    )
+    try:
+        parsedResponse = _askModel(prompt, max_tokens=400)
+    except Exception as err:
+        print("Error in ai_parse_medicines:", str(err))
+        return None
+
+    medications = parsedResponse.get("medications") if isinstance(parsedResponse, dict) else None
+    if not isinstance(medications, list) or not medications:
+        print("AI response has no medications list.")
+        return None
+
+    # one bad entry rejects the batch, so a message is never applied half way
+    entries = []
+    for item in medications:
+        if not isinstance(item, dict):
+            return None
+        name = item.get("medicine_name")
+        times = _cleanList(item.get("times", item.get("time")))
+        times = times and list(dict.fromkeys(canonicalTime(t) for t in times))
+        days = _cleanList(item.get("days", item.get("day")) or [])
+        if (not isinstance(name, str) or not name.strip() or not times
+                or not all(_is_clock_time(t) for t in times) or days is None):
+            print("Invalid medication entry:", item)
+            return None
+        entries.append({
+            "medicine_name": name.strip().lower(),
+            "time": times[0],
+            "times": times,
+            "day": days[0] if days else "",
+            "days": days,
+        })
+
+    print("Final parsed data:", entries)
+    return entries
+
+
+def _llmParseMedicine(message_text):
 #this is giving ai the prompt to follow when structuring the data. 
     prompt = (
         "You are an intelligent assistant that extracts medicine reminder details "
@@ -33,39 +337,10 @@ def aiParseMedicine(message_text):
         '"Tylenol 8 am Monday" → {"medicine_name": "tylenol", "time": "8 am", "day": "monday"}\n\n'
         f"Message:\n{message_text}"
     )
-#we will be using 40 mini because its better and cheaper and the precision given is 0.2 which will help control any inconsistency and error.  
     try:
-    
-        response = ai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a precise data extraction AI. Return valid JSON only."}, # rules given to the model. 
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-            max_tokens=200
-        )
-
-        textResponse = response.choices[0].message.content
-        print("Raw AI response:", textResponse)
-
-        parsedResponse = None
-        try:
-            parsedResponse = json.loads(textResponse)
-        except json.JSONDecodeError:
-            print("Initial JSON parse failed. Attempting recovery...")
-            #if ai has failed to given the output in json format then the pattern matching will help us require the format in json structure. 
-            match = re.search(r'\{[\s\S]*\}', textResponse)
-            if match:
-                try:
-                    parsedResponse = json.loads(match.group())
-                    print("Recovered JSON from regex match")
-                except json.JSONDecodeError:
-                    print("Recovery attempt failed.")
-                    return None
-            else:
-                print("No JSON structure found.")
-                return None
+        parsedResponse = _askModel(prompt)
+        if parsedResponse is None:
+            return None
 
         if not isinstance(parsedResponse, dict):
             print("AI response is not a JSON object.")
@@ -81,7 +356,7 @@ def aiParseMedicine(message_text):
             parsedResponse["medicine_name"] = parsedResponse["medicine_name"].strip().lower()
         
         if parsedResponse["time"] and isinstance(parsedResponse["time"], str):
-            parsedResponse["time"] = parsedResponse["time"].strip().lower()
+            parsedResponse["time"] = canonicalTime(parsedResponse["time"])
         
         if parsedResponse["day"] is not None and isinstance(parsedResponse["day"], str):
             parsedResponse["day"] = parsedResponse["day"].strip().lower()
@@ -92,3 +367,42 @@ def aiParseMedicine(message_text):
     except Exception as err:
         print("Error in ai_parse_medicine_message:", str(err))
         return None
+
+
+def _askModel(prompt, max_tokens=200):
+    """Sends one extraction prompt and returns the JSON in the answer, or None if there is none."""
+#we will be using 40 mini because its better and cheaper and the precision given is 0.2 which will help control any inconsistency and error.  
+    response = _get_ai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are a precise data extraction AI. Return valid JSON only."}, # rules given to the model. 
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        max_tokens=max_tokens
+    )
+
+    textResponse = response.choices[0].message.content
+    print("Raw AI response:", textResponse)
+
+    try:
+        parsed = json.loads(textResponse)
+        MODEL_ANSWERS.inc(format="json")
+        return parsed
+    except json.JSONDecodeError:
+        print("Initial JSON parse failed. Attempting recovery...")
+        #if ai has failed to given the output in json format then the pattern matching will help us require the format in json structure. 
+        match = re.search(r'\{[\s\S]*\}', textResponse)
+        if match:
+            try:
+                parsed = json.loads(match.group())
+                print("Recovered JSON from regex match")
+                MODEL_ANSWERS.inc(format="recovered")
+                return parsed
+            except json.JSONDecodeError:
+                print("Recovery attempt failed.")
+                MODEL_ANSWERS.inc(format="invalid")
+                return None
+        print("No JSON structure found.")
+        MODEL_ANSWERS.inc(format="invalid")
+        return None
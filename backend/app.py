@@ -3,11 +3,16 @@ from flask import Flask
 from flask_cors import CORS
 from backend.DBsaving import user_setup_bp
 from backend.commandLogic import textD
-from backend.scheduler import start_scheduler
+from backend.metrics import metrics_bp
+from backend.notifications import _str_to_bool
 
 # app.py
 # flask app entry point used to register the blueprint and sets up routes for the api
 # this also runs the server 
+# set RUN_SCHEDULER=false for web-only processes (the scheduler then runs in
+# backend.schedulerWorker), which keeps their cold start to the api itself.
+
+RUN_SCHEDULER = _str_to_bool(os.getenv("RUN_SCHEDULER", "true"))
 
 app = Flask(__name__)
 # CORS for production
@@ -19,8 +24,10 @@ CORS(app, origins=[
 
 app.register_blueprint(user_setup_bp)
 app.register_blueprint(textD)
+app.register_blueprint(metrics_bp)
 
-if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+if RUN_SCHEDULER and (not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    from backend.scheduler import start_scheduler
     start_scheduler(app)
 
 if __name__ == "__main__":
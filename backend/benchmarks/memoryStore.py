@@ -0,0 +1,389 @@
+import copy
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import bson
+import pytz
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+# memoryStore.py
+# small in-memory stand-in for the parts of a pymongo collection the scheduler uses,
+# so the tick benchmark can run without a mongod. it understands the query
+# operators, projections and $set paths used in backend/ and nothing more.
+# CountingCollection wraps either this or a real collection and counts documents
+# and bytes read, writes issued and round trips.
+
+_MISSING = object()
+
+
+class _Result:
+    def __init__(self, matched: int = 0, modified: int = 0, deleted: int = 0) -> None:
+        self.matched_count = matched
+        self.modified_count = modified
+        self.deleted_count = deleted
+
+
+def _to_bson_value(value: Any) -> Any:
+    """Mimics what a BSON round trip does to datetimes: naive UTC, millisecond precision."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(pytz.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: _to_bson_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_bson_value(item) for item in value]
+    return value
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(doc, dict):
+            doc = doc.get(part, _MISSING)
+        elif isinstance(doc, list) and part.isdigit():
+            index = int(part)
+            doc = doc[index] if index < len(doc) else _MISSING
+        else:
+            return _MISSING
+        if doc is _MISSING:
+            return _MISSING
+    return doc
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    target: Any = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        else:
+            target = target.setdefault(part, {})
+    last = parts[-1]
+    if isinstance(target, list):
+        target[int(last)] = value
+    else:
+        target[last] = value
+
+
+def _comparable(value: Any) -> Any:
+    return _to_bson_value(value)
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        if isinstance(condition, re.Pattern):
+            return isinstance(value, str) and bool(condition.search(value))
+        return value is not _MISSING and _comparable(value) == _comparable(condition)
+
+    for op, operand in condition.items():
+        if op == "$exists":
+            if (value is not _MISSING) != bool(operand):
+                return False
+        elif op == "$ne":
+            if value is not _MISSING and _comparable(value) == _comparable(operand):
+                return False
+        elif op == "$eq":
+            if value is _MISSING or _comparable(value) != _comparable(operand):
+                return False
+        elif op == "$in":
+            if value is _MISSING or _comparable(value) not in [_comparable(item) for item in operand]:
+                return False
+        elif op in {"$lt", "$lte", "$gt", "$gte"}:
+            if value is _MISSING or value is None:
+                return False
+            left, right = _comparable(value), _comparable(operand)
+            try:
+                ok = {
+                    "$lt": left < right,
+                    "$lte": left <= right,
+                    "$gt": left > right,
+                    "$gte": left >= right,
+                }[op]
+            except TypeError:
+                return False
+            if not ok:
+                return False
+        elif op == "$mod":
+            divisor, remainder = operand
+            if not isinstance(value, int) or value % divisor != remainder:
+                return False
+        elif op == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            if not isinstance(value, str) or not re.search(operand, value, flags):
+                return False
+        elif op == "$options":
+            continue
+        else:
+            raise NotImplementedError(f"memory store does not support {op}")
+    return True
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, branch) for branch in condition):
+                return False
+        elif "." in key and isinstance(_get_path(doc, key.split(".")[0]), list) \
+                and not key.split(".")[1].isdigit():
+            # "medications.name": match any element of the array
+            head, rest = key.split(".", 1)
+            if not any(
+                isinstance(item, dict) and _match_condition(_get_path(item, rest), condition)
+                for item in _get_path(doc, head)
+            ):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _include(doc: Any, tree: Dict[str, Any]) -> Any:
+    if isinstance(doc, list):
+        return [_include(item, tree) for item in doc if isinstance(item, dict)]
+    if not isinstance(doc, dict):
+        return doc
+    out = {}
+    for key, sub in tree.items():
+        if key not in doc:
+            continue
+        out[key] = copy.deepcopy(doc[key]) if sub is True else _include(doc[key], sub)
+    return out
+
+
+def _exclude(doc: Any, tree: Dict[str, Any]) -> Any:
+    if isinstance(doc, list):
+        return [_exclude(item, tree) if isinstance(item, dict) else item for item in doc]
+    if not isinstance(doc, dict):
+        return doc
+    out = {}
+    for key, value in doc.items():
+        sub = tree.get(key)
+        if sub is True:
+            continue
+        out[key] = copy.deepcopy(value) if sub is None else _exclude(value, sub)
+    return out
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+
+    include = any(value for key, value in projection.items() if key != "_id")
+    tree: Dict[str, Any] = {}
+    for path, flag in projection.items():
+        if path == "_id":
+            continue
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is True:
+                break
+        else:
+            node[parts[-1]] = True
+
+    if include:
+        out = _include(doc, tree)
+        if projection.get("_id", 1):
+            out["_id"] = doc["_id"]
+        return out
+
+    out = _exclude(doc, tree)
+    if projection.get("_id", 1) == 0:
+        out.pop("_id", None)
+    return out
+
+
+class _Cursor(list):
+    """List of results that also takes the cursor modifiers callers chain on find()."""
+
+    def limit(self, count: int) -> "_Cursor":
+        return _Cursor(self[:count]) if count else self
+
+    def sort(self, keys: List[Tuple[str, int]]) -> "_Cursor":
+        # missing and null sort first, as in mongo
+        ordered = list(self)
+        for field, direction in reversed(keys):
+            present = [doc for doc in ordered if _get_path(doc, field) not in (_MISSING, None)]
+            absent = [doc for doc in ordered if _get_path(doc, field) in (_MISSING, None)]
+            present.sort(key=lambda doc: _comparable(_get_path(doc, field)), reverse=direction < 0)
+            ordered = absent + present if direction > 0 else present + absent
+        return _Cursor(ordered)
+
+
+class MemoryCollection:
+    """Dict-backed collection keyed by _id."""
+
+    def __init__(self) -> None:
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+
+    def insert_many(self, docs: Iterable[Dict[str, Any]], ordered: bool = True):
+        errors = []
+        for index, doc in enumerate(docs):
+            doc = _to_bson_value(doc)
+            doc.setdefault("_id", bson.ObjectId())
+            if doc["_id"] in self._docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+                if ordered:
+                    break
+                continue
+            self._docs[doc["_id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    def insert_one(self, doc: Dict[str, Any]):
+        doc = _to_bson_value(doc)
+        doc.setdefault("_id", bson.ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError("duplicate key")
+        self._docs[doc["_id"]] = doc
+
+    def _iter_matching(self, query: Dict[str, Any]):
+        query = query or {}
+        ids = query.get("_id")
+        if isinstance(ids, dict) and "$in" in ids:
+            candidates = (self._docs[i] for i in ids["$in"] if i in self._docs)
+        elif ids is not None and not isinstance(ids, dict):
+            candidates = (self._docs[i] for i in [ids] if i in self._docs)
+        else:
+            candidates = iter(list(self._docs.values()))
+        for doc in candidates:
+            if matches(doc, query):
+                yield doc
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        return _Cursor(project(doc, projection) for doc in self._iter_matching(query or {}))
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        for doc in self._iter_matching(query or {}):
+            return project(doc, projection)
+        return None
+
+    def _apply(self, doc: Dict[str, Any], update: Dict[str, Any]) -> None:
+        for op, fields in update.items():
+            if op == "$set":
+                for path, value in fields.items():
+                    _set_path(doc, path, _to_bson_value(value))
+            elif op == "$push":
+                for path, value in fields.items():
+                    current = _get_path(doc, path)
+                    if current is _MISSING:
+                        _set_path(doc, path, [])
+                        current = _get_path(doc, path)
+                    current.append(_to_bson_value(value))
+            elif op == "$unset":
+                for path in fields:
+                    parent, _, leaf = path.rpartition(".")
+                    container = _get_path(doc, parent) if parent else doc
+                    if isinstance(container, dict):
+                        container.pop(leaf, None)
+            elif op == "$setOnInsert":
+                continue
+            else:
+                raise NotImplementedError(f"memory store does not support {op}")
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        for doc in self._iter_matching(query):
+            self._apply(doc, update)
+            return _Result(matched=1, modified=1)
+        if upsert:
+            doc = {key: value for key, value in query.items() if not key.startswith("$")}
+            self._apply(doc, update)
+            for path, value in update.get("$setOnInsert", {}).items():
+                _set_path(doc, path, _to_bson_value(value))
+            self.insert_one(doc)
+        return _Result()
+
+    def update_many(self, query: Dict[str, Any], update: Dict[str, Any]):
+        count = 0
+        for doc in list(self._iter_matching(query)):
+            self._apply(doc, update)
+            count += 1
+        return _Result(matched=count, modified=count)
+
+    def bulk_write(self, ops: List[Any], ordered: bool = True):
+        matched = 0
+        for op in ops:
+            result = self.update_one(op._filter, op._doc)
+            matched += result.matched_count
+        return _Result(matched=matched, modified=matched)
+
+    def delete_one(self, query: Dict[str, Any]):
+        for doc in self._iter_matching(query):
+            del self._docs[doc["_id"]]
+            return _Result(deleted=1)
+        return _Result()
+
+    def delete_many(self, query: Dict[str, Any]):
+        doomed = [doc["_id"] for doc in self._iter_matching(query)]
+        for doc_id in doomed:
+            del self._docs[doc_id]
+        return _Result(deleted=len(doomed))
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        return sum(1 for _ in self._iter_matching(query))
+
+    def create_index(self, *args, **kwargs) -> str:
+        return "memory"
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("change streams are not available in the memory store")
+
+    def drop(self) -> None:
+        self._docs = {}
+
+
+class CountingCollection:
+    """Wraps a collection and counts reads, bytes, writes and round trips."""
+
+    def __init__(self, inner) -> None:
+        self._inner = inner
+        self.reset()
+
+    def reset(self) -> None:
+        self.docs_read = 0
+        self.bytes_read = 0
+        self.writes = 0
+        self.round_trips = 0
+
+    def _count_docs(self, docs):
+        for doc in docs:
+            self.docs_read += 1
+            self.bytes_read += len(bson.encode(doc))
+            yield doc
+
+    def find(self, *args, **kwargs):
+        self.round_trips += 1
+        return self._count_docs(self._inner.find(*args, **kwargs))
+
+    def find_one(self, *args, **kwargs):
+        self.round_trips += 1
+        doc = self._inner.find_one(*args, **kwargs)
+        if doc is not None:
+            list(self._count_docs([doc]))
+        return doc
+
+    def bulk_write(self, ops, *args, **kwargs):
+        self.round_trips += 1
+        self.writes += len(ops)
+        return self._inner.bulk_write(ops, *args, **kwargs)
+
+    def insert_many(self, docs, *args, **kwargs):
+        docs = list(docs)
+        self.round_trips += 1
+        self.writes += len(docs)
+        return self._inner.insert_many(docs, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._inner, name)
+        if name in {"update_one", "update_many", "delete_one", "delete_many", "insert_one"}:
+            def counted(*args, **kwargs):
+                self.round_trips += 1
+                self.writes += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from backend.benchmarks.parseCorpus import generate_corpus
+from backend.benchmarks.twilioStandIn import parse_latency
+from backend.parseCache import normalize_text
+
+# openaiStandIn.py
+# local stand-in for the openai chat completions endpoint, so the parser chain
+# can be benchmarked and regression tested offline. it answers from a table of
+# expected parses (an oracle built from the corpus), or with a canned answer for
+# messages it does not know, and can be told to wrap answers in prose (which
+# exercises the regex recovery path), answer with no json at all, or fail.
+# point the client at it with
+#   OPENAI_BASE_URL=http://127.0.0.1:8098/v1 OPENAI_API_KEY=x ...
+# and start it with for example
+#   python -m backend.benchmarks.openaiStandIn --latency lognormal:400,0.4 --malformed-rate 0.1
+# GET /stats returns counters, POST /stats/reset clears them.
+
+COMPLETIONS_PATH = "/v1/chat/completions"
+MESSAGE_MARKER = "Message:\n"
+UNKNOWN_ANSWER = {"medicine_name": None, "time": None, "day": None}
+
+
+def _single_answer(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    entry = entries[0]
+    return {"medicine_name": entry["medicine_name"], "time": entry["times"][0], "day": entry["day"] or None}
+
+
+def _batch_answer(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"medications": [
+        {"medicine_name": entry["medicine_name"], "times": entry["times"],
+         "days": [entry["day"]] if entry["day"] else []}
+        for entry in entries
+    ]}
+
+
+class OpenAIStandIn:
+    """aiohttp application answering chat completion requests like the parser prompts expect."""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        answers: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        canned: Optional[str] = None,
+        malformed_rate: float = 0.0,
+        garbage_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._latency = parse_latency(latency)
+        self.answers = {normalize_text(text): entries for text, entries in (answers or {}).items()}
+        self.canned = canned
+        self.malformed_rate = malformed_rate
+        self.garbage_rate = garbage_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.reset()
+
+        self.app = web.Application()
+        self.app.router.add_post(COMPLETIONS_PATH, self._complete)
+        self.app.router.add_get("/stats", self._stats)
+        self.app.router.add_post("/stats/reset", self._reset)
+
+    def reset(self) -> None:
+        self.stats = {"received": 0, "answered": 0, "unknown": 0, "malformed": 0, "garbage": 0, "errors": 0}
+
+    def _content(self, prompt: str) -> str:
+        text = prompt.rsplit(MESSAGE_MARKER, 1)[-1]
+        entries = self.answers.get(normalize_text(text))
+        if entries is None:
+            self.stats["unknown"] += 1
+            if self.canned is not None:
+                return self.canned
+            return json.dumps(UNKNOWN_ANSWER)
+        batch = '"medications"' in prompt
+        answer = json.dumps(_batch_answer(entries) if batch else _single_answer(entries))
+
+        roll = self._rng.random()
+        if roll < self.garbage_rate:
+            self.stats["garbage"] += 1
+            return "Sorry, I could not find a medicine and a time in that message."
+        if roll < self.garbage_rate + self.malformed_rate:
+            self.stats["malformed"] += 1
+            return f"Sure! Here is the extracted data:\n```json\n{answer}\n```"
+        return answer
+
+    async def _complete(self, request: web.Request) -> web.Response:
+        self.stats["received"] += 1
+        payload = await request.json()
+        await asyncio.sleep(self._latency(self._rng))
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response(
+                {"error": {"message": "The server had an error while processing your request.",
+                           "type": "server_error", "code": None}},
+                status=500,
+            )
+
+        prompt = next((m.get("content", "") for m in reversed(payload.get("messages", []))
+                       if m.get("role") == "user"), "")
+        content = self._content(prompt)
+        self.stats["answered"] += 1
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                      "total_tokens": len(prompt.split()) + len(content.split())},
+        })
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def _reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response(self.stats)
+
+
+def corpus_answers(count: int, seed: int) -> Dict[str, List[Dict[str, Any]]]:
+    """The oracle table for a generated corpus: message text -> expected entries."""
+    return {item["text"]: item["expected"] for item in generate_corpus(count, seed=seed)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local OpenAI chat completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:MS, uniform:LOW-HIGH or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--corpus", type=int, default=3000,
+                        help="answer the messages of a generated corpus of this size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--canned", default=None, help="raw answer for messages not in the corpus")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="share of answers wrapped in prose around the json")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="share of answers with no json")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stand_in = OpenAIStandIn(
+        latency=args.latency,
+        answers=corpus_answers(args.corpus, args.seed),
+        canned=args.canned,
+        malformed_rate=args.malformed_rate,
+        garbage_rate=args.garbage_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    web.run_app(stand_in.app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
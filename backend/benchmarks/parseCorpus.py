@@ -0,0 +1,100 @@
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+# parseCorpus.py
+# synthetic edit/add command texts with the parse we expect for each, built from
+# the phrasings users actually send: terse "<name> <time> [day]" messages in
+# every time format, sentences that need the model, and several medicines in
+# one message. expected times are "HH:MM" (24h) so any spelling of the same
+# time compares equal. generation is seeded, so a corpus is reproducible.
+
+MED_NAMES = [
+    "metformin", "lisinopril", "vitamin d", "atorvastatin", "levothyroxine", "amlodipine",
+    "omeprazole", "aspirin", "losartan", "gabapentin", "fish oil", "vitamin b12", "zoloft",
+    "ibuprofen", "tylenol", "melatonin", "baby aspirin", "prednisone", "insulin", "magnesium",
+    "sertraline", "metoprolol", "simvastatin", "vitamin c", "iron", "probiotic", "warfarin",
+]
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DAY_SPELLINGS = {day: [day, day[:3], day.capitalize()] for day in DAYS}
+
+# templates read by the rule parser
+TERSE_TEMPLATES = [
+    ("{name} {time}", False),
+    ("{name} {time} {day}", True),
+    ("{name} at {time}", False),
+    ("{name} at {time} on {day}", True),
+    ("{name} every {day} at {time}", True),
+    ("{name} {time} and {time2}", False),
+]
+# templates that read like sentences and are left to the model
+SENTENCE_TEMPLATES = [
+    ("i take {name} at {time}", False),
+    ("remind me to take {name} at {time}", False),
+    ("remind me to take {name} on {day} at {time}", True),
+    ("please change {name} to {time}", False),
+    ("i will take {name} on {day} at {time}", True),
+    ("{name} at {time} with food", False),
+]
+
+
+def _render_time(rng: random.Random, hour: int, minute: int) -> str:
+    """One of the ways people write the same time."""
+    twelve = hour % 12 or 12
+    suffix = "am" if hour < 12 else "pm"
+    choices = [f"{hour:02d}:{minute:02d}", f"{twelve}:{minute:02d}{suffix}", f"{twelve}:{minute:02d} {suffix}",
+               f"{twelve}:{minute:02d} {suffix[0]}.m.", f"{twelve}:{minute:02d}{suffix.upper()}"]
+    if minute == 0:
+        choices += [f"{twelve}{suffix}", f"{twelve} {suffix}", f"{twelve} {suffix.upper()}"]
+    return rng.choice(choices)
+
+
+def _random_time(rng: random.Random) -> Tuple[int, int]:
+    return rng.randint(5, 23), rng.choice([0, 0, 0, 15, 30, 45])
+
+
+def _entry(rng: random.Random, template: str, with_day: bool) -> Tuple[str, Dict[str, Any]]:
+    name = rng.choice(MED_NAMES)
+    times = [_random_time(rng)]
+    if "{time2}" in template:
+        times.append(_random_time(rng))
+        while times[1] == times[0]:
+            times[1] = _random_time(rng)
+    day = rng.choice(DAYS) if with_day else ""
+    text = template.format(
+        name=name.title() if rng.random() < 0.2 else name,
+        time=_render_time(rng, *times[0]),
+        time2=_render_time(rng, *times[-1]),
+        day=rng.choice(DAY_SPELLINGS[day]) if day else "",
+    )
+    expected = {"medicine_name": name, "times": [f"{h:02d}:{m:02d}" for h, m in times], "day": day}
+    return text, expected
+
+
+def generate_corpus(count: int = 3000, batch_share: float = 0.15, sentence_share: float = 0.25,
+                    seed: int = 7) -> Iterator[Dict[str, Any]]:
+    """
+    Yields {"text", "expected": [entries], "style"} items; style is "terse",
+    "sentence" or "batch" (two or three medicines in one message).
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        roll = rng.random()
+        if roll < batch_share:
+            parts: List[str] = []
+            expected: List[Dict[str, Any]] = []
+            names = set()
+            for _ in range(rng.randint(2, 3)):
+                text, entry = _entry(rng, *rng.choice(TERSE_TEMPLATES[:4]))
+                if entry["medicine_name"] in names:
+                    continue
+                names.add(entry["medicine_name"])
+                parts.append(text)
+                expected.append(entry)
+            separator = rng.choice([", ", "; ", " and "]) if len(parts) == 2 else ", "
+            yield {"text": separator.join(parts), "expected": expected, "style": "batch"}
+        elif roll < batch_share + sentence_share:
+            text, entry = _entry(rng, *rng.choice(SENTENCE_TEMPLATES))
+            yield {"text": text, "expected": [entry], "style": "sentence"}
+        else:
+            text, entry = _entry(rng, *rng.choice(TERSE_TEMPLATES))
+            yield {"text": text, "expected": [entry], "style": "terse"}
@@ -0,0 +1,194 @@
+import argparse
+import io
+import json
+import logging
+import platform
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+from backend import aiParsing
+from backend.benchmarks.openaiStandIn import OpenAIStandIn
+from backend.benchmarks.parseCorpus import generate_corpus
+from backend.benchmarks.schedulerTick import _percentile
+from backend.benchmarks.twilioStandIn import start_in_thread
+from backend.loggingStack import WEEKDAY_ALIASES
+from backend.parseCache import ParseCache
+
+# parsing.py
+# measures the edit/add parser chain (rule parser, cache, model) on a generated
+# corpus with the model served by the local openai stand-in, and prints one
+# json report with accuracy, latency per path and how often the model's answer
+# needed the regex recovery:
+#   python -m backend.benchmarks.parsing --count 3000 --latency lognormal:400,0.4 \
+#       --malformed-rate 0.1
+# --batch runs aiParseMedicines over the whole corpus (including messages with
+# several medicines), otherwise aiParseMedicine runs over the single-medicine ones.
+
+_TIME = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)?$")
+
+
+def _minutes(time_str: Any) -> Optional[int]:
+    match = _TIME.match(str(time_str or "").strip().lower())
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.startswith("p") else 0)
+    return hour * 60 + minute
+
+
+def _entry_matches(result: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    times = result.get("times") or [result.get("time")]
+    return (
+        str(result.get("medicine_name") or "").strip().lower() == expected["medicine_name"]
+        and {_minutes(t) for t in times} == {_minutes(t) for t in expected["times"]}
+        and WEEKDAY_ALIASES.get(str(result.get("day") or "").strip().lower())
+        == WEEKDAY_ALIASES.get(expected["day"])
+    )
+
+
+def matches(result: Any, expected: List[Dict[str, Any]]) -> bool:
+    """True when a parse (one dict, or a list of them) says what the corpus expects."""
+    if isinstance(result, dict):
+        result = [result]
+    if not isinstance(result, list) or len(result) != len(expected):
+        return False
+    return all(isinstance(r, dict) and _entry_matches(r, e) for r, e in zip(result, expected))
+
+
+def _parse_one(item: Dict[str, Any], batch: bool, rule_enabled: bool) -> Tuple[str, float, bool]:
+    rule = aiParsing.ruleParseMedicines if batch else aiParsing.ruleParseMedicine
+    path = "rule" if rule_enabled and rule(item["text"]) is not None else "model"
+    started = time.perf_counter()
+    try:
+        result = (aiParsing.aiParseMedicines if batch else aiParsing.aiParseMedicine)(item["text"])
+    except ValueError:
+        result = None
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    return path, elapsed_ms, matches(result, item["expected"])
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "p50": round(_percentile(values, 50), 3),
+        "p99": round(_percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from openai import OpenAI
+
+    corpus = list(generate_corpus(args.count, seed=args.seed))
+    if not args.batch:
+        corpus = [item for item in corpus if item["style"] != "batch"]
+
+    stand_in = OpenAIStandIn(
+        latency=args.latency,
+        answers={item["text"]: item["expected"] for item in corpus},
+        malformed_rate=args.malformed_rate,
+        garbage_rate=args.garbage_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    answers_before = {fmt: aiParsing.MODEL_ANSWERS.value(format=fmt) for fmt in ("json", "recovered", "invalid")}
+    outcomes: List[Tuple[str, float, bool]] = []
+
+    with ExitStack() as stack:
+        base_url, stop = start_in_thread(stand_in)
+        stack.callback(stop)
+        client = OpenAI(api_key="benchmark", base_url=f"{base_url}/v1", timeout=30, max_retries=0)
+        stack.enter_context(patch.object(aiParsing, "ai_client", client))
+        stack.enter_context(patch.object(aiParsing, "RULE_PARSE_ENABLED", not args.no_rule))
+        stack.enter_context(patch.object(aiParsing, "AI_PARSE_CACHE_ENABLED", args.cache))
+        stack.enter_context(patch.object(aiParsing, "parse_cache", ParseCache()))
+        # the parser prints every answer
+        stack.enter_context(redirect_stdout(io.StringIO()))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(lambda item: _parse_one(item, args.batch, not args.no_rule), corpus))
+        wall_seconds = time.perf_counter() - started
+
+    answers = {fmt: aiParsing.MODEL_ANSWERS.value(format=fmt) - before for fmt, before in answers_before.items()}
+    model_answers = sum(answers.values())
+
+    by_style: Dict[str, List[bool]] = {}
+    for item, (_, _, correct) in zip(corpus, outcomes):
+        by_style.setdefault(item["style"], []).append(correct)
+    paths = sorted({path for path, _, _ in outcomes})
+
+    return {
+        "messages": len(corpus),
+        "wall_seconds": round(wall_seconds, 3),
+        "accuracy": round(sum(correct for _, _, correct in outcomes) / len(outcomes), 4),
+        "accuracy_by_style": {style: round(sum(v) / len(v), 4) for style, v in sorted(by_style.items())},
+        "paths": {path: sum(1 for p, _, _ in outcomes if p == path) for path in paths},
+        "latency_ms": {
+            "all": _latency([ms for _, ms, _ in outcomes]),
+            **{path: _latency([ms for p, ms, _ in outcomes if p == path]) for path in paths},
+        },
+        "model_answers": answers,
+        "recovery_share": round(answers["recovered"] / model_answers, 4) if model_answers else 0.0,
+        "stand_in": stand_in.stats,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the edit/add parser chain offline.")
+    parser.add_argument("--count", type=int, default=3000, help="corpus size")
+    parser.add_argument("--batch", action="store_true",
+                        help="run aiParseMedicines, including messages naming several medicines")
+    parser.add_argument("--latency", default="lognormal:400,0.4",
+                        help="model latency distribution, see twilioStandIn.parse_latency")
+    parser.add_argument("--malformed-rate", type=float, default=0.05,
+                        help="share of model answers wrapped in prose (regex recovery path)")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="share of model answers with no json")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model requests failing with 500")
+    parser.add_argument("--no-rule", action="store_true", help="send every message to the model")
+    parser.add_argument("--cache", action="store_true", help="enable the in-process parse cache")
+    parser.add_argument("--concurrency", type=int, default=16, help="messages parsed at once")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write the json report here as well")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = build_parser().parse_args(argv)
+    logging.disable(logging.INFO)
+
+    report = {
+        "benchmark": "ai_parsing",
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "count": args.count,
+            "batch": args.batch,
+            "latency": args.latency,
+            "malformed_rate": args.malformed_rate,
+            "garbage_rate": args.garbage_rate,
+            "error_rate": args.error_rate,
+            "rule_parser": not args.no_rule,
+            "cache": args.cache,
+            "concurrency": args.concurrency,
+        },
+        "results": run(args),
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
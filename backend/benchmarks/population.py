@@ -0,0 +1,94 @@
+import random
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pytz
+
+from backend.partitioning import partition_hash
+from backend.scheduler import DEFAULT_TIMEZONE, compute_next_due_at, compute_next_missed_check_at
+
+# population.py
+# synthetic user documents shaped like the ones DBsaving.setup_user writes.
+# a share of the doses is placed at the current minute (in each user's timezone)
+# so a tick run right after loading sees a realistic 8 am style peak.
+
+TIMEZONES = ["US/Eastern", "US/Central", "US/Mountain", "US/Pacific", "Europe/London", "Asia/Kolkata"]
+FREQUENCIES = [("Daily", 0.6), ("Twice daily", 0.25), ("Weekly", 0.1), ("As needed", 0.05)]
+MED_NAMES = ["metformin", "lisinopril", "vitamin d", "atorvastatin", "levothyroxine", "amlodipine",
+             "omeprazole", "aspirin", "losartan", "gabapentin"]
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+NOTIFY_WHEN = ["On missed dose", "Daily summary", "Both"]
+
+
+def _pick_frequency(rng: random.Random) -> str:
+    roll = rng.random()
+    for frequency, weight in FREQUENCIES:
+        if roll < weight:
+            return frequency
+        roll -= weight
+    return FREQUENCIES[0][0]
+
+
+def _random_time(rng: random.Random) -> str:
+    return f"{rng.randint(6, 22):02d}:{rng.choice([0, 15, 30, 45]):02d}"
+
+
+def generate_users(
+    count: int,
+    meds_per_user: Sequence[int] = (1, 5),
+    caregivers_per_user: Sequence[int] = (0, 3),
+    due_now_share: float = 0.1,
+    timezones: Optional[List[str]] = None,
+    seed: int = 7,
+    now: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yields `count` user documents with mixed frequencies, timezones and caregivers."""
+    rng = random.Random(seed)
+    timezones = timezones or TIMEZONES
+    now = now or datetime.now(DEFAULT_TIMEZONE)
+    now_by_tz = {tz: now.astimezone(pytz.timezone(tz)).strftime("%H:%M") for tz in timezones}
+
+    for number in range(count):
+        phone = f"+1{5550000000 + number:010d}"
+        tz = rng.choice(timezones)
+        medications = []
+        for _ in range(rng.randint(*meds_per_user)):
+            frequency = _pick_frequency(rng)
+            times: List[str] = []
+            if frequency != "As needed":
+                first = now_by_tz[tz] if rng.random() < due_now_share else _random_time(rng)
+                times = [first]
+                if frequency == "Twice daily":
+                    times.append(_random_time(rng))
+            medications.append({
+                "name": rng.choice(MED_NAMES),
+                "dosage": f"{rng.choice([5, 10, 20, 50, 100])}mg",
+                "frequency": frequency,
+                "times": list(dict.fromkeys(times)),
+                "days": [rng.choice(DAYS)] if frequency == "Weekly" else [],
+                "status": "pending",
+            })
+
+        caregivers = [
+            {
+                "name": f"Caregiver {index}",
+                "phone": f"+1{6660000000 + rng.randint(0, count * 2):010d}",
+                "notify_when": rng.choice(NOTIFY_WHEN),
+            }
+            for index in range(rng.randint(*caregivers_per_user))
+        ]
+
+        user = {
+            "user_id": f"user_{phone[1:]}",
+            "name": f"Patient {number}",
+            "phone": phone,
+            "timezone": tz,
+            "medications": medications,
+            "caregivers": caregivers,
+            "partition_hash": partition_hash(phone),
+            "created_at": now,
+            "updated_at": now,
+        }
+        user["next_due_at"] = compute_next_due_at(user, now)
+        user["next_missed_check_at"] = compute_next_missed_check_at(user, now)
+        yield user
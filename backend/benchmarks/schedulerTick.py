@@ -0,0 +1,238 @@
+import argparse
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from flask import Flask
+
+from backend import scheduler
+from backend.benchmarks.memoryStore import CountingCollection, MemoryCollection
+from backend.benchmarks.population import generate_users
+from backend.benchmarks.twilioStandIn import TwilioStandIn, start_in_thread
+from backend.notifications import SEND_CONCURRENCY, TwilioConfig, twilio_service
+from backend.projections import INDEX_VIEW
+from backend.scheduleIndex import ScheduleIndex
+
+# schedulerTick.py
+# measures how a scheduler tick scales with the user base.
+# it loads synthetic populations into the in-memory stand-in (or a local mongod
+# with --mongo-uri), runs ticks with sends mocked out and prints one json report:
+#   python -m backend.benchmarks.schedulerTick --users 1000,10000,100000 --ticks 5
+# with --stand-in the sends go through the real notification service to a local
+# twilio stand-in (see twilioStandIn.py) instead of a counting stub.
+# compare the json between releases to catch regressions.
+
+BENCH_DB_NAME = "medication-reminder-bench"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[rank]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _collections(mongo_uri: Optional[str]):
+    if not mongo_uri:
+        return MemoryCollection(), MemoryCollection(), MemoryCollection()
+
+    from pymongo import MongoClient
+
+    db = MongoClient(mongo_uri)[BENCH_DB_NAME]
+    db["users"].drop()
+    db["dose_claims"].drop()
+    db["outbox"].drop()
+    db["users"].create_index("next_due_at")
+    db["users"].create_index("next_missed_check_at")
+    return db["users"], db["dose_claims"], db["outbox"]
+
+
+class _SendCounter:
+    """Stands in for the provider: counts sends and optionally adds latency."""
+
+    def __init__(self, latency_ms: float) -> None:
+        self.latency = latency_ms / 1000.0
+        self.sent = 0
+
+    def __call__(self, *, to: str, body: str) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent += 1
+        return {"status": "mocked"}
+
+
+def run_population(count: int, args: argparse.Namespace) -> Dict[str, Any]:
+    users_raw, claims_raw, outbox_raw = _collections(args.mongo_uri)
+    users = CountingCollection(users_raw)
+    claims = CountingCollection(claims_raw)
+    # caregiver alerts wait in the outbox for their digest window
+    held = CountingCollection(outbox_raw)
+
+    load_started = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    for user in generate_users(
+        count,
+        meds_per_user=args.meds,
+        caregivers_per_user=args.caregivers,
+        due_now_share=args.due_share,
+        seed=args.seed,
+    ):
+        batch.append(user)
+        if len(batch) >= 5000:
+            users_raw.insert_many(batch)
+            batch = []
+    if batch:
+        users_raw.insert_many(batch)
+    load_seconds = time.perf_counter() - load_started
+
+    app = Flask("scheduler-benchmark")
+    sender = _SendCounter(args.send_latency_ms)
+    stand_in = None
+    latencies: List[float] = []
+    per_tick: List[Dict[str, int]] = []
+
+    index = None
+    if args.index:
+        index = ScheduleIndex(scheduler._index_entries, tz=scheduler.DEFAULT_TIMEZONE,
+                              check_at=scheduler._index_check_at)
+        index.ready = True
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(scheduler, "users", users))
+        stack.enter_context(patch("backend.partitioning.dose_claims", claims))
+        stack.enter_context(patch("backend.outbox.outbox", held))
+        stack.enter_context(patch.object(scheduler, "_schedule_index", index))
+        if args.stand_in:
+            stand_in = TwilioStandIn(latency=args.stand_in_latency, error_rate=args.stand_in_error_rate,
+                                     seed=args.seed)
+            base_url, stop = start_in_thread(stand_in)
+            stack.callback(stop)
+            stack.enter_context(patch.object(twilio_service, "config", TwilioConfig(
+                account_sid="ACbenchmark",
+                auth_token="benchmark",
+                from_number="whatsapp:+14155238886",
+                enabled=True,
+                base_url=base_url,
+                status_callback=None,
+            )))
+            stack.enter_context(patch.object(twilio_service, "_client", None))
+            stack.enter_context(patch("backend.notifications.ASYNC_SEND", args.async_send))
+        else:
+            stack.enter_context(patch.object(twilio_service, "send_sms", sender))
+
+        for _ in range(args.ticks):
+            if index is not None:
+                # stands in for the change stream, outside the timed section
+                index.load(users_raw.find({}, INDEX_VIEW), datetime.now(scheduler.DEFAULT_TIMEZONE))
+            users.reset()
+            claims.reset()
+            held.reset()
+            sent_before = stand_in.stats["accepted"] if stand_in else sender.sent
+            started = time.perf_counter()
+            scheduler._dispatch_due_reminders(app)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            per_tick.append({
+                "docs_read": users.docs_read,
+                "bytes_read": users.bytes_read,
+                "writes": users.writes + claims.writes + held.writes,
+                "round_trips": users.round_trips + claims.round_trips + held.round_trips,
+                "messages_sent": (stand_in.stats["accepted"] if stand_in else sender.sent) - sent_before,
+            })
+
+    return {
+        "users": count,
+        "ticks": args.ticks,
+        "load_seconds": round(load_seconds, 3),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 3),
+            "p90": round(_percentile(latencies, 90), 3),
+            "p99": round(_percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "first_tick": per_tick[0],
+        "steady_tick": per_tick[-1],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _int_range(value: str) -> List[int]:
+    low, _, high = value.partition("-")
+    return [int(low), int(high or low)]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark scheduler ticks on synthetic users.")
+    parser.add_argument("--users", default="1000,10000",
+                        help="comma separated population sizes (1000 up to 1000000)")
+    parser.add_argument("--ticks", type=int, default=3, help="ticks to run per population")
+    parser.add_argument("--meds", type=_int_range, default=[1, 5], help="medications per user, e.g. 1-5")
+    parser.add_argument("--caregivers", type=_int_range, default=[0, 3],
+                        help="caregivers per user, e.g. 0-3")
+    parser.add_argument("--due-share", type=float, default=0.1,
+                        help="share of doses placed at the current minute")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0,
+                        help="simulated provider latency per send")
+    parser.add_argument("--stand-in", action="store_true",
+                        help="send through the notification service to a local twilio stand-in")
+    parser.add_argument("--stand-in-latency", default="lognormal:80,0.5",
+                        help="stand-in latency distribution, see twilioStandIn.parse_latency")
+    parser.add_argument("--stand-in-error-rate", type=float, default=0.0)
+    parser.add_argument("--async-send", action="store_true",
+                        help="with --stand-in, use the pooled async client for batches")
+    parser.add_argument("--index", action="store_true",
+                        help="answer ticks from a preloaded schedule index instead of queries")
+    parser.add_argument("--mongo-uri", default=None,
+                        help=f"run against a local mongod (uses the {BENCH_DB_NAME} database)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write the json report here as well")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = build_parser().parse_args(argv)
+    logging.disable(logging.INFO)
+
+    report = {
+        "benchmark": "scheduler_tick",
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "store": "mongod" if args.mongo_uri else "memory",
+        "config": {
+            "ticks": args.ticks,
+            "meds_per_user": args.meds,
+            "caregivers_per_user": args.caregivers,
+            "due_share": args.due_share,
+            "send_latency_ms": args.send_latency_ms,
+            "schedule_index": args.index,
+            "send_concurrency": SEND_CONCURRENCY,
+            "stand_in": args.stand_in,
+            "stand_in_latency": args.stand_in_latency if args.stand_in else None,
+            "async_send": args.async_send,
+        },
+        "results": [run_population(int(count), args) for count in args.users.split(",")],
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+# twilioStandIn.py
+# local stand-in for the twilio Messages create endpoint, so load tests exercise
+# the real send path (http client, pooling, rate limiting, 429 retries, outbox
+# backoff) without network or credentials. point the service at it with
+#   TWILIO_API_BASE_URL=http://127.0.0.1:8099 TWILIO_ACCOUNT_SID=AC123 \
+#   TWILIO_AUTH_TOKEN=x TWILIO_FROM_NUMBER=whatsapp:+14155238886 ...
+# and start it with for example
+#   python -m backend.benchmarks.twilioStandIn --latency lognormal:80,0.5 \
+#       --error-rate 0.01 --rate 80 --burst 80
+# GET /stats returns counters, POST /stats/reset clears them.
+
+MESSAGES_PATH = "/2010-04-01/Accounts/{account_sid}/Messages.json"
+CALLBACK_STATUSES = ("queued", "sent", "delivered")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Returns a sampler of response latency in seconds from "fixed:MS",
+    "uniform:LOW-HIGH" (ms) or "lognormal:MEDIAN_MS,SIGMA".
+    """
+    kind, _, args = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        value = float(args or 0) / 1000.0
+        return lambda rng: value
+    if kind == "uniform":
+        low, _, high = args.partition("-")
+        low_s, high_s = float(low) / 1000.0, float(high or low) / 1000.0
+        return lambda rng: rng.uniform(low_s, high_s)
+    if kind == "lognormal":
+        median, _, sigma = args.partition(",")
+        mu = float(median) / 1000.0
+        sigma_value = float(sigma or 0.5)
+        return lambda rng: mu * rng.lognormvariate(0.0, sigma_value)
+    raise ValueError(f"Unknown latency distribution '{spec}'.")
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class TwilioStandIn:
+    """
+    aiohttp application that accepts Messages create calls and answers them the
+    way twilio does, with injected latency, failures and per-sender throttling.
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        rate: float = 0.0,
+        burst: Optional[float] = None,
+        callback_delay_ms: float = 50.0,
+        status_callback: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate = rate
+        self.burst = burst or rate
+        self.callback_delay = callback_delay_ms / 1000.0
+        self.status_callback = status_callback
+        self._rng = random.Random(seed)
+        self._buckets: Dict[str, _Bucket] = {}
+        self._callbacks: List["asyncio.Task[None]"] = []
+        self._session: Optional[ClientSession] = None
+        self.reset()
+
+        self.app = web.Application()
+        self.app.router.add_post(MESSAGES_PATH, self._create_message)
+        self.app.router.add_get("/stats", self._stats)
+        self.app.router.add_post("/stats/reset", self._reset)
+        self.app.on_cleanup.append(self._cleanup)
+
+    def reset(self) -> None:
+        self.stats = {"received": 0, "accepted": 0, "errors": 0, "throttled": 0, "callbacks": 0,
+                      "callback_failures": 0}
+        self.messages = []
+
+    def _throttled(self, sender: str) -> bool:
+        if self.throttle_rate and self._rng.random() < self.throttle_rate:
+            return True
+        if self.rate <= 0:
+            return False
+        bucket = self._buckets.setdefault(sender, _Bucket(self.rate, self.burst))
+        return not bucket.take()
+
+    async def _create_message(self, request: web.Request) -> web.Response:
+        self.stats["received"] += 1
+        form = await request.post()
+        account_sid = request.match_info["account_sid"]
+        to, sender, body = form.get("To"), form.get("From"), form.get("Body")
+
+        await asyncio.sleep(self._latency(self._rng))
+
+        if not to or not sender or not body:
+            self.stats["errors"] += 1
+            return _error(400, 21604, "A 'To', 'From' and 'Body' parameter is required.")
+        if self._throttled(sender):
+            self.stats["throttled"] += 1
+            return _error(429, 20429, "Too Many Requests", headers={"Retry-After": "1"})
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return _error(500, 20500, "Internal Server Error")
+
+        sid = f"SM{uuid.uuid4().hex}"
+        now = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
+        message = {
+            "sid": sid,
+            "account_sid": account_sid,
+            "to": to,
+            "from": sender,
+            "body": body,
+            "status": "queued",
+            "num_segments": "1",
+            "direction": "outbound-api",
+            "date_created": now,
+            "date_updated": now,
+            "date_sent": None,
+            "error_code": None,
+            "error_message": None,
+            "price": None,
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+        }
+        self.stats["accepted"] += 1
+        self.messages.append(message)
+
+        callback = form.get("StatusCallback") or self.status_callback
+        if callback:
+            self._callbacks = [task for task in self._callbacks if not task.done()]
+            self._callbacks.append(asyncio.ensure_future(self._send_callbacks(callback, message)))
+        return web.json_response(message, status=201)
+
+    async def _send_callbacks(self, url: str, message: Dict[str, Any]) -> None:
+        if self._session is None:
+            self._session = ClientSession(timeout=ClientTimeout(total=10))
+        for status in CALLBACK_STATUSES:
+            await asyncio.sleep(self.callback_delay)
+            data = {
+                "MessageSid": message["sid"],
+                "AccountSid": message["account_sid"],
+                "To": message["to"],
+                "From": message["from"],
+                "MessageStatus": status,
+            }
+            try:
+                async with self._session.post(url, data=data) as response:
+                    await response.read()
+                self.stats["callbacks"] += 1
+            except Exception as exc:
+                self.stats["callback_failures"] += 1
+                logging.warning("Status callback to %s failed: %s", url, exc)
+                return
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def _reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response(self.stats)
+
+    async def _cleanup(self, app: web.Application) -> None:
+        for task in self._callbacks:
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+
+def _error(status: int, code: int, message: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    payload = {"code": code, "message": message, "more_info": f"https://www.twilio.com/docs/errors/{code}",
+               "status": status}
+    return web.json_response(payload, status=status, headers=headers)
+
+
+def start_in_thread(stand_in: TwilioStandIn, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, Callable[[], None]]:
+    """Serves the stand-in from a background event loop; returns (base url, stop)."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(stand_in.app, access_log=None)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, port)
+    loop.run_until_complete(site.start())
+    bound_port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, name="twilio-stand-in", daemon=True)
+    thread.start()
+
+    def stop() -> None:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    return f"http://{host}:{bound_port}", stop
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local Twilio Messages API stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:MS, uniform:LOW-HIGH or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="share of requests answered with 429 regardless of rate")
+    parser.add_argument("--rate", type=float, default=0.0, help="accepted messages per second per sender")
+    parser.add_argument("--burst", type=float, default=None, help="bucket size for --rate")
+    parser.add_argument("--callback-delay-ms", type=float, default=50.0,
+                        help="delay between queued, sent and delivered callbacks")
+    parser.add_argument("--status-callback", default=None,
+                        help="callback url for requests that do not send StatusCallback")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stand_in = TwilioStandIn(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate=args.rate,
+        burst=args.burst,
+        callback_delay_ms=args.callback_delay_ms,
+        status_callback=args.status_callback,
+        seed=args.seed,
+    )
+    web.run_app(stand_in.app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+import re
 import asyncio
-from backend.aiParsing import aiParseMedicine
-from backend.loggingStack import medcineLoggingLogic
+from backend.aiParsing import aiParseMedicines, ruleParseMedicines
+from backend.commandQueue import WEBHOOK_ASYNC, CommandQueue
+from backend.loggingStack import WEEKDAY_ALIASES, medcineLoggingLogic
 from backend.db import users  
+from backend.projections import STACK_VIEW
+from pymongo import ReturnDocument
 from pytz import timezone
 from backend.notifications import twilio_service
+from backend.nextDue import refresh_next_due_at
 from flask import Response
 
 textD = Blueprint('textD', __name__)
 EASTERN_TZ = timezone('US/Eastern')
+# same day names the setup form saves for weekly medicines
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 def normalize_phone(phone):
     """Remove 'whatsapp:' prefix if present"""
@@ -33,6 +40,37 @@ def printingStack(stack):
     
     return "\n".join(printingLog)
 
+def nameMatcher(name):
+    """Case-insensitive exact match on a medication name."""
+    return {"$regex": f"^{re.escape(name)}$", "$options": "i"}
+
+def mergeEntries(entries):
+    """Folds entries naming the same medicine together, keeping every time and day given."""
+    merged = {}
+    for entry in entries:
+        current = merged.setdefault(entry['medicine_name'], {
+            "medicine_name": entry['medicine_name'], "times": [], "days": [],
+        })
+        current['times'] = list(dict.fromkeys(current['times'] + (entry.get('times') or [entry['time']])))
+        days = entry.get('days') or ([entry['day']] if entry.get('day') else [])
+        current['days'] = list(dict.fromkeys(current['days'] + days))
+    for current in merged.values():
+        current['day'] = current['days'][0] if current['days'] else ""
+    return list(merged.values())
+
+def scheduleFields(entry):
+    """Weekly on the entry's days (saved like the setup form does), or daily when it names none."""
+    days = [DAY_NAMES[WEEKDAY_ALIASES[day]] for day in entry['days'] if day in WEEKDAY_ALIASES]
+    days = list(dict.fromkeys(days))
+    return {"frequency": "Weekly" if days else "Daily", "days": days}
+
+def describeEntries(entries, word):
+    """'metformin at 8am, 8pm; lisinopril at 9am monday, friday' for replies"""
+    return "; ".join(
+        f"{entry['medicine_name']} {word} {', '.join(entry['times'])} {', '.join(entry['days'])}".strip()
+        for entry in entries
+    )
+
 def commandLogic(userPhone, messageText):
     """
     Handles SMS commands: numeric logs, pause, resume, stop, edit, add.
@@ -72,53 +110,70 @@ def commandLogic(userPhone, messageText):
 
         try:
           
-            aidata = aiParseMedicine(medParsed)
+            entries = aiParseMedicines(medParsed)
+        except ValueError as e:
+            return str(e)
         except Exception as e:
             return f"Error during AI parsing: {e}"
 
-        if not aidata:
+        if not entries:
             return "Failed to parse medicine details. Please ensure the format is correct."
 
+        entries = mergeEntries(entries)
 
+        # every medicine in the message is changed by one update, so a batch
+        # is applied completely or not at all
         if medLogic.startswith("edit"):
+            updates = {}
+            arrayFilters = []
+            for index, entry in enumerate(entries):
+                target = f"medications.$[m{index}]"
+                updates[f"{target}.times"] = entry['times']
+                updates[f"{target}.day"] = entry['day']
+                for field, value in scheduleFields(entry).items():
+                    updates[f"{target}.{field}"] = value
+                arrayFilters.append({f"m{index}.name": nameMatcher(entry['medicine_name'])})
             result = users.update_one(
                 {
                     "phone": userPhone,
-                    "medications.name": {"$regex": f"^{aidata['medicine_name']}$", "$options": "i"}
+                    "$and": [{"medications.name": nameMatcher(entry['medicine_name'])} for entry in entries]
                 },
-                {
-                    "$set": {
-                        "medications.$.times": [aidata['time']],
-                        "medications.$.day": aidata.get('day', ""),
-                        "medications.$.frequency": "Daily",
-                        "medications.$.days": []
-                    }
-                }
+                {"$set": updates},
+                array_filters=arrayFilters
             )
             if result.modified_count > 0:
-                return f"Updated {aidata['medicine_name']} to {aidata['time']} {aidata.get('day', '')}."
+                refresh_next_due_at({"phone": userPhone})
+                return f"Updated {describeEntries(entries, 'to')}."
+            elif len(entries) == 1:
+                return f"No medicine named '{entries[0]['medicine_name']}' found to edit."
             else:
-                return f"No medicine named '{aidata['medicine_name']}' found to edit."
+                names = ", ".join(entry['medicine_name'] for entry in entries)
+                return f"Nothing was changed: not all of {names} were found to edit."
 
       
         elif medLogic.startswith("add"):
-            newMed = {
-                "name": aidata['medicine_name'],
-                "times": [aidata['time']],
-                "day": aidata.get('day', ""),
-                "frequency": "Daily",
-                "days": [],
-                "status": "pending"
-            }
+            newMeds = [
+                {
+                    "name": entry['medicine_name'],
+                    "times": entry['times'],
+                    "day": entry['day'],
+                    **scheduleFields(entry),
+                    "status": "pending"
+                }
+                for entry in entries
+            ]
             print(f"DEBUG: Trying to add medicine for phone: {userPhone}")
-            print(f"DEBUG: New medication: {newMed}")
+            print(f"DEBUG: New medications: {newMeds}")
             result = users.update_one(
                 {"phone": userPhone},
-                {"$push": {"medications": newMed}}
+                {"$push": {"medications": {"$each": newMeds}}}
             )
             print(f"DEBUG: Update result - matched: {result.matched_count}, modified: {result.modified_count}")
             if result.modified_count > 0:
-                return f"Added new medicine: {aidata['medicine_name']} at {aidata['time']} {aidata.get('day', '')}."
+                refresh_next_due_at({"phone": userPhone})
+                if len(newMeds) == 1:
+                    return f"Added new medicine: {describeEntries(entries, 'at')}."
+                return f"Added {len(newMeds)} new medicines: {describeEntries(entries, 'at')}."
             else:
                 return "Failed to add medicine. User not found."
 
@@ -127,6 +182,22 @@ def commandLogic(userPhone, messageText):
         return "Command not recognized. Please reply with a number, 'pause', 'resume', 'edit', 'add', or 'stop'."
 
 
+def answersInline(messageText):
+    """
+    True for commands that answer quickly (digits, pause, resume, ...) and for
+    edit/add messages the rule parser can read; only the ones that would wait
+    on the model are worth queueing.
+    """
+    medLogic = messageText.strip().lower()
+    if medLogic.startswith("edit"):
+        details = medLogic[4:].strip()
+    elif medLogic.startswith("add"):
+        details = medLogic[3:].strip()
+    else:
+        return True
+    return len(details.split()) < 2 or ruleParseMedicines(details) is not None
+
+
 def medTaken(userPhone, position):
     """Handles when a user texts a number to log medication."""
     # Normalize phone number
@@ -142,21 +213,28 @@ def medTaken(userPhone, position):
     if not medicineLog:
         return f"Position {position} not found.\n\n{printingStack(stack)}"
 
-    result = users.update_one(
+    # the update only applies while the dose is still waiting to be logged, and
+    # returns the updated document so the new stack needs no second read
+    updated = users.find_one_and_update(
         {
             "phone": userPhone,
-            "medications.name": medicineLog['medicine_name']
+            "medications": {"$elemMatch": {
+                "name": medicineLog['medicine_name'],
+                "status": {"$in": ["pending", "missed", None]}
+            }}
         },
         {
             "$set": {
                 "medications.$.status": "taken",
                 "medications.$.taken_at": datetime.now(EASTERN_TZ)
             }
-        }
+        },
+        projection=STACK_VIEW,
+        return_document=ReturnDocument.AFTER
     )
 
-    if result.modified_count > 0:
-        newStack = medcineLoggingLogic(userPhone)
+    if updated is not None:
+        newStack = medcineLoggingLogic(userPhone, user=updated)
         if newStack: 
             return f"Logged {medicineLog['medicine_name']}!\n\n{printingStack(newStack)}"  
         else:
@@ -179,6 +257,13 @@ def handle_sms():
     if not user_phone or not message_text:
         return jsonify({'error': 'Missing phone or message'}), 400
 
+    # in async mode slow commands are acknowledged now and answered by a worker
+    if WEBHOOK_ASYNC and not answersInline(message_text) and command_queue.submit(user_phone, message_text):
+        return Response("<Response></Response>", mimetype="text/xml")
+
     response_text = commandLogic(user_phone, message_text)
     twiml = f"<Response><Message>{response_text}</Message></Response>"
     return Response(twiml, mimetype="text/xml")
+
+
+command_queue = CommandQueue(commandLogic)
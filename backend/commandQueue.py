@@ -0,0 +1,134 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, List
+
+from pymongo.errors import PyMongoError
+
+from backend.metrics import REGISTRY
+from backend.notifications import DELIVERED_STATUSES, OutboundMessage, _str_to_bool, twilio_service
+from backend.outbox import OUTBOX_ENABLED, enqueue
+
+# commandQueue.py
+# opt-in asynchronous webhook mode. with WEBHOOK_ASYNC=true, commands that would
+# wait on the model are put on a local work queue and the webhook answers with
+# an empty TwiML response right away; a worker thread runs the command and sends
+# the reply. with OUTBOX_ENABLED the reply is enqueued like any other message;
+# otherwise it is sent through the notification service, and a reply the breaker
+# parked or the provider failed is retried a few times with backoff. the queue
+# lives in the web process, so anything still queued when it exits is not answered.
+
+WEBHOOK_ASYNC = _str_to_bool(os.getenv("WEBHOOK_ASYNC"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "500"))
+WEBHOOK_REPLY_RETRIES = int(os.getenv("WEBHOOK_REPLY_RETRIES", "5"))
+WEBHOOK_REPLY_RETRY_SECONDS = float(os.getenv("WEBHOOK_REPLY_RETRY_SECONDS", "10"))
+
+COMMANDS = REGISTRY.counter(
+    "webhook_commands_total", "Slow webhook commands queued, or answered inline because the queue was full.",
+    ["mode"],
+)
+QUEUE_DEPTH = REGISTRY.gauge("webhook_queue_depth", "Commands waiting for a webhook worker.")
+COMMAND_DURATION = REGISTRY.histogram(
+    "webhook_command_duration_seconds", "Time from webhook to reply for queued commands."
+)
+REPLIES = REGISTRY.counter(
+    "webhook_replies_total", "Out-of-band reply attempts by send status (queued when enqueued).", ["status"]
+)
+
+
+class CommandQueue:
+    """Bounded queue of (phone, text) commands drained by a few daemon threads."""
+
+    def __init__(
+        self,
+        handler: Callable[[str, str], str],
+        workers: int = WEBHOOK_WORKERS,
+        max_size: int = WEBHOOK_QUEUE_SIZE,
+    ) -> None:
+        self._handler = handler
+        self._workers = max(1, workers)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, user_phone: str, message_text: str) -> bool:
+        """Queues a command; False when the queue is full and the caller should answer inline."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((user_phone, message_text, time.perf_counter()))
+        except queue.Full:
+            COMMANDS.inc(mode="overflow")
+            logging.warning("Webhook queue is full, answering %s inline.", user_phone)
+            return False
+        COMMANDS.inc(mode="queued")
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def join(self) -> None:
+        """Blocks until every queued command has been handled (used by tests)."""
+        self._queue.join()
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f"webhook-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            user_phone, message_text, received = self._queue.get()
+            QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                self._handle(user_phone, message_text)
+            finally:
+                COMMAND_DURATION.observe(time.perf_counter() - received)
+                self._queue.task_done()
+
+    def _handle(self, user_phone: str, message_text: str) -> None:
+        try:
+            reply = self._handler(user_phone, message_text)
+        except Exception as exc:
+            logging.exception("Queued command from %s failed: %s", user_phone, exc)
+            reply = "Sorry, something went wrong handling your message. Please try again."
+        if not reply:
+            return
+        self._reply(OutboundMessage(to=user_phone, body=reply, context=f"reply:{uuid.uuid4().hex}"))
+
+    def _reply(self, message: OutboundMessage, attempt: int = 0) -> None:
+        """Enqueues or sends a reply; direct sends that did not go out are retried on a timer."""
+        if OUTBOX_ENABLED:
+            try:
+                enqueue([message], kind="reply")
+                REPLIES.inc(status="queued")
+                return
+            except PyMongoError as exc:
+                logging.warning("Unable to enqueue reply to %s, sending it directly: %s", message.to, exc)
+
+        ((_, result),) = twilio_service.send_many([message])
+        status = result.get("status", "error")
+        REPLIES.inc(status=status)
+        if status in DELIVERED_STATUSES:
+            return
+
+        http_status = result.get("http_status") or 0
+        # a rejected request (bad number, ...) fails the same way every time
+        if attempt >= WEBHOOK_REPLY_RETRIES or (400 <= http_status < 500 and http_status != 429):
+            logging.error("Reply to %s was not sent after %s attempts (%s): %s",
+                          message.to, attempt + 1, status, result.get("error"))
+            return
+        delay = max(result.get("retry_after") or 0.0, WEBHOOK_REPLY_RETRY_SECONDS * 2 ** attempt)
+        logging.warning("Reply to %s was not sent (%s), retrying in %.0fs: %s",
+                        message.to, status, delay, result.get("error"))
+        timer = threading.Timer(delay, self._reply, args=(message, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
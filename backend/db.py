@@ -1,15 +1,59 @@
 import os
+import threading
 import certifi
 from pymongo import MongoClient
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "medication-reminder")
 
-# Configure SSL for MongoDB Atlas connections
-if "mongodb.net" in MONGO_URI or "mongodb+srv" in MONGO_URI:
-    client = MongoClient(MONGO_URI)
-else:
-    client = MongoClient(MONGO_URI)
+# db.py
+# the MongoClient is created on first use rather than at import, so processes
+# that never touch mongo (or only touch it late) start without its monitor
+# threads and DNS lookups. `db` and the collections below are stand-ins that
+# forward to the real objects once the client exists.
 
-db = client[MONGO_DB_NAME]
-users = db["users"]
\ No newline at end of file
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Configure SSL for MongoDB Atlas connections
+                if "mongodb.net" in MONGO_URI or "mongodb+srv" in MONGO_URI:
+                    _client = MongoClient(MONGO_URI)
+                else:
+                    _client = MongoClient(MONGO_URI)
+    return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+class _LazyDatabase:
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+class _LazyCollection:
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(get_db()[self._name], name)
+
+    def __repr__(self) -> str:
+        return f"<lazy collection {MONGO_DB_NAME}.{self._name}>"
+
+
+db = _LazyDatabase()
+users = _LazyCollection("users")
+dose_claims = _LazyCollection("dose_claims")
+outbox = _LazyCollection("outbox")
+parse_cache = _LazyCollection("parse_cache")
@@ -0,0 +1,89 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Optional, Set
+
+import pytz
+
+from backend.scheduleIndex import ScheduleIndex
+
+# exactDispatch.py
+# optional event-driven dispatch. instead of polling every minute, a single thread
+# sleeps until the next dose instant in the schedule index and fires exactly the
+# doses due at that instant. any change to the index wakes the thread so an
+# earlier dose added by an sms edit is not slept through. the scheduler still runs
+# a periodic reconciliation sweep for anything this thread misses.
+
+MAX_SLEEP_SECONDS = 60
+
+
+class ExactDispatcher:
+    """Fires doses at their due instant using the schedule index's min-heap."""
+
+    def __init__(
+        self,
+        index: ScheduleIndex,
+        fire: Callable[[Set[Any], datetime], None],
+        logger: Optional[logging.Logger] = None,
+        max_sleep: float = MAX_SLEEP_SECONDS,
+    ) -> None:
+        self._index = index
+        self._fire = fire
+        self._logger = logger or logging.getLogger(__name__)
+        self._max_sleep = max_sleep
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_fired = datetime.now(pytz.utc)
+        index.track_next_due()
+        index.add_listener(self._wake.set)
+
+    def start(self) -> None:
+        self._last_fired = datetime.now(pytz.utc)
+        self._thread = threading.Thread(target=self._run, name="exact-dispatch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                # the reconciliation sweep sends whatever this round missed
+                self._logger.exception("Exact dispatch round failed: %s", exc)
+                self._stop.wait(1)
+
+    def run_once(self) -> None:
+        """Sleeps until the next due instant (or a change), then fires what is due."""
+        # cleared before looking so a change made while computing still wakes the wait
+        self._wake.clear()
+        next_due = self._index.next_due_after(self._last_fired)
+        now = datetime.now(pytz.utc)
+        if next_due is None or next_due > now:
+            timeout = self._max_sleep
+            if next_due is not None:
+                timeout = min(timeout, (next_due - now).total_seconds())
+            self._wake.wait(timeout)
+            return
+
+        self.fire_due(now)
+
+    def fire_due(self, now: datetime) -> None:
+        entries = [
+            entry
+            for entry in self._index.due(self._last_fired, now, now)
+            if entry.due_at > self._last_fired
+        ]
+        self._last_fired = now
+        if not entries:
+            return
+
+        user_ids = {entry.user_id for entry in entries}
+        lag = max((now - entry.due_at).total_seconds() for entry in entries)
+        self._logger.info(
+            "Exact dispatch firing %s doses for %s users (lag %.3fs).", len(entries), len(user_ids), lag
+        )
+        self._fire(user_ids, now)
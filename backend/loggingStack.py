@@ -1,10 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
+import os
 import pytz
 import re
+import threading
+from pymongo.errors import PyMongoError
 from backend.db import users as users_collection
-from backend.notifications import twilio_service
+from backend.notifications import DELIVERED_STATUSES, PRIORITY_CAREGIVER, OutboundMessage, twilio_service
+from backend.outbox import OUTBOX_ENABLED, enqueue
+from backend.projections import STACK_VIEW
 
 EASTERN_TZ = pytz.timezone('America/New_York')
+# caregivers hear about it once a user has this many missed doses in the stack
+STACK_ALERT_THRESHOLD = int(os.getenv("CAREGIVER_STACK_ALERT_THRESHOLD", "3"))
+# threshold alerts are sent off the request path; one worker is plenty
+_alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stack-alerts")
+_pending_alerts = set()
+_pending_lock = threading.Lock()
 WEEKDAY_ALIASES = {
     "mon": 0,
     "monday": 0,
@@ -73,31 +85,18 @@ def caregiver_wants_missed_alert(caregiver):
     notify_when = (caregiver.get("notify_when") or "On missed dose").strip().lower()
     return notify_when in {"on missed dose", "both"}
 
-def medcineLoggingLogic(userPhone, now=None):
+def buildMedStack(user, userPhone, now):
     """
-    this is creating a priorritized med stack which 
-    help the logging logic of piled up meds waiting to be logged. 
+    Orders a user's doses still waiting to be logged: missed first, then the
+    ones due within two hours, then later ones, each by time, numbered from 1.
+    Pure: reads only `user` (a STACK_VIEW document) and `now`.
     """
-    # Normalize phone number (remove whatsapp: prefix if present)
-    userPhone = normalize_phone(userPhone)
-    user = users_collection.find_one({
-        "phone": userPhone 
-    })
-    
-    if not user or 'medications' not in user:
-        return []
-    
-    caregivers = user.get('caregivers', [])
-    
-    now = now or datetime.now(EASTERN_TZ)
     stackMed = []
     for med in user.get('medications', []):
         if not med_is_scheduled_today(med, now):
             continue
 
         status = med.get('status', 'pending') 
-        print(f" {med['name']} at {med['times']} - status: {status}")
- 
         if status in ['pending', 'missed']:
             times = med.get('times', [])
             for time_str in times:
@@ -110,22 +109,14 @@ def medcineLoggingLogic(userPhone, now=None):
                     'original_med': med
                 })
     
-    if not stackMed:
-        return []
-    
     currentMedStack = []
     missedMedStack = []
     pendedMedStack = []
 
-    print(f" CURRENT TIME: {now}")
-    print(f" ALL MEDICATIONS: {user.get('medications', [])}")
-    
-
     for med in stackMed:
         time_str = med.get("time")
         try:
             hour, minute = map(int, time_str.split(':'))
-            med_time = EASTERN_TZ.localize(datetime(now.year, now.month, now.day, hour, minute))
             medTime = EASTERN_TZ.localize(datetime(now.year, now.month, now.day, hour, minute, 0))
 
             if medTime < (now - timedelta(minutes=3)):
@@ -138,41 +129,6 @@ def medcineLoggingLogic(userPhone, now=None):
         except (ValueError, AttributeError):
             continue
     
-    if len(missedMedStack) >= 3 and caregivers:
-        careMed = [med['medicine_name'] for med in missedMedStack]
-        user_name = user.get('name', 'The user')
-        
-        careAlert = f"Alert: {user_name} has missed {len(missedMedStack)} medications: {', '.join(careMed)}. Please check on them."
-        
-        for caregiver in caregivers:
-            if not caregiver_wants_missed_alert(caregiver):
-                continue
-
-            caregiver_phone = caregiver.get('phone')
-            if not caregiver_phone:
-                print(f"WARNING: Caregiver {caregiver.get('name', 'Unknown')} has no phone number")
-                continue
-            
-            # Debug: Print original phone format
-            print(f"DEBUG: Original caregiver phone: '{caregiver_phone}' (type: {type(caregiver_phone)})")
-            
-            # Normalize caregiver phone number for WhatsApp
-            normalized_phone = normalize_caregiver_phone(caregiver_phone)
-            print(f"DEBUG: Normalized caregiver phone: '{normalized_phone}'")
-            
-            # Send message and capture result
-            result = twilio_service.send_sms(to=normalized_phone, body=careAlert)
-            caregiver_name = caregiver.get('name', 'Caregiver')
-            
-            print(f"DEBUG: Twilio result: {result}")
-            
-            if result.get('status') == 'sent':
-                print(f"✓ CAREGIVER ALERT SENT to {caregiver_name} ({normalized_phone}): {careAlert}")
-            elif result.get('status') == 'error':
-                print(f"✗ CAREGIVER ALERT FAILED to {caregiver_name} ({normalized_phone}): {result.get('error', 'Unknown error')}")
-            else:
-                print(f"CAREGIVER ALERT (mocked) to {caregiver_name} ({normalized_phone}): {careAlert}")
-    
     currentMedStack.sort(key=lambda x: x['time'])
     missedMedStack.sort(key=lambda x: x['time'])
     pendedMedStack.sort(key=lambda x: x['time'])
@@ -185,3 +141,106 @@ def medcineLoggingLogic(userPhone, now=None):
         stack_position += 1                     
     
     return prioritizedStack
+
+def medcineLoggingLogic(userPhone, now=None, user=None):
+    """
+    this is creating a priorritized med stack which 
+    help the logging logic of piled up meds waiting to be logged. 
+    pass `user` (read with STACK_VIEW) when the caller already has the
+    document, e.g. from find_one_and_update, to skip reading it again.
+    caregiver alerts for a pile of missed doses are handed to a background
+    worker, so building the stack never waits on the messaging provider.
+    """
+    # Normalize phone number (remove whatsapp: prefix if present)
+    userPhone = normalize_phone(userPhone)
+    if user is None:
+        user = users_collection.find_one({
+            "phone": userPhone 
+        }, STACK_VIEW)
+    
+    if not user or 'medications' not in user:
+        return []
+
+    now = now or datetime.now(EASTERN_TZ)
+    stack = buildMedStack(user, userPhone, now)
+    queueMissedDoseAlert(user, stack, now)
+    return stack
+
+def queueMissedDoseAlert(user, stack, now):
+    """
+    Hands a caregiver alert to the background worker once a user has
+    STACK_ALERT_THRESHOLD or more missed doses. Users already alerted today
+    (per caregiver_alert_log.missed_threshold) or with an alert in flight are skipped.
+    """
+    missed = [med['medicine_name'] for med in stack if med['status'] == 'missed']
+    caregivers = [c for c in user.get('caregivers', []) if caregiver_wants_missed_alert(c) and c.get('phone')]
+    if len(missed) < STACK_ALERT_THRESHOLD or not caregivers:
+        return False
+
+    today_key = now.strftime('%Y-%m-%d')
+    if (user.get('caregiver_alert_log') or {}).get('missed_threshold') == today_key:
+        return False
+    pending_key = (user['_id'], today_key)
+    with _pending_lock:
+        if pending_key in _pending_alerts:
+            return False
+        _pending_alerts.add(pending_key)
+
+    _alert_executor.submit(
+        deliverMissedDoseAlert, user['_id'], user.get('name', 'The user'), caregivers, missed, today_key
+    )
+    return True
+
+def deliverMissedDoseAlert(user_id, user_name, caregivers, missed, today_key):
+    """
+    Sends (or queues in the outbox) one missed-dose alert per caregiver. The day
+    is claimed in caregiver_alert_log.missed_threshold first, so only one process
+    alerts per user and day; if no caregiver could be reached the claim is
+    dropped again and a later stack build retries.
+    """
+    try:
+        claimed = users_collection.update_one(
+            {"_id": user_id, "caregiver_alert_log.missed_threshold": {"$ne": today_key}},
+            {"$set": {"caregiver_alert_log.missed_threshold": today_key}}
+        )
+        if claimed.modified_count == 0:
+            return
+
+        careAlert = f"Alert: {user_name} has missed {len(missed)} medications: {', '.join(missed)}. Please check on them."
+        messages = []
+        for caregiver in caregivers:
+            normalized_phone = normalize_caregiver_phone(caregiver['phone'])
+            messages.append(OutboundMessage(
+                to=normalized_phone,
+                body=careAlert,
+                # keyed per caregiver and day, so the outbox never sends one twice
+                context=f"stack_alert:{user_id}:{normalized_phone}:{today_key}",
+                priority=PRIORITY_CAREGIVER,
+            ))
+
+        if OUTBOX_ENABLED:
+            try:
+                enqueue(messages, kind="stack_alert")
+                reached = True
+            except PyMongoError as e:
+                print(f"✗ CAREGIVER ALERT NOT QUEUED for user {user_id}: {e}")
+                reached = False
+        else:
+            reached = False
+            for message, result in twilio_service.send_many(messages):
+                if result.get('status') in DELIVERED_STATUSES:
+                    reached = True
+                    print(f"✓ CAREGIVER ALERT SENT to {message.to}: {careAlert}")
+                else:
+                    print(f"✗ CAREGIVER ALERT FAILED to {message.to}: {result.get('error', result.get('status'))}")
+
+        if not reached:
+            users_collection.update_one(
+                {"_id": user_id, "caregiver_alert_log.missed_threshold": today_key},
+                {"$unset": {"caregiver_alert_log.missed_threshold": ""}}
+            )
+    except PyMongoError as e:
+        print(f"✗ CAREGIVER ALERT SKIPPED for user {user_id}: {e}")
+    finally:
+        with _pending_lock:
+            _pending_alerts.discard((user_id, today_key))
@@ -0,0 +1,236 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import pytz
+
+from backend.db import users
+from backend.projections import SCHEDULE_VIEW
+
+# nextDue.py
+# when is a user's next dose due: the dose-time helpers and the next_due_at /
+# next_missed_check_at bookkeeping shared by the scheduler and the request
+# handlers that change medications. kept apart from scheduler.py so web processes can keep
+# next_due_at current without importing apscheduler.
+
+DEFAULT_TZ = os.getenv("DEFAULT_TIMEZONE", "US/Eastern")
+REMINDER_WINDOW_MINUTES = int(os.getenv("REMINDER_WINDOW_MINUTES", "5"))
+NEXT_DUE_LOOKAHEAD_DAYS = int(os.getenv("NEXT_DUE_LOOKAHEAD_DAYS", "8"))
+DAILY_SUMMARY_HOUR = int(os.getenv("CAREGIVER_DAILY_SUMMARY_HOUR", "20"))
+# a dose still pending this long after its time counts as missed for caregivers
+MISSED_DOSE_GRACE_MINUTES = 3
+WEEKDAY_ALIASES = {
+    "mon": 0,
+    "monday": 0,
+    "tue": 1,
+    "tuesday": 1,
+    "wed": 2,
+    "wednesday": 2,
+    "thu": 3,
+    "thursday": 3,
+    "fri": 4,
+    "friday": 4,
+    "sat": 5,
+    "saturday": 5,
+    "sun": 6,
+    "sunday": 6,
+}
+
+try:
+    DEFAULT_TIMEZONE = pytz.timezone(DEFAULT_TZ)
+except Exception:
+    DEFAULT_TIMEZONE = pytz.timezone("US/Eastern")
+
+
+def _get_timezone(user_tz: Optional[str]) -> pytz.timezone:
+    if not user_tz:
+        return DEFAULT_TIMEZONE
+    try:
+        return pytz.timezone(user_tz)
+    except Exception:
+        logging.warning("Unknown timezone '%s'. Falling back to default.", user_tz)
+        return DEFAULT_TIMEZONE
+
+
+def _parse_med_time(now: datetime, time_str: str, tz: pytz.timezone) -> Optional[datetime]:
+    try:
+        # Handle both 24-hour format (16:11) and 12-hour format (4:11pm)
+        time_str = time_str.strip().lower()
+        
+        # Check if it's 12-hour format with am/pm
+        is_pm = time_str.endswith('pm')
+        is_am = time_str.endswith('am')
+        
+        if is_pm or is_am:
+            # Remove am/pm suffix
+            time_str = time_str[:-2].strip()
+        
+        # Parse hour and minute
+        parts = time_str.split(":")
+        hour = int(parts[0])
+        minute = int(parts[1]) if len(parts) > 1 else 0
+        
+        # Convert to 24-hour format if needed
+        if is_pm and hour != 12:
+            hour += 12
+        elif is_am and hour == 12:
+            hour = 0
+        
+        scheduled = tz.localize(
+            datetime(now.year, now.month, now.day, hour, minute, 0)
+        )
+        return scheduled
+    except Exception as e:
+        logging.warning("Unable to parse medication time '%s'. Error: %s", time_str, str(e))
+        return None
+
+
+def _normalise_frequency(med: Dict[str, Any]) -> str:
+    frequency = (med.get("frequency") or "Daily").strip().lower()
+    if frequency in {"twice daily", "twice_daily", "twice-daily"}:
+        return "twice daily"
+    if frequency == "weekly":
+        return "weekly"
+    if frequency in {"as needed", "as_needed", "as-needed", "prn"}:
+        return "as needed"
+    return "daily"
+
+
+def _med_is_scheduled_today(med: Dict[str, Any], now: datetime) -> bool:
+    frequency = _normalise_frequency(med)
+    if frequency == "as needed":
+        return False
+    if frequency != "weekly":
+        return True
+
+    days = med.get("days") or []
+    if isinstance(days, str):
+        days = [days]
+    if not days:
+        return True
+
+    today = now.weekday()
+    return any(WEEKDAY_ALIASES.get(str(day).strip().lower()) == today for day in days)
+
+
+def _iter_pending_doses(
+    med: Dict[str, Any], tz: pytz.timezone, now: datetime, days: int
+) -> Iterator[Tuple[int, str, datetime]]:
+    """
+    Yields (day offset, time string, dose instant) for doses of a medication from
+    the current reminder window onwards that have not been reminded yet.
+    """
+    window_start = now - timedelta(minutes=REMINDER_WINDOW_MINUTES)
+    reminder_log: Dict[str, Any] = med.get("reminder_log", {})
+
+    for offset in range(days):
+        day = now + timedelta(days=offset)
+        if not _med_is_scheduled_today(med, day):
+            continue
+
+        day_key = day.strftime("%Y-%m-%d")
+        for time_str in med.get("times", []):
+            med_dt = _parse_med_time(day, time_str, tz)
+            if not med_dt or med_dt < window_start:
+                continue
+            if reminder_log.get(time_str) == day_key:
+                continue
+            yield offset, time_str, med_dt
+
+
+def compute_next_due_at(user: Dict[str, Any], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Returns the earliest dose instant (UTC) that still needs a reminder, or None
+    when the user has nothing scheduled within the lookahead.
+    """
+    now = now or datetime.now(DEFAULT_TIMEZONE)
+    tz = _get_timezone(user.get("timezone"))
+    next_due: Optional[datetime] = None
+
+    for med in user.get("medications", []):
+        first_offset: Optional[int] = None
+        for offset, _, med_dt in _iter_pending_doses(med, tz, now, NEXT_DUE_LOOKAHEAD_DAYS):
+            # later days can only produce later instants for this medication
+            if first_offset is not None and offset != first_offset:
+                break
+            first_offset = offset
+            if next_due is None or med_dt < next_due:
+                next_due = med_dt
+
+    return next_due.astimezone(pytz.utc) if next_due else None
+
+
+def _caregiver_wants(caregiver: Dict[str, Any], kind: str) -> bool:
+    notify_when = (caregiver.get("notify_when") or "On missed dose").strip().lower()
+    if notify_when == "both":
+        return True
+    if kind == "missed_dose":
+        return notify_when == "on missed dose"
+    if kind == "daily_summary":
+        return notify_when == "daily summary"
+    return False
+
+
+def compute_next_missed_check_at(user: Dict[str, Any], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Returns the instant (UTC) from which the user's caregivers may be owed a
+    missed-dose alert or the daily summary: the end of the grace period of the
+    earliest dose that can still be missed, or the summary hour when that is
+    later. An instant in the past means a missed dose is waiting for its alert.
+    None when no caregiver would be told.
+    """
+    now = now or datetime.now(DEFAULT_TIMEZONE)
+    caregivers = user.get("caregivers") or []
+    kinds = [
+        kind for kind in ("missed_dose", "daily_summary")
+        if any(caregiver.get("phone") and _caregiver_wants(caregiver, kind) for caregiver in caregivers)
+    ]
+    if not kinds:
+        return None
+
+    tz = _get_timezone(user.get("timezone"))
+    alert_log = user.get("caregiver_alert_log") or {}
+    grace = timedelta(minutes=MISSED_DOSE_GRACE_MINUTES)
+
+    for offset in range(NEXT_DUE_LOOKAHEAD_DAYS):
+        day = now + timedelta(days=offset)
+        day_key = day.strftime("%Y-%m-%d")
+        checks = []
+        for med in user.get("medications", []):
+            if not _med_is_scheduled_today(med, day):
+                continue
+            for time_str in med.get("times", []):
+                med_dt = _parse_med_time(day, time_str, tz)
+                if not med_dt:
+                    continue
+                # a dose whose grace already ran out only counts while it is still missed
+                if med_dt + grace > now or med.get("status", "pending") == "pending":
+                    checks.append(med_dt + grace)
+        if not checks:
+            continue
+
+        candidates = []
+        if "missed_dose" in kinds and alert_log.get("missed_dose") != day_key:
+            candidates.append(min(checks))
+        if "daily_summary" in kinds and alert_log.get("daily_summary") != day_key:
+            summary_at = DEFAULT_TIMEZONE.localize(datetime(day.year, day.month, day.day, DAILY_SUMMARY_HOUR))
+            candidates.append(max(min(checks), summary_at))
+        if candidates:
+            return min(candidates).astimezone(pytz.utc)
+    return None
+
+
+def refresh_next_due_at(user_filter: Dict[str, Any]) -> Optional[datetime]:
+    """Recomputes and stores next_due_at and next_missed_check_at for the user matching the filter."""
+    user = users.find_one(user_filter, SCHEDULE_VIEW)
+    if not user:
+        return None
+
+    now = datetime.now(DEFAULT_TIMEZONE)
+    next_due = compute_next_due_at(user, now)
+    users.update_one({"_id": user["_id"]}, {"$set": {
+        "next_due_at": next_due,
+        "next_missed_check_at": compute_next_missed_check_at(user, now),
+    }})
+    return next_due
@@ -1,12 +1,357 @@
+import asyncio
+import base64
+import heapq
+import importlib.util
+import itertools
 import logging
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
-try:
-    from twilio.rest import Client  
-except ImportError: 
-    Client = None 
+from backend.metrics import REGISTRY
+
+# twilio.rest and aiohttp are slow to import and only needed once something is
+# actually sent, so both are loaded on first use (tests may patch Client)
+Client = None
+aiohttp = None
+TWILIO_INSTALLED = importlib.util.find_spec("twilio") is not None
+
+
+def _twilio_client_class():
+    global Client
+    if Client is None:
+        try:
+            from twilio.rest import Client as twilio_client
+        except ImportError:
+            return None
+        Client = twilio_client
+    return Client
+
+
+def _load_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as module
+        except ImportError:
+            return None
+        aiohttp = module
+    return aiohttp
+
+
+SEND_CONCURRENCY = int(os.getenv("TWILIO_SEND_CONCURRENCY", "8"))
+DEFAULT_API_BASE_URL = "https://api.twilio.com"
+# point both send paths somewhere else, e.g. the local stand-in in backend/benchmarks
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", DEFAULT_API_BASE_URL).rstrip("/")
+TWILIO_STATUS_CALLBACK_URL = os.getenv("TWILIO_STATUS_CALLBACK_URL")
+# pooled http client used by the async send path
+HTTP_POOL_SIZE = int(os.getenv("TWILIO_HTTP_POOL_SIZE", "100"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("TWILIO_HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("TWILIO_HTTP_TIMEOUT_SECONDS", "10"))
+ASYNC_CONCURRENCY = int(os.getenv("TWILIO_ASYNC_CONCURRENCY", "100"))
+# per sender throughput caps, e.g. "whatsapp:+14155238886=80,+15550001111=1:5"
+# (messages per second, optional burst after the colon); TWILIO_RATE_PER_SECOND
+# applies to senders not listed, 0 means unlimited
+RATE_LIMITS = os.getenv("TWILIO_RATE_LIMITS", "")
+RATE_PER_SECOND = float(os.getenv("TWILIO_RATE_PER_SECOND", "0"))
+RATE_LIMIT_RETRIES = int(os.getenv("TWILIO_RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_PENALTY_SECONDS = float(os.getenv("TWILIO_RATE_LIMIT_PENALTY_SECONDS", "1"))
+
+# circuit breaker around the provider: opens when the rolling window shows too
+# many failures or slow calls, parks sends while open, probes to recover
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("TWILIO_CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("TWILIO_CIRCUIT_MIN_CALLS", "20"))
+CIRCUIT_ERROR_RATE = float(os.getenv("TWILIO_CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("TWILIO_CIRCUIT_SLOW_CALL_SECONDS", "5"))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("TWILIO_CIRCUIT_SLOW_CALL_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("TWILIO_CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("TWILIO_CIRCUIT_HALF_OPEN_PROBES", "3"))
+
+# lower goes first when senders queue behind the rate limit
+PRIORITY_REMINDER = 0
+PRIORITY_CAREGIVER = 1
+# statuses that count as a confirmed hand-off to the provider (or the mock)
+DELIVERED_STATUSES = {"sent", "mocked"}
+
+SEND_LATENCY = REGISTRY.histogram(
+    "sms_send_latency_seconds", "Time spent handing one message to the provider.", ["status"]
+)
+RATE_QUEUE_DEPTH = REGISTRY.gauge(
+    "sms_rate_limit_queue_depth", "Sends waiting for a rate limit token.", ["sender"]
+)
+RATE_WAIT = REGISTRY.histogram(
+    "sms_rate_limit_wait_seconds", "Time a send waited for a rate limit token.", ["priority"]
+)
+THROTTLED = REGISTRY.counter(
+    "sms_throttled_total", "Provider 429 responses, each retried after a pause.", ["sender"]
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    "sms_circuit_state", "Provider circuit breaker state (0 closed, 1 half open, 2 open)."
+)
+CIRCUIT_ERROR_RATIO = REGISTRY.gauge(
+    "sms_circuit_error_ratio", "Share of failed provider calls in the rolling window."
+)
+PARKED = REGISTRY.counter("sms_parked_total", "Sends parked because the provider circuit was open.")
+
+
+class CircuitBreaker:
+    """
+    Tracks provider calls over a rolling time window. With at least `min_calls`
+    in the window, too high a share of failures or slow calls opens the circuit:
+    sends are refused (parked) for `open_seconds` instead of each waiting for a
+    timeout. Then up to `probes` calls are let through; if they all succeed the
+    circuit closes, if one fails it opens again. A throttled probe gives its slot
+    back, and probes that have not reported within `open_seconds` are written off
+    so the next sends can probe instead.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        error_rate: float = CIRCUIT_ERROR_RATE,
+        slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate: float = CIRCUIT_SLOW_CALL_RATE,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        probes: int = CIRCUIT_HALF_OPEN_PROBES,
+        clock=time.monotonic,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.probes = max(1, probes)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls: deque = deque()  # (timestamp, failed, slow)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._last_probe_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._set_state(self.HALF_OPEN)
+            self._probes_started = self._probes_passed = 0
+        elif (
+            self._state == self.HALF_OPEN
+            and self._probes_started > self._probes_passed
+            and now - self._last_probe_at >= self.open_seconds
+        ):
+            # probes that never reported back (lost caller, crashed thread)
+            self._probes_started = self._probes_passed
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logging.warning("Messaging provider circuit %s -> %s.", self._state, state)
+        self._state = state
+        CIRCUIT_STATE.set(self._GAUGE[state])
+
+    def is_open(self) -> bool:
+        """True while sends would be parked (half open still lets probes through)."""
+        return self.state == self.OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through."""
+        with self._lock:
+            if self._current_state(self._clock()) != self.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state(self._clock())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes_started < self.probes:
+                self._probes_started += 1
+                self._last_probe_at = self._clock()
+                return True
+            return False
+
+    def record(self, result: Dict[str, Any], elapsed: float) -> None:
+        """
+        Records one provider call. Throttling and rejected requests (4xx) say
+        nothing about provider health; network errors, timeouts and 5xx count
+        as failures.
+        """
+        http_status = result.get("http_status")
+        if http_status == 429:
+            with self._lock:
+                if self._current_state(self._clock()) == self.HALF_OPEN:
+                    # a throttled probe proves nothing either way, free its slot
+                    self._probes_started = max(self._probes_passed, self._probes_started - 1)
+            return
+        failed = result.get("status") == "error" and not (http_status and 400 <= http_status < 500)
+        slow = elapsed >= self.slow_call_seconds
+
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == self.HALF_OPEN:
+                if failed or slow:
+                    self._trip(now)
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.probes:
+                        self._calls.clear()
+                        self._set_state(self.CLOSED)
+                return
+
+            self._calls.append((now, failed, slow))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+            total = len(self._calls)
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            CIRCUIT_ERROR_RATIO.set(failures / total)
+            if state == self.CLOSED and total >= self.min_calls and (
+                failures / total >= self.error_rate or slow_calls / total >= self.slow_call_rate
+            ):
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self._opened_at = now
+        self._set_state(self.OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            total = len(self._calls)
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            return {
+                "state": state,
+                "calls": total,
+                "error_rate": failures / total if total else 0.0,
+                "retry_after": max(0.0, self.open_seconds - (now - self._opened_at))
+                if state == self.OPEN else 0.0,
+            }
+
+
+def _parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits: Dict[str, Tuple[float, float]] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        sender, _, value = item.rpartition("=")
+        rate, _, burst = value.partition(":")
+        try:
+            limits[sender.strip()] = (float(rate), float(burst or rate))
+        except ValueError:
+            logging.warning("Ignoring malformed TWILIO_RATE_LIMITS entry '%s'.", item)
+    return limits
+
+
+class RateLimiter:
+    """
+    Token bucket for one sender. Callers queue by (priority, arrival) and only the
+    head of the queue may take a token, so a burst of caregiver summaries never
+    holds up patient reminders that arrive behind it. Nothing is dropped: callers
+    wait until the bucket refills.
+    """
+
+    def __init__(self, sender: str, rate: float, burst: Optional[float] = None) -> None:
+        self.sender = sender
+        self.rate = rate
+        self.burst = max(1.0, burst or rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._queue: List[Tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _enter(self, priority: int) -> Tuple[int, int]:
+        with self._cond:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._queue, ticket)
+            RATE_QUEUE_DEPTH.set(len(self._queue), sender=self.sender)
+            return ticket
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        """Drops the ticket of a caller that gave up waiting, so the callers behind it move up."""
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                RATE_QUEUE_DEPTH.set(len(self._queue), sender=self.sender)
+                self._cond.notify_all()
+
+    def _try_take(self, ticket: Tuple[int, int]) -> Optional[float]:
+        """Takes a token for the ticket, or returns how long to wait before trying again."""
+        self._refill(time.monotonic())
+        if self._queue[0] != ticket:
+            return None
+        if self._tokens >= 1:
+            heapq.heappop(self._queue)
+            self._tokens -= 1
+            RATE_QUEUE_DEPTH.set(len(self._queue), sender=self.sender)
+            self._cond.notify_all()
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, priority: int = PRIORITY_REMINDER) -> float:
+        """Blocks until a token is available; returns the seconds spent waiting."""
+        started = time.monotonic()
+        ticket = self._enter(priority)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_take(ticket)
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(timeout=wait)
+        except BaseException:
+            self._leave(ticket)
+            raise
+        waited = time.monotonic() - started
+        RATE_WAIT.observe(waited, priority=str(priority))
+        return waited
+
+    async def acquire_async(self, priority: int = PRIORITY_REMINDER) -> float:
+        started = time.monotonic()
+        ticket = self._enter(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(ticket)
+                if wait == 0.0:
+                    break
+                await asyncio.sleep(wait if wait is not None else 1 / self.rate)
+        except BaseException:
+            # a cancelled or timed out waiter must not stay at the head of the queue
+            self._leave(ticket)
+            raise
+        waited = time.monotonic() - started
+        RATE_WAIT.observe(waited, priority=str(priority))
+        return waited
+
+    def penalize(self, seconds: float) -> None:
+        """Empties the bucket so nothing else goes out for about `seconds` (after a 429)."""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
 
 
 def _str_to_bool(value: Optional[str]) -> bool:
@@ -15,12 +360,40 @@ def _str_to_bool(value: Optional[str]) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+# send_many goes through the pooled async client instead of the thread pool
+ASYNC_SEND = _str_to_bool(os.getenv("TWILIO_ASYNC_SEND"))
+
+
+def _validate_and_normalize(to: str, body: str) -> str:
+    if not to:
+        raise ValueError("Destination phone number is required.")
+    if not body:
+        raise ValueError("SMS body cannot be empty.")
+
+    if not to.lower().startswith("whatsapp:"):
+        digits = to.strip()
+        digits = digits if digits.startswith("+") else f"+{digits}"
+        to = f"whatsapp:{digits}"
+    return to
+
+
 @dataclass
 class TwilioConfig:
     account_sid: Optional[str]
     auth_token: Optional[str]
     from_number: Optional[str]
     enabled: bool
+    base_url: str = TWILIO_API_BASE_URL
+    status_callback: Optional[str] = TWILIO_STATUS_CALLBACK_URL
+
+
+@dataclass
+class OutboundMessage:
+    """A fully built message plus whatever the caller needs to act on its result."""
+    to: str
+    body: str
+    context: Any = None
+    priority: int = PRIORITY_REMINDER
 
 
 class TwilioNotificationService:
@@ -40,45 +413,242 @@ class TwilioNotificationService:
             auth_token=auth_token,
             from_number=from_number,
             enabled=not force_mock
-            and all([account_sid, auth_token, from_number, Client is not None]),
+            and all([account_sid, auth_token, from_number, TWILIO_INSTALLED or Client is not None]),
         )
 
-        self._client: Optional[Client] = None
-        if self.config.enabled and Client is not None:
-            self._client = Client(account_sid, auth_token)
-        else:
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._rate_limits = _parse_rate_limits(RATE_LIMITS)
+        self._limiters: Dict[str, Optional[RateLimiter]] = {}
+        self._limiters_lock = threading.Lock()
+        self.breaker = CircuitBreaker()
+        if not self.config.enabled:
             logging.warning(
                 "Twilio running in mock mode. "
                 "Set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_NUMBER "
                 "and install twilio to enable real SMS delivery."
             )
 
-    def send_sms(self, *, to: str, body: str) -> Dict[str, Any]:
-        if not to:
-            raise ValueError("Destination phone number is required.")
-        if not body:
-            raise ValueError("SMS body cannot be empty.")
+    def _get_client(self):
+        """The blocking Twilio REST client, built on the first real send."""
+        if self._client is None:
+            with self._client_lock:
+                client_class = _twilio_client_class()
+                if self._client is None and client_class is not None:
+                    client = client_class(self.config.account_sid, self.config.auth_token)
+                    if self.config.base_url != DEFAULT_API_BASE_URL:
+                        client.api.base_url = self.config.base_url
+                    self._client = client
+        return self._client
 
-        if not to.lower().startswith("whatsapp:"):
-            digits = to.strip()
-            digits = digits if digits.startswith("+") else f"+{digits}"
-            to = f"whatsapp:{digits}"
+    def send_sms(self, *, to: str, body: str) -> Dict[str, Any]:
+        to = _validate_and_normalize(to, body)
 
-        if self.config.enabled and self._client is not None:
+        client = self._get_client() if self.config.enabled else None
+        if client is not None:
+            extra = {"status_callback": self.config.status_callback} if self.config.status_callback else {}
             try:
-                message = self._client.messages.create(
+                message = client.messages.create(
                     to=to,
                     from_=self.config.from_number,
                     body=body,
+                    **extra,
                 )
                 logging.info("Sent SMS via Twilio (sid=%s) to %s", message.sid, to)
                 return {"status": "sent", "sid": message.sid}
             except Exception as exc:  # pragma: no cover - network side failures
                 logging.exception("Failed to send SMS via Twilio: %s", exc)
-                return {"status": "error", "error": str(exc)}
+                return {"status": "error", "error": str(exc), "http_status": getattr(exc, "status", None)}
 
         logging.info("Mock SMS -> %s: %s", to, body)
         return {"status": "mocked"}
 
+    def limiter(self, sender: Optional[str] = None) -> Optional[RateLimiter]:
+        """The rate limiter for a sender (the configured from number by default), if it has a cap."""
+        sender = sender or self.config.from_number or ""
+        with self._limiters_lock:
+            if sender not in self._limiters:
+                rate, burst = self._rate_limits.get(sender, (RATE_PER_SECOND, RATE_PER_SECOND))
+                self._limiters[sender] = RateLimiter(sender, rate, burst) if rate > 0 else None
+            return self._limiters[sender]
+
+    def _throttled(self, limiter: Optional[RateLimiter], result: Dict[str, Any]) -> bool:
+        if result.get("http_status") != 429:
+            return False
+        THROTTLED.inc(sender=limiter.sender if limiter else self.config.from_number or "")
+        logging.warning("Provider throttled sends, pausing for %ss.", RATE_LIMIT_PENALTY_SECONDS)
+        if limiter is not None:
+            limiter.penalize(RATE_LIMIT_PENALTY_SECONDS)
+        return True
+
+    def _parked(self) -> Dict[str, Any]:
+        PARKED.inc()
+        return {
+            "status": "parked",
+            "error": "messaging provider circuit is open",
+            "retry_after": self.breaker.retry_after(),
+        }
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """One keep-alive connection pool per event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        session = self._session
+        if session is None or session.closed or self._session_loop is not loop:
+            credentials = base64.b64encode(
+                f"{self.config.account_sid or ''}:{self.config.auth_token or ''}".encode()
+            ).decode()
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_POOL_SIZE,
+                    limit_per_host=HTTP_POOL_SIZE,
+                    keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+                headers={"Authorization": f"Basic {credentials}"},
+            )
+            self._session, self._session_loop = session, loop
+        return session
+
+    async def send_sms_async(self, *, to: str, body: str) -> Dict[str, Any]:
+        """
+        Async sibling of send_sms. Posts to the Messages API over a pooled
+        connection instead of opening a new HTTPS request per message.
+        """
+        to = _validate_and_normalize(to, body)
+
+        if not self.config.enabled:
+            logging.info("Mock SMS -> %s: %s", to, body)
+            return {"status": "mocked"}
+
+        if _load_aiohttp() is None:
+            # without aiohttp the blocking client is the only way out
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(self.send_sms, to=to, body=body))
+
+        url = f"{self.config.base_url}/2010-04-01/Accounts/{self.config.account_sid}/Messages.json"
+        data = {"To": to, "From": self.config.from_number, "Body": body}
+        if self.config.status_callback:
+            data["StatusCallback"] = self.config.status_callback
+        try:
+            async with self._get_session().post(url, data=data) as response:
+                payload = await response.json(content_type=None)
+                if response.status >= 400:
+                    error = (payload or {}).get("message") or response.reason
+                    logging.error("Twilio rejected SMS to %s (%s): %s", to, response.status, error)
+                    return {"status": "error", "error": error, "http_status": response.status}
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            logging.error("Failed to send SMS via Twilio: %s", exc)
+            return {"status": "error", "error": str(exc) or type(exc).__name__}
+
+        logging.info("Sent SMS via Twilio (sid=%s) to %s", payload.get("sid"), to)
+        return {"status": "sent", "sid": payload.get("sid")}
+
+    async def _send_one_async(self, message: OutboundMessage, limit: asyncio.Semaphore) -> Dict[str, Any]:
+        limiter = self.limiter()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if not self.breaker.allow():
+                return self._parked()
+            if limiter is not None:
+                await limiter.acquire_async(message.priority)
+            async with limit:
+                started = time.perf_counter()
+                try:
+                    result = await self.send_sms_async(to=message.to, body=message.body)
+                except Exception as exc:
+                    logging.exception("Failed to send message to %s: %s", message.to, exc)
+                    result = {"status": "error", "error": str(exc)}
+                elapsed = time.perf_counter() - started
+                SEND_LATENCY.observe(elapsed, status=result.get("status", "error"))
+                self.breaker.record(result, elapsed)
+            if attempt == RATE_LIMIT_RETRIES or not self._throttled(limiter, result):
+                return result
+            if limiter is None:
+                await asyncio.sleep(RATE_LIMIT_PENALTY_SECONDS)
+        return result
+
+    async def send_many_async(
+        self, messages: List[OutboundMessage], concurrency: Optional[int] = None
+    ) -> List[Tuple[OutboundMessage, Dict[str, Any]]]:
+        """Async version of send_many: up to `concurrency` requests in flight on one pool."""
+        if not messages:
+            return []
+        limit = asyncio.Semaphore(max(1, concurrency or ASYNC_CONCURRENCY))
+        ordered = sorted(messages, key=lambda message: message.priority)
+        results = await asyncio.gather(*(self._send_one_async(message, limit) for message in ordered))
+        by_message = {id(message): result for message, result in zip(ordered, results)}
+        return [(message, by_message[id(message)]) for message in messages]
+
+    def _run_coroutine(self, coroutine):
+        """
+        Runs a coroutine on the service's own event loop thread, so sync callers
+        (scheduler ticks, webhook handlers) share one long-lived connection pool.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="sms-async", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _send_one(self, message: OutboundMessage) -> Dict[str, Any]:
+        """
+        Sends one batched message, shaped by the sender's rate limit and retried on
+        429. While the provider circuit is open the message is parked: it comes
+        back as "parked" right away and the caller's retry path picks it up later.
+        """
+        limiter = self.limiter()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if not self.breaker.allow():
+                return self._parked()
+            if limiter is not None:
+                limiter.acquire(message.priority)
+            started = time.perf_counter()
+            try:
+                result = self.send_sms(to=message.to, body=message.body)
+            except Exception as exc:
+                logging.exception("Failed to send message to %s: %s", message.to, exc)
+                result = {"status": "error", "error": str(exc)}
+            elapsed = time.perf_counter() - started
+            SEND_LATENCY.observe(elapsed, status=result.get("status", "error"))
+            self.breaker.record(result, elapsed)
+            if attempt == RATE_LIMIT_RETRIES or not self._throttled(limiter, result):
+                return result
+            if limiter is None:
+                time.sleep(RATE_LIMIT_PENALTY_SECONDS)
+        return result
+
+    def send_many(
+        self, messages: List[OutboundMessage], concurrency: Optional[int] = None
+    ) -> List[Tuple[OutboundMessage, Dict[str, Any]]]:
+        """
+        Sends messages on a bounded thread pool so one slow provider response
+        does not hold up the rest. Results come back in the same order.
+        """
+        if not messages:
+            return []
+
+        if ASYNC_SEND and _load_aiohttp() is not None:
+            return self._run_coroutine(self.send_many_async(messages, concurrency))
+
+        # patient reminders are handed out first; the limiter keeps that order when queueing
+        ordered = sorted(messages, key=lambda message: message.priority)
+        workers = max(1, min(concurrency or SEND_CONCURRENCY, len(messages)))
+        if workers == 1:
+            results = [self._send_one(message) for message in ordered]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sms-send") as pool:
+                results = list(pool.map(self._send_one, ordered))
+
+        by_message = {id(message): result for message, result in zip(ordered, results)}
+        return [(message, by_message[id(message)]) for message in messages]
+
 
 twilio_service = TwilioNotificationService()
@@ -0,0 +1,285 @@
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from backend.db import outbox
+from backend.metrics import REGISTRY
+from backend.notifications import DELIVERED_STATUSES, OutboundMessage, _str_to_bool, twilio_service
+from backend.partitioning import DUPLICATE_KEY_ERROR, WORKER_ID
+
+# outbox.py
+# durable queue between the code that decides to send a message and the provider.
+# producers enqueue messages under an idempotency key (one per dose or alert
+# instance, used as the document _id), so enqueueing the same dose twice is a
+# no-op. delivery workers lease batches, send them, and either mark them sent or
+# schedule a retry with exponential backoff; after OUTBOX_MAX_ATTEMPTS a message
+# is parked as dead for someone to look at. a worker that dies mid-batch loses
+# its lease and the batch is picked up again, so restarts do not drop messages.
+# while the provider circuit is open nothing is leased, and sends the breaker
+# parked mid-batch go back to pending without using up an attempt.
+# batches are leased in priority order, so patient reminders in a backlog are
+# sent (and spend rate limit tokens) ahead of caregiver messages.
+# caregiver alerts are enqueued one row per patient under a digest key (alert kind,
+# caregiver phone and day) and held back for a short window; when one of them is
+# leased every pending row with the same digest key comes along and they go out
+# as a single message.
+
+OUTBOX_ENABLED = _str_to_bool(os.getenv("OUTBOX_ENABLED"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "15"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "1800"))
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+LEASE_ORDER = [("priority", ASCENDING), ("next_attempt_at", ASCENDING)]
+
+
+class DigestPart(NamedTuple):
+    """Context of a message that is merged with others sharing its digest key when sent."""
+    key: str  # idempotency key of this part
+    digest: str
+    patient: str
+    missed: Tuple[str, ...]
+
+
+ENQUEUED = REGISTRY.counter("outbox_enqueued_total", "Messages added to the outbox.", ["kind"])
+DELIVERIES = REGISTRY.counter(
+    "outbox_deliveries_total", "Outbox delivery attempts by outcome.", ["kind", "outcome"]
+)
+
+
+def ensure_outbox_indexes() -> None:
+    outbox.create_index([("status", ASCENDING), ("priority", ASCENDING), ("next_attempt_at", ASCENDING)])
+    outbox.create_index([("digest", ASCENDING), ("status", ASCENDING)], sparse=True)
+    # only delivered messages carry sent_at, so dead letters are kept until handled
+    outbox.create_index("sent_at", expireAfterSeconds=OUTBOX_RETENTION_SECONDS)
+
+
+def enqueue(messages: Iterable[OutboundMessage], kind: str = "message", delay_seconds: float = 0) -> Set[str]:
+    """
+    Stores messages for delivery, due after `delay_seconds`; each message's context
+    is its idempotency key, or a DigestPart for messages to merge when sent.
+    Returns the keys that are in the outbox afterwards, including ones an earlier
+    call already enqueued. Raises PyMongoError when the outbox cannot be written,
+    so callers can leave their own state untouched and retry.
+    """
+    now = datetime.utcnow()
+    docs: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+    for message in messages:
+        part: Union[str, DigestPart] = message.context
+        key = part.key if isinstance(part, DigestPart) else part
+        if not key:
+            raise ValueError("Outbox messages need an idempotency key.")
+        if key in seen:
+            continue
+        seen.add(key)
+        docs.append({
+            "_id": key,
+            "kind": kind,
+            "to": message.to,
+            "body": message.body,
+            "priority": message.priority,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now + timedelta(seconds=delay_seconds),
+            "created_at": now,
+        })
+        if isinstance(part, DigestPart):
+            docs[-1].update(digest=part.digest, patient=part.patient, missed=list(part.missed))
+    if not docs:
+        return set()
+
+    try:
+        outbox.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        errors = (exc.details or {}).get("writeErrors", [])
+        unexpected = [error for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+        if unexpected:
+            raise
+        already = {docs[error["index"]]["_id"] for error in errors}
+        docs = [doc for doc in docs if doc["_id"] not in already]
+
+    for doc in docs:
+        ENQUEUED.inc(kind=doc["kind"])
+    return seen
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff, jittered between half and all of the step, capped at OUTBOX_BACKOFF_MAX_SECONDS."""
+    ceiling = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def build_caregiver_digest(kind: str, patients: Sequence[Tuple[str, Sequence[str]]]) -> str:
+    """One caregiver message covering several patients' missed medications."""
+    lines = []
+    for name, missed in patients:
+        count = len(missed)
+        lines.append(f"- {name} missed {count} medication{'s' if count != 1 else ''}: {', '.join(missed)}")
+    if kind == "daily_summary":
+        return "Daily summary for the people you care for:\n" + "\n".join(lines)
+    return "Alert: people you care for missed medications:\n" + "\n".join(lines) + "\nPlease check on them."
+
+
+def _lease_batch(now: datetime, batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Leases up to batch_size due messages, including ones whose previous lease ran
+    out, highest priority (lowest value) and longest waiting first. Pending rows
+    sharing a digest key with a leased one are leased with it, even before they
+    are due, so they can be sent together.
+    """
+    due = {
+        "$or": [
+            {"status": PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": SENDING, "lease_until": {"$lt": now}},
+        ]
+    }
+    cursor = outbox.find(due, {"_id": 1, "priority": 1, "next_attempt_at": 1})
+    ids = [doc["_id"] for doc in cursor.sort(LEASE_ORDER).limit(batch_size)]
+    if not ids:
+        return []
+
+    lease = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    leased = {
+        "status": SENDING,
+        "lease": lease,
+        "lease_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+    }
+    outbox.update_many({"_id": {"$in": ids}, **due}, {"$set": leased})
+    # another worker may have leased some of them in between
+    docs = list(outbox.find({"lease": lease, "status": SENDING}))
+
+    digests = list({doc["digest"] for doc in docs if doc.get("digest")})
+    if digests:
+        outbox.update_many({"digest": {"$in": digests}, "status": PENDING}, {"$set": leased})
+        docs = list(outbox.find({"lease": lease, "status": SENDING}))
+    return docs
+
+
+def _batch_messages(docs: List[Dict[str, Any]]) -> List[OutboundMessage]:
+    """One message per leased row, or per digest key for rows that carry one; the context lists the rows."""
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        groups.setdefault(doc.get("digest") or ("_id", doc["_id"]), []).append(doc)
+
+    messages = []
+    for rows in groups.values():
+        first = rows[0]
+        body = first["body"]
+        if len(rows) > 1:
+            patients = [(row.get("patient", "The user"), row.get("missed", [])) for row in rows]
+            body = build_caregiver_digest(first.get("kind", "message"), patients)
+        messages.append(OutboundMessage(to=first["to"], body=body, context=rows, priority=first.get("priority", 0)))
+    return messages
+
+
+def deliver_batch(now: Optional[datetime] = None, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Leases, sends and settles one batch. Returns how many messages were attempted."""
+    now = now or datetime.utcnow()
+    if twilio_service.breaker.is_open():
+        return 0
+    docs = _lease_batch(now, batch_size)
+    if not docs:
+        return 0
+
+    for message, result in twilio_service.send_many(_batch_messages(docs)):
+        for doc in message.context:
+            _settle(doc, result, now)
+    return len(docs)
+
+
+def _settle(doc: Dict[str, Any], result: Dict[str, Any], now: datetime) -> None:
+    """Records the outcome of one send attempt on its outbox row."""
+    status = result.get("status", "error")
+    attempts = doc.get("attempts", 0) + 1
+    settled = {"lease": None, "lease_until": None, "attempts": attempts, "last_status": status}
+
+    if status == "parked":
+        settled.update(
+            status=PENDING,
+            attempts=attempts - 1,
+            next_attempt_at=now + timedelta(seconds=result.get("retry_after", 0)),
+        )
+        outcome = "parked"
+    elif status in DELIVERED_STATUSES:
+        settled.update(status=SENT, sent_at=datetime.utcnow(), sid=result.get("sid"), last_error=None)
+        outcome = "sent"
+    elif attempts >= OUTBOX_MAX_ATTEMPTS:
+        settled.update(status=DEAD, last_error=result.get("error"))
+        outcome = "dead"
+        logging.error(
+            "Outbox message %s to %s failed %s times, moved to dead letters: %s",
+            doc["_id"], doc["to"], attempts, result.get("error"),
+        )
+    else:
+        settled.update(
+            status=PENDING,
+            next_attempt_at=now + timedelta(seconds=backoff_seconds(attempts)),
+            last_error=result.get("error"),
+        )
+        outcome = "retry"
+
+    DELIVERIES.inc(kind=doc.get("kind", "message"), outcome=outcome)
+    try:
+        # the lease check keeps a worker that overran its lease from undoing a newer result
+        outbox.update_one({"_id": doc["_id"], "lease": doc["lease"]}, {"$set": settled})
+    except PyMongoError as exc:
+        logging.warning("Unable to settle outbox message %s, it is retried after the lease: %s",
+                        doc["_id"], exc)
+
+
+def requeue_dead(keys: Optional[Iterable[str]] = None) -> int:
+    """Moves dead letters (all of them, or the given keys) back to pending."""
+    query: Dict[str, Any] = {"status": DEAD}
+    if keys is not None:
+        query["_id"] = {"$in": list(keys)}
+    result = outbox.update_many(
+        query, {"$set": {"status": PENDING, "attempts": 0, "next_attempt_at": datetime.utcnow()}}
+    )
+    return result.modified_count
+
+
+class OutboxWorker:
+    """Background thread that keeps delivering outbox batches until stopped."""
+
+    def __init__(self, logger=None, poll_seconds: float = OUTBOX_POLL_SECONDS) -> None:
+        self._logger = logger or logging.getLogger(__name__)
+        self._poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                attempted = deliver_batch()
+            except PyMongoError as exc:
+                self._logger.warning("Outbox delivery failed, retrying: %s", exc)
+                attempted = 0
+            # a full batch means there is probably more waiting
+            if attempted < OUTBOX_BATCH_SIZE:
+                self._stop.wait(self._poll_seconds)
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo.errors import PyMongoError
+
+from backend.db import parse_cache as parse_cache_collection
+from backend.metrics import REGISTRY
+from backend.notifications import _str_to_bool
+
+# parseCache.py
+# remembers what the model made of a command text, so "add metformin 8 am" sent
+# by the hundredth user does not cost another openai round trip. a bounded LRU
+# in the process answers repeats on the same worker; with AI_PARSE_CACHE_MONGO
+# set a shared collection (expired by a ttl index) lets every worker reuse one
+# parse. keys are the normalized text, the kind of parse (one medicine or a
+# batch) and AI_PARSE_CACHE_VERSION, so changing the prompt or model only
+# needs a version bump to start from a clean cache.
+
+AI_PARSE_CACHE_ENABLED = _str_to_bool(os.getenv("AI_PARSE_CACHE", "true"))
+AI_PARSE_CACHE_SIZE = int(os.getenv("AI_PARSE_CACHE_SIZE", "2048"))
+AI_PARSE_CACHE_TTL_SECONDS = int(os.getenv("AI_PARSE_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+AI_PARSE_CACHE_MONGO = _str_to_bool(os.getenv("AI_PARSE_CACHE_MONGO"))
+AI_PARSE_CACHE_VERSION = os.getenv("AI_PARSE_CACHE_VERSION", "2")
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "ai_parse_cache_lookups_total", "Parse cache lookups by tier and result.", ["tier", "result"]
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "ai_parse_cache_evictions_total", "In-process parse cache entries dropped to stay within size."
+)
+
+_PUNCTUATION = re.compile(r"[^\w:.\s]")
+
+
+def normalize_text(message_text: str) -> str:
+    """Lowercases, drops punctuation other than ':' and '.', and collapses whitespace."""
+    return " ".join(_PUNCTUATION.sub(" ", message_text.lower()).split())
+
+
+class ParseCache:
+    """LRU with per-entry expiry, optionally backed by a shared mongo collection."""
+
+    def __init__(
+        self,
+        max_size: int = AI_PARSE_CACHE_SIZE,
+        ttl_seconds: int = AI_PARSE_CACHE_TTL_SECONDS,
+        collection=None,
+        version: str = AI_PARSE_CACHE_VERSION,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self.version = version
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, parsed)
+        self._lock = threading.Lock()
+        self._indexes_ready = False
+
+    def key(self, message_text: str, kind: str = "medicine") -> str:
+        digest = hashlib.sha256(normalize_text(message_text).encode("utf-8")).hexdigest()
+        return f"v{self.version}:{kind}:{digest}"
+
+    def get(self, message_text: str, kind: str = "medicine") -> Optional[Dict[str, Any]]:
+        key = self.key(message_text, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                CACHE_LOOKUPS.inc(tier="memory", result="hit")
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+        CACHE_LOOKUPS.inc(tier="memory", result="miss")
+
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except PyMongoError as exc:
+            logging.warning("Parse cache lookup failed, asking the model: %s", exc)
+            return None
+        if doc is None:
+            CACHE_LOOKUPS.inc(tier="mongo", result="miss")
+            return None
+        CACHE_LOOKUPS.inc(tier="mongo", result="hit")
+        self._remember(key, doc["parsed"])
+        return dict(doc["parsed"])
+
+    def put(self, message_text: str, parsed: Dict[str, Any], kind: str = "medicine") -> None:
+        key = self.key(message_text, kind)
+        self._remember(key, parsed)
+        if self.collection is None:
+            return
+        try:
+            self._ensure_indexes()
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "parsed": dict(parsed),
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                }},
+                upsert=True,
+            )
+        except PyMongoError as exc:
+            logging.warning("Unable to store parse in the shared cache: %s", exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, parsed: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, dict(parsed))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc()
+
+    def _ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+
+parse_cache = ParseCache(collection=parse_cache_collection if AI_PARSE_CACHE_MONGO else None)
@@ -0,0 +1,124 @@
+import logging
+import os
+import re
+import socket
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Set
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from backend.db import dose_claims
+
+# partitioning.py
+# splits the user base across several scheduler processes. every user carries a
+# stable partition_hash (crc32 of the phone digits) and worker i of N only looks at
+# users where partition_hash % N == i. dose claims make sure a dose is sent by one
+# worker only, even while N is being changed and old and new workers overlap.
+# a claim is marked done once its send went out, and a done claim is never taken
+# over, so a dose whose reminder_log write failed is not sent a second time.
+
+PARTITION_COUNT = max(1, int(os.getenv("SCHEDULER_PARTITION_COUNT", "1")))
+PARTITION_INDEX = int(os.getenv("SCHEDULER_PARTITION_INDEX", "0")) % PARTITION_COUNT
+CLAIM_LEASE_SECONDS = int(os.getenv("SCHEDULER_CLAIM_LEASE_SECONDS", "120"))
+CLAIM_TTL_SECONDS = 2 * 24 * 60 * 60
+WORKER_ID = os.getenv("SCHEDULER_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+DUPLICATE_KEY_ERROR = 11000
+
+
+def partition_hash(phone: str) -> int:
+    """Stable hash of the phone digits so the whatsapp: prefix or formatting never moves a user."""
+    digits = re.sub(r"\D", "", phone or "")
+    return zlib.crc32(digits.encode("utf-8"))
+
+
+def partition_filter() -> Dict[str, Any]:
+    """Mongo filter for the users owned by this worker (empty when unpartitioned)."""
+    if PARTITION_COUNT == 1:
+        return {}
+    return {"partition_hash": {"$mod": [PARTITION_COUNT, PARTITION_INDEX]}}
+
+
+def owns_user(user: Dict[str, Any]) -> bool:
+    if PARTITION_COUNT == 1:
+        return True
+    value = user.get("partition_hash")
+    if value is None:
+        value = partition_hash(user.get("phone", ""))
+    return value % PARTITION_COUNT == PARTITION_INDEX
+
+
+def ensure_claim_indexes() -> None:
+    dose_claims.create_index("claimed_at", expireAfterSeconds=CLAIM_TTL_SECONDS)
+
+
+def claim(keys: Iterable[str]) -> Set[str]:
+    """
+    Claims send keys (one per dose or alert instance) for this worker and returns
+    the ones it now owns. Keys held by another worker are skipped unless their
+    lease ran out before the send was marked done, which means that worker died
+    between claiming and sending.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return set()
+
+    now = datetime.utcnow()
+    docs = [{"_id": key, "owner": WORKER_ID, "claimed_at": now} for key in keys]
+    try:
+        dose_claims.insert_many(docs, ordered=False)
+        return set(keys)
+    except BulkWriteError as exc:
+        errors = (exc.details or {}).get("writeErrors", [])
+    except PyMongoError as exc:
+        logging.warning("Unable to claim %s sends, skipping them this tick: %s", len(keys), exc)
+        return set()
+
+    failed = {docs[error["index"]]["_id"] for error in errors}
+    owned = set(keys) - failed
+    duplicates = [
+        docs[error["index"]]["_id"] for error in errors if error.get("code") == DUPLICATE_KEY_ERROR
+    ]
+    stale_before = now - timedelta(seconds=CLAIM_LEASE_SECONDS)
+    for key in duplicates:
+        try:
+            result = dose_claims.update_one(
+                {
+                    "_id": key,
+                    "owner": {"$ne": WORKER_ID},
+                    "claimed_at": {"$lt": stale_before},
+                    "done": {"$ne": True},
+                },
+                {"$set": {"owner": WORKER_ID, "claimed_at": now}},
+            )
+        except PyMongoError:
+            continue
+        if result.modified_count:
+            owned.add(key)
+    return owned
+
+
+def release(keys: Iterable[str]) -> None:
+    """Gives up claims for sends that failed so the next tick can retry them."""
+    keys = list(keys)
+    if not keys:
+        return
+    try:
+        dose_claims.delete_many({"_id": {"$in": keys}, "owner": WORKER_ID})
+    except PyMongoError as exc:
+        logging.warning("Unable to release %s claims, they expire after the lease: %s", len(keys), exc)
+
+
+def complete(keys: Iterable[str]) -> None:
+    """Marks claims whose send was delivered, so they outlive the lease."""
+    keys = list(keys)
+    if not keys:
+        return
+    try:
+        dose_claims.update_many(
+            {"_id": {"$in": keys}, "owner": WORKER_ID},
+            {"$set": {"done": True, "done_at": datetime.utcnow()}},
+        )
+    except PyMongoError as exc:
+        logging.warning("Unable to mark %s claims done, they can be taken over after the lease: %s",
+                        len(keys), exc)
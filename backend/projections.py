@@ -0,0 +1,78 @@
+# projections.py
+# named field projections for every read of the users collection.
+# user documents carry caregivers, reminder logs, alert logs and timestamps that
+# most code paths never look at, so each read asks only for the view it needs.
+# when a code path starts reading a new field, add it to its view here.
+
+_MED_SCHEDULE_FIELDS = {
+    "medications.name": 1,
+    "medications.times": 1,
+    "medications.frequency": 1,
+    "medications.days": 1,
+    "medications.reminder_log": 1,
+}
+
+# everything a scheduler tick reads: due reminders plus the missed-dose check
+DISPATCH_VIEW = {
+    "phone": 1,
+    "name": 1,
+    "timezone": 1,
+    "next_due_at": 1,
+    "next_missed_check_at": 1,
+    "caregivers.name": 1,
+    "caregivers.phone": 1,
+    "caregivers.notify_when": 1,
+    "caregiver_alert_log": 1,
+    "medications.dosage": 1,
+    "medications.status": 1,
+    **_MED_SCHEDULE_FIELDS,
+}
+
+# recomputing next_due_at, next_missed_check_at and partition_hash
+SCHEDULE_VIEW = {
+    "phone": 1,
+    "timezone": 1,
+    "caregivers.phone": 1,
+    "caregivers.notify_when": 1,
+    "caregiver_alert_log": 1,
+    "medications.status": 1,
+    **_MED_SCHEDULE_FIELDS,
+}
+
+# the scheduler's resident schedule index mirror
+INDEX_VIEW = {
+    "phone": 1,
+    "paused": 1,
+    "timezone": 1,
+    "partition_hash": 1,
+    "next_missed_check_at": 1,
+    **_MED_SCHEDULE_FIELDS,
+}
+
+# building the sms logging stack
+STACK_VIEW = {
+    "name": 1,
+    "caregivers.name": 1,
+    "caregivers.phone": 1,
+    "caregivers.notify_when": 1,
+    "caregiver_alert_log.missed_threshold": 1,
+    "medications.name": 1,
+    "medications.times": 1,
+    "medications.dosage": 1,
+    "medications.status": 1,
+    "medications.frequency": 1,
+    "medications.days": 1,
+}
+
+# what the api returns for a user, without the scheduler's bookkeeping
+PROFILE_VIEW = {
+    "medications.reminder_log": 0,
+    "medications.last_reminder_at": 0,
+    "caregiver_alert_log": 0,
+    "next_due_at": 0,
+    "next_missed_check_at": 0,
+    "partition_hash": 0,
+}
+
+# existence checks that only need the document id
+ID_VIEW = {"_id": 1}
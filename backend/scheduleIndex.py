@@ -0,0 +1,319 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import pytz
+from pymongo.errors import PyMongoError
+
+from backend.projections import INDEX_VIEW
+
+# scheduleIndex.py
+# resident in-memory view of upcoming doses for the scheduler process.
+# it loads the users collection once and then follows a change stream so each
+# tick can look up who is due without querying mongo. change streams need a
+# replica set (a single-node local one is enough); without one the scheduler
+# keeps using the indexed next_due_at query instead.
+
+RECONNECT_DELAY_SECONDS = 5
+# the heap is rebuilt from the live entries once stale ones outnumber them
+HEAP_COMPACT_RATIO = 2
+HEAP_COMPACT_MIN = 1024
+
+
+class DoseEntry(NamedTuple):
+    user_id: Any
+    phone: str
+    medicine_name: str
+    time: str
+    due_at: datetime
+
+
+ExpandFn = Callable[[Dict[str, Any], datetime], Iterable[Tuple[datetime, str, str]]]
+CheckFn = Callable[[Dict[str, Any]], Optional[datetime]]
+
+
+def _minute_key(moment: datetime) -> datetime:
+    return moment.astimezone(pytz.utc).replace(second=0, microsecond=0)
+
+
+def _mirror(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Keeps only the schedule fields of a full user document."""
+    meds = []
+    for med in doc.get("medications", []) or []:
+        meds.append({key: med[key] for key in ("name", "times", "frequency", "days", "reminder_log") if key in med})
+    mirrored = {
+        key: doc[key]
+        for key in ("_id", "phone", "paused", "timezone", "partition_hash", "next_missed_check_at")
+        if key in doc
+    }
+    mirrored["medications"] = meds
+    return mirrored
+
+
+class ScheduleIndex:
+    """
+    Upcoming doses keyed by due minute (UTC). Entries hold the phone, medicine
+    and time so a tick only needs to fetch the users that actually have work.
+    The optional `check_at` gives the instant a user next needs a caregiver
+    check; those are kept by minute too.
+    """
+
+    def __init__(
+        self,
+        expand: ExpandFn,
+        tz: pytz.BaseTzInfo = pytz.utc,
+        logger: Optional[logging.Logger] = None,
+        check_at: Optional[CheckFn] = None,
+    ) -> None:
+        self._expand = expand
+        self._check_at = check_at
+        self._tz = tz
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._by_minute: Dict[datetime, Set[DoseEntry]] = defaultdict(set)
+        self._entries_by_user: Dict[Any, List[DoseEntry]] = {}
+        self._checks_by_minute: Dict[datetime, Set[Any]] = defaultdict(set)
+        self._check_by_user: Dict[Any, datetime] = {}
+        # min-heap of (due_at, seq, entry) behind next_due_after, kept only once
+        # track_next_due() was called; removed entries are skipped lazily
+        self._heap: List[Tuple[datetime, int, DoseEntry]] = []
+        self._heap_enabled = False
+        self._live = 0
+        self._seq = itertools.count()
+        self._listeners: List[Callable[[], None]] = []
+        self._built_for: Optional[date] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stream = None
+        self._query: Dict[str, Any] = {}
+        self.ready = False
+
+    # index maintenance
+
+    def load(self, docs: Iterable[Dict[str, Any]], now: datetime) -> None:
+        with self._lock:
+            self._docs = {}
+            self._by_minute = defaultdict(set)
+            self._entries_by_user = {}
+            self._checks_by_minute = defaultdict(set)
+            self._check_by_user = {}
+            self._heap = []
+            self._live = 0
+            for doc in docs:
+                self._index(_mirror(doc), now)
+            self._built_for = now.astimezone(self._tz).date()
+        self._notify()
+
+    def upsert(self, doc: Dict[str, Any], now: datetime) -> None:
+        with self._lock:
+            self._unindex(doc["_id"])
+            self._index(_mirror(doc), now)
+        self._notify()
+
+    def remove(self, user_id: Any) -> None:
+        with self._lock:
+            self._unindex(user_id)
+        self._notify()
+
+    def track_next_due(self) -> None:
+        """Starts keeping the min-heap next_due_after reads; only exact dispatch needs it."""
+        with self._lock:
+            if not self._heap_enabled:
+                self._heap_enabled = True
+                self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [
+            (entry.due_at, next(self._seq), entry)
+            for entries in self._entries_by_user.values()
+            for entry in entries
+        ]
+        heapq.heapify(self._heap)
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Registers a callback run after every change, e.g. to wake a timer."""
+        self._listeners.append(callback)
+
+    def _notify(self) -> None:
+        for callback in self._listeners:
+            callback()
+
+    def _index(self, doc: Dict[str, Any], now: datetime) -> None:
+        user_id = doc["_id"]
+        self._docs[user_id] = doc
+        entries = [
+            DoseEntry(user_id, doc.get("phone", ""), name, time_str, due_at)
+            for due_at, name, time_str in self._expand(doc, now)
+        ]
+        self._entries_by_user[user_id] = entries
+        self._live += len(entries)
+        for entry in entries:
+            self._by_minute[_minute_key(entry.due_at)].add(entry)
+            if self._heap_enabled:
+                heapq.heappush(self._heap, (entry.due_at, next(self._seq), entry))
+        if len(self._heap) > max(HEAP_COMPACT_MIN, HEAP_COMPACT_RATIO * self._live):
+            self._rebuild_heap()
+
+        check_at = self._check_at(doc) if self._check_at else None
+        if check_at is not None:
+            self._check_by_user[user_id] = check_at
+            self._checks_by_minute[_minute_key(check_at)].add(user_id)
+
+    def _unindex(self, user_id: Any) -> None:
+        self._docs.pop(user_id, None)
+        entries = self._entries_by_user.pop(user_id, [])
+        self._live -= len(entries)
+        for entry in entries:
+            minute = _minute_key(entry.due_at)
+            bucket = self._by_minute.get(minute)
+            if bucket is None:
+                continue
+            bucket.discard(entry)
+            if not bucket:
+                del self._by_minute[minute]
+
+        check_at = self._check_by_user.pop(user_id, None)
+        if check_at is not None:
+            minute = _minute_key(check_at)
+            self._checks_by_minute[minute].discard(user_id)
+            if not self._checks_by_minute[minute]:
+                del self._checks_by_minute[minute]
+
+    def _rollover(self, now: datetime) -> None:
+        """Re-expands every mirrored user from memory once the day changes."""
+        if self._built_for == now.astimezone(self._tz).date():
+            return
+        docs = list(self._docs.values())
+        self.load(docs, now)
+
+    # lookups
+
+    def due(self, window_start: datetime, window_end: datetime, now: datetime) -> List[DoseEntry]:
+        with self._lock:
+            self._rollover(now)
+            found: List[DoseEntry] = []
+            minute = _minute_key(window_start)
+            last = _minute_key(window_end)
+            while minute <= last:
+                for entry in self._by_minute.get(minute, ()):
+                    if window_start <= entry.due_at <= window_end:
+                        found.append(entry)
+                minute += timedelta(minutes=1)
+            return found
+
+    def next_due_after(self, after: datetime) -> Optional[datetime]:
+        """Earliest indexed dose instant strictly after `after`, or None."""
+        with self._lock:
+            self.track_next_due()
+            while self._heap:
+                due_at, _, entry = self._heap[0]
+                live = entry in self._by_minute.get(_minute_key(due_at), ())
+                if live and due_at > after:
+                    return due_at
+                heapq.heappop(self._heap)
+            return None
+
+    def user_ids_due(self, window_start: datetime, window_end: datetime, now: datetime) -> Set[Any]:
+        return {entry.user_id for entry in self.due(window_start, window_end, now)}
+
+    def user_ids_checking(self, now: datetime) -> Set[Any]:
+        """Ids of users whose caregiver check instant is at or before `now`."""
+        with self._lock:
+            last = _minute_key(now)
+            return {
+                user_id
+                for minute, user_ids in self._checks_by_minute.items() if minute <= last
+                for user_id in user_ids if self._check_by_user[user_id] <= now
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self._by_minute.values())
+
+    # change stream
+
+    def start(self, collection, query: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Opens the change stream, loads the users matching `query` and starts
+        following the collection. The expand function decides what to keep from
+        later changes.
+        """
+        self._query = query or {}
+        try:
+            self._open(collection)
+        except PyMongoError as exc:
+            self._logger.warning("Schedule index disabled, change streams unavailable: %s", exc)
+            return False
+
+        self._thread = threading.Thread(
+            target=self._follow, args=(collection,), name="schedule-index", daemon=True
+        )
+        self._thread.start()
+        self._logger.info("Schedule index loaded with %s upcoming doses.", len(self))
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.ready = False
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except PyMongoError:
+                pass
+
+    def _open(self, collection) -> None:
+        # the stream is opened before loading so no change between the two is lost
+        # change events only carry the mirrored fields of the looked-up document
+        pipeline = [{"$project": {
+            "operationType": 1,
+            "documentKey": 1,
+            **{f"fullDocument.{field}": 1 for field in INDEX_VIEW},
+        }}]
+        self._stream = collection.watch(pipeline, full_document="updateLookup")
+        self.load(collection.find(self._query, INDEX_VIEW), datetime.now(self._tz))
+        self.ready = True
+
+    def _follow(self, collection) -> None:
+        while not self._stop.is_set():
+            try:
+                for change in self._stream:
+                    self.apply_change(change, datetime.now(self._tz))
+                    if self._stop.is_set():
+                        return
+                self._logger.warning("Schedule index change stream closed, reloading.")
+            except PyMongoError as exc:
+                if self._stop.is_set():
+                    return
+                self._logger.warning("Schedule index change stream lost, reloading: %s", exc)
+
+            # ticks fall back to the next_due_at query until the reload succeeds
+            self.ready = False
+
+            while not self._stop.is_set():
+                time.sleep(RECONNECT_DELAY_SECONDS)
+                try:
+                    self._open(collection)
+                    break
+                except PyMongoError as exc:
+                    self._logger.warning("Schedule index reload failed: %s", exc)
+
+    def apply_change(self, change: Dict[str, Any], now: datetime) -> None:
+        operation = change.get("operationType")
+        user_id = (change.get("documentKey") or {}).get("_id")
+        if operation == "delete":
+            self.remove(user_id)
+        elif operation in {"insert", "update", "replace"}:
+            doc = change.get("fullDocument")
+            if doc is None:
+                # the document was deleted before the lookup ran
+                self.remove(user_id)
+            else:
+                self.upsert(doc, now)
+        elif operation in {"drop", "rename", "invalidate"}:
+            self.load([], now)
@@ -1,67 +1,185 @@
 import atexit
+import hashlib
 import logging
 import os
+import threading
+import time
 from copy import deepcopy
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 import pytz
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
 from apscheduler.schedulers.background import BackgroundScheduler 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from backend.db import users
-from backend.notifications import twilio_service
+from backend.metrics import REGISTRY
+from backend.notifications import (
+    DELIVERED_STATUSES,
+    PRIORITY_CAREGIVER,
+    OutboundMessage,
+    _str_to_bool,
+    twilio_service,
+)
+from backend.partitioning import (
+    PARTITION_COUNT,
+    PARTITION_INDEX,
+    claim,
+    complete,
+    ensure_claim_indexes,
+    owns_user,
+    partition_filter,
+    partition_hash,
+    release,
+)
+from backend.loggingStack import normalize_caregiver_phone
+from backend.projections import DISPATCH_VIEW, SCHEDULE_VIEW
+from backend.exactDispatch import ExactDispatcher
+from backend.nextDue import (
+    DAILY_SUMMARY_HOUR,
+    DEFAULT_TIMEZONE,
+    MISSED_DOSE_GRACE_MINUTES,
+    REMINDER_WINDOW_MINUTES,
+    _caregiver_wants,
+    _get_timezone,
+    _iter_pending_doses,
+    _med_is_scheduled_today,
+    _parse_med_time,
+    compute_next_due_at,
+    compute_next_missed_check_at,
+)
+from backend.outbox import OUTBOX_ENABLED, DigestPart, OutboxWorker, enqueue, ensure_outbox_indexes
+from backend.scheduleIndex import ScheduleIndex
 
-DEFAULT_TZ = os.getenv("DEFAULT_TIMEZONE", "US/Eastern")
 REMINDER_POLL_MINUTES = int(os.getenv("REMINDER_POLL_MINUTES", "1"))
-REMINDER_WINDOW_MINUTES = int(os.getenv("REMINDER_WINDOW_MINUTES", "5"))
-DAILY_SUMMARY_HOUR = int(os.getenv("CAREGIVER_DAILY_SUMMARY_HOUR", "20"))
-WEEKDAY_ALIASES = {
-    "mon": 0,
-    "monday": 0,
-    "tue": 1,
-    "tuesday": 1,
-    "wed": 2,
-    "wednesday": 2,
-    "thu": 3,
-    "thursday": 3,
-    "fri": 4,
-    "friday": 4,
-    "sat": 5,
-    "saturday": 5,
-    "sun": 6,
-    "sunday": 6,
-}
-
-try:
-    DEFAULT_TIMEZONE = pytz.timezone(DEFAULT_TZ)
-except Exception: 
-    DEFAULT_TIMEZONE = pytz.timezone("US/Eastern")
+SCHEDULE_INDEX_ENABLED = _str_to_bool(os.getenv("SCHEDULE_INDEX_ENABLED", "true"))
+SCHEDULE_INDEX_HORIZON_DAYS = 2
+BULK_FLUSH_SIZE = int(os.getenv("SCHEDULER_BULK_FLUSH_SIZE", "500"))
+BULK_ORDERED = _str_to_bool(os.getenv("SCHEDULER_BULK_ORDERED", "false"))
+# one message per user listing every dose due in the window, instead of one per dose
+REMINDER_COALESCE = _str_to_bool(os.getenv("REMINDER_COALESCE", "true"))
+# one missed-dose alert / daily summary per caregiver phone covering all their patients:
+# caregiver alerts wait in the outbox for CAREGIVER_DIGEST_SECONDS and every alert for
+# the same phone that arrives meanwhile is sent with them (the outbox worker runs even
+# without OUTBOX_ENABLED, for these only)
+CAREGIVER_DIGEST = _str_to_bool(os.getenv("CAREGIVER_DIGEST", "true"))
+CAREGIVER_DIGEST_SECONDS = int(os.getenv("CAREGIVER_DIGEST_SECONDS", "300"))
+# "poll" checks every REMINDER_POLL_MINUTES; "exact" sleeps until the next dose
+# instant and runs a reconciliation sweep every SCHEDULER_RECONCILE_MINUTES
+DISPATCH_MODE = os.getenv("SCHEDULER_DISPATCH_MODE", "poll").strip().lower()
+RECONCILE_MINUTES = int(os.getenv("SCHEDULER_RECONCILE_MINUTES", "5"))
+# how far back the first full tick after a provider outage looks for doses that
+# could not be sent while the circuit was open (direct-send mode)
+REMINDER_CATCH_UP_MINUTES = int(os.getenv("REMINDER_CATCH_UP_MINUTES", "180"))
 
 _scheduler: Optional[BackgroundScheduler] = None
+_schedule_index: Optional[ScheduleIndex] = None
+_exact_dispatcher: Optional[ExactDispatcher] = None
+_outbox_worker: Optional[OutboxWorker] = None
+_tick_lock = threading.Lock()
+# start of the earliest window whose reminders were skipped or parked by the breaker
+_catch_up_since: Optional[datetime] = None
+
+# lag is negative when polling sends a dose up to REMINDER_WINDOW_MINUTES early
+LAG_BUCKETS = (-300, -60, -10, 0, 1, 5, 15, 30, 60, 120, 300, 900)
+TICK_DURATION = REGISTRY.histogram(
+    "scheduler_tick_duration_seconds", "Wall time of a scheduler tick.", ["trigger"]
+)
+SCAN_DURATION = REGISTRY.histogram(
+    "scheduler_scan_duration_seconds", "Time spent reading and evaluating candidate users.", ["trigger"]
+)
+USERS_SCANNED = REGISTRY.counter("scheduler_users_scanned_total", "Users read and evaluated by ticks.")
+DOSES_EVALUATED = REGISTRY.counter("scheduler_doses_evaluated_total", "Dose times evaluated by ticks.")
+REMINDERS_SENT = REGISTRY.counter(
+    "scheduler_reminders_sent_total", "Patient reminders handed to the provider.", ["status"]
+)
+CAREGIVER_ALERTS = REGISTRY.counter(
+    "scheduler_caregiver_alerts_total", "Caregiver alerts handed to the provider.", ["kind", "status"]
+)
+TICKS_SKIPPED = REGISTRY.counter(
+    "scheduler_ticks_skipped_total",
+    "Ticks skipped because the previous one was still running or the provider circuit was open.",
+    ["reason"],
+)
+DISPATCH_LAG = REGISTRY.histogram(
+    "scheduler_dispatch_lag_seconds", "Actual send time minus the scheduled dose time.", ["trigger"],
+    buckets=LAG_BUCKETS,
+)
+LAST_TICK = REGISTRY.gauge(
+    "scheduler_last_tick_timestamp_seconds", "Unix time the last tick finished.", ["trigger"]
+)
 
 
 def start_scheduler(app) -> Optional[BackgroundScheduler]:
-    global _scheduler
+    global _scheduler, _schedule_index, _exact_dispatcher, _outbox_worker
 
     if _scheduler and _scheduler.running:
         app.logger.info("Medication scheduler already running.")
         return _scheduler
 
+    try:
+        _ensure_indexes()
+        _backfill_next_due_at(app)
+    except PyMongoError as exc:
+        app.logger.warning("Unable to prepare next_due_at index: %s", exc)
+
+    if SCHEDULE_INDEX_ENABLED and _schedule_index is None:
+        index = ScheduleIndex(_index_entries, tz=DEFAULT_TIMEZONE, logger=app.logger, check_at=_index_check_at)
+        if index.start(users, partition_filter()):
+            _schedule_index = index
+
+    mode = DISPATCH_MODE
+    if mode == "exact" and _schedule_index is None:
+        app.logger.warning("Exact dispatch needs the schedule index, falling back to polling.")
+        mode = "poll"
+
     _scheduler = BackgroundScheduler(timezone=DEFAULT_TIMEZONE)
-    _scheduler.add_job(
-        func=_dispatch_due_reminders,
-        trigger="interval",
-        minutes=REMINDER_POLL_MINUTES,
-        id="medication_reminders",
-        max_instances=1,
-        replace_existing=True,
-        args=[app],
-    )
+    _scheduler.add_listener(_on_tick_skipped, EVENT_JOB_MAX_INSTANCES)
+    if mode == "exact":
+        _exact_dispatcher = ExactDispatcher(
+            _schedule_index,
+            fire=lambda user_ids, now: _fire_exact(app, user_ids, now),
+            logger=app.logger,
+        )
+        _exact_dispatcher.start()
+        _scheduler.add_job(
+            func=_reconcile_exact_dispatch,
+            trigger="interval",
+            minutes=RECONCILE_MINUTES,
+            id="medication_reminders",
+            max_instances=1,
+            replace_existing=True,
+            args=[app],
+            # the first sweep covers doses that came due while the process was down
+            next_run_time=datetime.now(DEFAULT_TIMEZONE),
+        )
+    else:
+        _scheduler.add_job(
+            func=_dispatch_due_reminders,
+            trigger="interval",
+            minutes=REMINDER_POLL_MINUTES,
+            id="medication_reminders",
+            max_instances=1,
+            replace_existing=True,
+            args=[app],
+        )
     _scheduler.start()
+
+    if (OUTBOX_ENABLED or CAREGIVER_DIGEST) and _outbox_worker is None:
+        _outbox_worker = OutboxWorker(logger=app.logger)
+        _outbox_worker.start()
+
     app.logger.info(
-        "Medication reminder scheduler started (poll=%s min, window=%s min).",
-        REMINDER_POLL_MINUTES,
+        "Medication reminder scheduler started "
+        "(mode=%s, poll=%s min, window=%s min, partition=%s/%s, outbox=%s).",
+        mode,
+        RECONCILE_MINUTES if mode == "exact" else REMINDER_POLL_MINUTES,
         REMINDER_WINDOW_MINUTES,
+        PARTITION_INDEX,
+        PARTITION_COUNT,
+        OUTBOX_ENABLED,
     )
 
     atexit.register(lambda: _shutdown_scheduler(app))
@@ -69,93 +187,119 @@ def start_scheduler(app) -> Optional[BackgroundScheduler]:
 
 
 def _shutdown_scheduler(app) -> None:
-    global _scheduler
+    global _scheduler, _schedule_index, _exact_dispatcher, _outbox_worker
     if _scheduler and _scheduler.running:
         app.logger.info("Stopping medication reminder scheduler.")
         _scheduler.shutdown(wait=False)
         _scheduler = None
+    if _exact_dispatcher is not None:
+        _exact_dispatcher.stop()
+        _exact_dispatcher = None
+    if _schedule_index is not None:
+        _schedule_index.stop()
+        _schedule_index = None
+    if _outbox_worker is not None:
+        _outbox_worker.stop()
+        _outbox_worker = None
 
 
-def _get_timezone(user_tz: Optional[str]) -> pytz.timezone:
-    if not user_tz:
-        return DEFAULT_TIMEZONE
-    try:
-        return pytz.timezone(user_tz)
-    except Exception:
-        logging.warning("Unknown timezone '%s'. Falling back to default.", user_tz)
-        return DEFAULT_TIMEZONE
-
+def _on_tick_skipped(event) -> None:
+    TICKS_SKIPPED.inc(reason="overlap")
+    logging.warning("Scheduler job %s skipped: previous run still in progress.", event.job_id)
 
-def _parse_med_time(now: datetime, time_str: str, tz: pytz.timezone) -> Optional[datetime]:
-    try:
-        # Handle both 24-hour format (16:11) and 12-hour format (4:11pm)
-        time_str = time_str.strip().lower()
-        
-        # Check if it's 12-hour format with am/pm
-        is_pm = time_str.endswith('pm')
-        is_am = time_str.endswith('am')
-        
-        if is_pm or is_am:
-            # Remove am/pm suffix
-            time_str = time_str[:-2].strip()
-        
-        # Parse hour and minute
-        parts = time_str.split(":")
-        hour = int(parts[0])
-        minute = int(parts[1]) if len(parts) > 1 else 0
-        
-        # Convert to 24-hour format if needed
-        if is_pm and hour != 12:
-            hour += 12
-        elif is_am and hour == 12:
-            hour = 0
-        
-        scheduled = tz.localize(
-            datetime(now.year, now.month, now.day, hour, minute, 0)
-        )
-        return scheduled
-    except Exception as e:
-        logging.warning("Unable to parse medication time '%s'. Error: %s", time_str, str(e))
-        return None
 
-
-def _normalise_frequency(med: Dict[str, Any]) -> str:
-    frequency = (med.get("frequency") or "Daily").strip().lower()
-    if frequency in {"twice daily", "twice_daily", "twice-daily"}:
-        return "twice daily"
-    if frequency == "weekly":
-        return "weekly"
-    if frequency in {"as needed", "as_needed", "as-needed", "prn"}:
-        return "as needed"
-    return "daily"
-
-
-def _med_is_scheduled_today(med: Dict[str, Any], now: datetime) -> bool:
-    frequency = _normalise_frequency(med)
-    if frequency == "as needed":
+def _needs_caregiver_check(user: Dict[str, Any], now: datetime, today_key: str) -> bool:
+    """True while a user's caregivers may still be owed today's missed-dose alert or summary."""
+    if user.get("paused") or not user.get("caregivers"):
         return False
-    if frequency != "weekly":
+    alert_log = user.get("caregiver_alert_log") or {}
+    if alert_log.get("missed_dose") != today_key:
         return True
+    return now.hour >= DAILY_SUMMARY_HOUR and alert_log.get("daily_summary") != today_key
+
+
+def _find_tick_users(now: datetime, window_start: datetime, window_end: datetime):
+    """
+    Returns the users a tick has to evaluate: those with a dose inside the window
+    and those whose next_missed_check_at has come, i.e. whose caregivers may be
+    owed an alert now. The resident schedule index answers this from memory; the
+    indexed next_due_at / next_missed_check_at query is the fallback while the
+    index is unavailable (e.g. standalone mongod without change streams). The
+    index only holds doses from now - REMINDER_WINDOW_MINUTES onwards, so a
+    catch-up window reaching further back is answered by the query as well.
+    """
+    index_covers = window_start >= now - timedelta(minutes=REMINDER_WINDOW_MINUTES)
+    if index_covers and _schedule_index is not None and _schedule_index.ready:
+        user_ids = _schedule_index.user_ids_due(window_start, window_end, now)
+        user_ids |= _schedule_index.user_ids_checking(now)
+        if not user_ids:
+            return []
+        return users.find({"_id": {"$in": list(user_ids)}, "paused": {"$ne": True}}, DISPATCH_VIEW)
+
+    return users.find(
+        {
+            "paused": {"$ne": True},
+            **partition_filter(),
+            "$or": [
+                {"next_due_at": {"$lte": window_end}},
+                {"next_missed_check_at": {"$lte": now}},
+            ],
+        },
+        DISPATCH_VIEW,
+    )
 
-    days = med.get("days") or []
-    if isinstance(days, str):
-        days = [days]
-    if not days:
-        return True
 
-    today = now.weekday()
-    return any(WEEKDAY_ALIASES.get(str(day).strip().lower()) == today for day in days)
+def _index_entries(user: Dict[str, Any], now: datetime) -> Iterator[Tuple[datetime, str, str]]:
+    """Expands a user into (due instant UTC, medicine name, time) entries for the schedule index."""
+    if user.get("paused") or not user.get("phone") or not owns_user(user):
+        return
 
+    tz = _get_timezone(user.get("timezone"))
+    for med in user.get("medications", []):
+        for _, time_str, med_dt in _iter_pending_doses(med, tz, now, SCHEDULE_INDEX_HORIZON_DAYS):
+            yield med_dt.astimezone(pytz.utc), med.get("name", ""), time_str
 
-def _caregiver_wants(caregiver: Dict[str, Any], kind: str) -> bool:
-    notify_when = (caregiver.get("notify_when") or "On missed dose").strip().lower()
-    if notify_when == "both":
-        return True
-    if kind == "missed_dose":
-        return notify_when == "on missed dose"
-    if kind == "daily_summary":
-        return notify_when == "daily summary"
-    return False
+
+def _index_check_at(user: Dict[str, Any]) -> Optional[datetime]:
+    """The stored caregiver check instant of a mirrored user this worker owns."""
+    check_at = user.get("next_missed_check_at")
+    if check_at is None or user.get("paused") or not owns_user(user):
+        return None
+    return check_at if check_at.tzinfo else pytz.utc.localize(check_at)
+
+
+def _ensure_indexes() -> None:
+    users.create_index("next_due_at")
+    users.create_index("next_missed_check_at")
+    ensure_claim_indexes()
+    if OUTBOX_ENABLED or CAREGIVER_DIGEST:
+        ensure_outbox_indexes()
+
+
+def _backfill_next_due_at(app) -> None:
+    """
+    Gives users saved before next_due_at/next_missed_check_at/partition_hash
+    existed a value so the dispatcher (and the right partition) can find them.
+    """
+    now = datetime.now(DEFAULT_TIMEZONE)
+    bulk = _BulkUpdater(app, "next_due_at backfill")
+    cursor = users.find(
+        {"$or": [
+            {"next_due_at": {"$exists": False}},
+            {"next_missed_check_at": {"$exists": False}},
+            {"partition_hash": {"$exists": False}},
+        ]},
+        SCHEDULE_VIEW,
+    )
+    for user in cursor:
+        bulk.add(user["_id"], {"$set": {
+            "next_due_at": compute_next_due_at(user, now),
+            "next_missed_check_at": compute_next_missed_check_at(user, now),
+            "partition_hash": partition_hash(user.get("phone", "")),
+        }})
+    bulk.flush()
+    if bulk.written:
+        app.logger.info("Backfilled next_due_at for %s users.", bulk.written)
 
 
 def _build_message(user: Dict[str, Any], med: Dict[str, Any], when: str) -> str:
@@ -168,155 +312,531 @@ def _build_message(user: Dict[str, Any], med: Dict[str, Any], when: str) -> str:
     )
 
 
-def _check_missed_medications_and_alert_caregivers(app) -> None:
-    """Check for missed medications and alert caregivers based on their preference."""
-    with app.app_context():
-        now = datetime.now(DEFAULT_TIMEZONE)
-        today_key = now.strftime("%Y-%m-%d")
-        
-        cursor = users.find({"paused": {"$ne": True}})
-        for user in cursor:
-            phone = user.get("phone")
-            caregivers = user.get("caregivers", [])
-            
-            if not phone or not caregivers:
+def _build_combined_message(user: Dict[str, Any], doses: List[Tuple[Dict[str, Any], str]]) -> str:
+    """One reminder listing several (medication, time) doses."""
+    name = user.get("name", "there")
+    lines = []
+    for med, when in doses:
+        dosage = med.get("dosage", "").strip()
+        dosage_str = f" ({dosage})" if dosage else ""
+        lines.append(f"- {med.get('name', 'your medication')}{dosage_str} scheduled for {when}")
+    return (
+        f"Hi {name}, it's time to take your medications:\n"
+        + "\n".join(lines)
+        + "\nReply with the number in your SMS stack to log each one."
+    )
+
+
+class _BulkUpdater:
+    """
+    Collects per-user updates and writes them with bulk_write every `flush_size`
+    operations. Failed writes are recorded per user in `failed`. `match` adds
+    conditions to the {"_id": ...} filter; an update whose conditions no longer
+    hold matches nothing and is dropped.
+    """
+
+    def __init__(
+        self,
+        app,
+        label: str,
+        flush_size: int = BULK_FLUSH_SIZE,
+        ordered: bool = BULK_ORDERED,
+    ) -> None:
+        self._app = app
+        self._label = label
+        self._flush_size = max(1, flush_size)
+        self._ordered = ordered
+        self._ops: List[UpdateOne] = []
+        self._keys: List[Any] = []
+        self.written = 0
+        self.failed: Dict[Any, str] = {}
+
+    def add(self, key: Any, update: Dict[str, Any], match: Optional[Dict[str, Any]] = None) -> None:
+        self._ops.append(UpdateOne({"_id": key, **(match or {})}, update))
+        self._keys.append(key)
+        if len(self._ops) >= self._flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._ops:
+            return
+        ops, keys = self._ops, self._keys
+        self._ops, self._keys = [], []
+
+        try:
+            result = users.bulk_write(ops, ordered=self._ordered)
+            self.written += result.matched_count
+        except BulkWriteError as exc:
+            details = exc.details or {}
+            self.written += details.get("nMatched", 0)
+            errors = details.get("writeErrors", [])
+            for error in errors:
+                self._fail(keys[error["index"]], error.get("errmsg", "write error"))
+            if self._ordered and errors:
+                # an ordered batch stops at the first error, the rest never ran
+                for key in keys[errors[0]["index"] + 1:]:
+                    self._fail(key, "not attempted after earlier error in ordered batch")
+        except PyMongoError as exc:
+            for key in keys:
+                self._fail(key, str(exc))
+
+    def _fail(self, key: Any, reason: str) -> None:
+        self.failed[key] = reason
+        self._app.logger.error("%s update failed for user %s: %s", self._label, key, reason)
+
+
+class _Send(NamedTuple):
+    """What a tick needs to record once an outbound message has been sent."""
+    kind: str  # "reminder", "missed_dose" or "daily_summary"
+    user_id: Any
+    claim_key: str
+    med_index: int = -1
+    time_str: str = ""
+    caregiver_name: str = ""
+    patient: str = ""
+    due_at: Optional[datetime] = None
+    missed: Tuple[str, ...] = ()
+    # set on a combined message: the per-dose or per-patient sends it stands for
+    parts: Tuple["_Send", ...] = ()
+
+
+def _reminder_claim_key(user_id: Any, med_name: str, time_str: str, day_key: str) -> str:
+    return f"reminder:{user_id}:{med_name}:{time_str}:{day_key}"
+
+
+def _alert_claim_key(user_id: Any, kind: str, day_key: str) -> str:
+    return f"{kind}:{user_id}:{day_key}"
+
+
+def _outbox_key(message: OutboundMessage) -> str:
+    """Idempotency key of one outbound message: the dose, or the alert per caregiver."""
+    send: _Send = message.context
+    if send.kind == "reminder":
+        return send.claim_key
+    return f"{send.claim_key}:{message.to}"
+
+
+def _enqueue_outbound(
+    app, outbound: List[OutboundMessage], today_key: str
+) -> List[Tuple[OutboundMessage, Dict[str, Any]]]:
+    """
+    Hands the tick's messages to the outbox instead of the provider. The outbox
+    key drops a second copy of the same message; doses and alerts were claimed
+    before this, since the key of a combined message depends on what it holds.
+    With CAREGIVER_DIGEST, caregiver alerts are held for the digest window under
+    a key per kind, phone and day, so the outbox sends each caregiver one message
+    for every patient alerted within that window.
+    """
+    by_kind: Dict[str, List[OutboundMessage]] = {}
+    for message in outbound:
+        send: _Send = message.context
+        context: Any = _outbox_key(message)
+        if send.kind != "reminder" and CAREGIVER_DIGEST:
+            context = DigestPart(context, f"{send.kind}:{message.to}:{today_key}", send.patient, send.missed)
+        by_kind.setdefault(send.kind, []).append(
+            OutboundMessage(to=message.to, body=message.body, context=context, priority=message.priority)
+        )
+    try:
+        for kind, messages in by_kind.items():
+            delay = CAREGIVER_DIGEST_SECONDS if kind != "reminder" and CAREGIVER_DIGEST else 0
+            enqueue(messages, kind=kind, delay_seconds=delay)
+    except PyMongoError as exc:
+        app.logger.error("Unable to enqueue %s messages, retrying next tick: %s", len(outbound), exc)
+        return [(message, {"status": "error", "error": str(exc)}) for message in outbound]
+    return [(message, {"status": "queued"}) for message in outbound]
+
+
+def _coalesce_reminders(
+    outbound: List[OutboundMessage], touched: Dict[Any, Dict[str, Any]]
+) -> List[OutboundMessage]:
+    """
+    Folds each user's due reminders into one message. The combined send keeps
+    its doses, so each dose's reminder_log is still recorded on its own.
+    """
+    if not REMINDER_COALESCE:
+        return outbound
+
+    by_user: Dict[Any, List[OutboundMessage]] = {}
+    others: List[OutboundMessage] = []
+    for message in outbound:
+        if message.context.kind == "reminder":
+            by_user.setdefault(message.context.user_id, []).append(message)
+        else:
+            others.append(message)
+
+    coalesced: List[OutboundMessage] = []
+    for user_id, messages in by_user.items():
+        if len(messages) == 1:
+            coalesced.append(messages[0])
+            continue
+        doses = tuple(message.context for message in messages)
+        state = touched[user_id]
+        coalesced.append(OutboundMessage(
+            to=messages[0].to,
+            body=_build_combined_message(
+                state["user"], [(state["meds"][dose.med_index], dose.time_str) for dose in doses]
+            ),
+            context=_Send(
+                kind="reminder",
+                user_id=user_id,
+                claim_key=f"reminders:{user_id}:{_parts_digest(doses)}",
+                due_at=min((dose.due_at for dose in doses if dose.due_at), default=None),
+                parts=doses,
+            ),
+        ))
+    return coalesced + others
+
+
+def _parts_digest(parts: Tuple[_Send, ...]) -> str:
+    return hashlib.sha1("|".join(part.claim_key for part in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _same_instant(stored: Optional[datetime], computed: Optional[datetime]) -> bool:
+    """Compares a next_due_at read back from mongo (naive UTC) with a computed one."""
+    if stored is None or computed is None:
+        return stored is computed
+    if stored.tzinfo is None:
+        stored = pytz.utc.localize(stored)
+    return stored == computed
+
+
+def _plan_reminders(
+    user: Dict[str, Any],
+    meds: List[Dict[str, Any]],
+    now: datetime,
+    window_start: datetime,
+    window_end: datetime,
+    today_key: str,
+) -> List[OutboundMessage]:
+    """Builds a reminder for every dose inside the window that was not reminded today."""
+    outbound: List[OutboundMessage] = []
+    phone = user["phone"]
+    tz = _get_timezone(user.get("timezone"))
+
+    for med_index, med in enumerate(meds):
+        if not _med_is_scheduled_today(med, now):
+            continue
+
+        reminder_log: Dict[str, Any] = med.get("reminder_log", {})
+        for time_str in med.get("times", []):
+            med_dt = _parse_med_time(now, time_str, tz)
+            if not med_dt:
                 continue
-            
-            caregiver_alert_log = user.get("caregiver_alert_log", {})
-            
-            # Count missed medications
-            missed_count = 0
-            missed_meds = []
-            tz = _get_timezone(user.get("timezone"))
-            
-            for med in user.get("medications", []):
-                if not _med_is_scheduled_today(med, now):
-                    continue
-
-                status = med.get("status", "pending")
-                for time_str in med.get("times", []):
-                    med_dt = _parse_med_time(now, time_str, tz)
-                    if not med_dt:
-                        continue
-                    
-                    # If more than 3 minutes past med time and still pending, it's missed
-                    if now > (med_dt + timedelta(minutes=3)) and status == "pending":
-                        missed_count += 1
-                        missed_meds.append(f"{med.get('name')} ({time_str})")
-            
-            if missed_count == 0:
+            if reminder_log.get(time_str) == today_key:
+                continue
+            if not (window_start <= med_dt <= window_end):
                 continue
 
-            user_name = user.get("name", "The user")
-            updates: Dict[str, Any] = {}
+            outbound.append(OutboundMessage(
+                to=phone,
+                body=_build_message(user, med, time_str),
+                context=_Send(
+                    kind="reminder",
+                    user_id=user["_id"],
+                    claim_key=_reminder_claim_key(user["_id"], med.get("name", ""), time_str, today_key),
+                    med_index=med_index,
+                    time_str=time_str,
+                    due_at=med_dt,
+                ),
+            ))
+    return outbound
+
+
+def _plan_caregiver_alerts(
+    user: Dict[str, Any],
+    meds: List[Dict[str, Any]],
+    reminded: Set[int],
+    now: datetime,
+    today_key: str,
+) -> List[OutboundMessage]:
+    """
+    Builds today's missed-dose alert and daily summary for the user's caregivers.
+    Medications reminded in this same tick count as pending, as they would after
+    the reminder is recorded.
+    """
+    caregivers = user.get("caregivers", [])
+    if not caregivers or not _needs_caregiver_check(user, now, today_key):
+        return []
+
+    # Count missed medications
+    missed_meds = []
+    tz = _get_timezone(user.get("timezone"))
+    for med_index, med in enumerate(meds):
+        if not _med_is_scheduled_today(med, now):
+            continue
+
+        status = "pending" if med_index in reminded else med.get("status", "pending")
+        for time_str in med.get("times", []):
+            med_dt = _parse_med_time(now, time_str, tz)
+            if not med_dt:
+                continue
 
-            alert_message = (
-                f"Alert: {user_name} missed {missed_count} medication"
-                f"{'s' if missed_count != 1 else ''}: {', '.join(missed_meds)}. "
-                "Please check on them."
-            )
-            if caregiver_alert_log.get("missed_dose") != today_key:
-                sent_any = False
-                for caregiver in caregivers:
-                    if not _caregiver_wants(caregiver, "missed_dose"):
-                        continue
-                    caregiver_phone = caregiver.get("phone")
-                    if not caregiver_phone:
-                        continue
+            # If more than 3 minutes past med time and still pending, it's missed
+            if now > (med_dt + timedelta(minutes=MISSED_DOSE_GRACE_MINUTES)) and status == "pending":
+                missed_meds.append(f"{med.get('name')} ({time_str})")
+
+    missed_count = len(missed_meds)
+    if missed_count == 0:
+        return []
+
+    user_name = user.get("name", "The user")
+    caregiver_alert_log = user.get("caregiver_alert_log", {})
+    messages: Dict[str, str] = {}
+    if caregiver_alert_log.get("missed_dose") != today_key:
+        messages["missed_dose"] = (
+            f"Alert: {user_name} missed {missed_count} medication"
+            f"{'s' if missed_count != 1 else ''}: {', '.join(missed_meds)}. "
+            "Please check on them."
+        )
+    if now.hour >= DAILY_SUMMARY_HOUR and caregiver_alert_log.get("daily_summary") != today_key:
+        messages["daily_summary"] = (
+            f"Daily summary: {user_name} missed {missed_count} medication"
+            f"{'s' if missed_count != 1 else ''} today: {', '.join(missed_meds)}."
+        )
 
-                    result = twilio_service.send_sms(to=caregiver_phone, body=alert_message)
-                    sent_any = True
-                    app.logger.info(
-                        "Missed-dose caregiver alert for %s to %s (%s) -> %s",
-                        phone,
-                        caregiver.get("name", "Caregiver"),
-                        caregiver_phone,
-                        result.get("status"),
-                    )
+    outbound: List[OutboundMessage] = []
+    for kind, body in messages.items():
+        for caregiver in caregivers:
+            if not _caregiver_wants(caregiver, kind):
+                continue
+            # the form a phone is sent to, so one caregiver saved two ways gets one digest
+            caregiver_phone = normalize_caregiver_phone(caregiver.get("phone"))
+            if not caregiver_phone:
+                continue
+            outbound.append(OutboundMessage(
+                to=caregiver_phone,
+                body=body,
+                context=_Send(
+                    kind=kind,
+                    user_id=user["_id"],
+                    # one claim per user and alert kind keeps overlapping workers from both alerting
+                    claim_key=_alert_claim_key(user["_id"], kind, today_key),
+                    caregiver_name=caregiver.get("name", "Caregiver"),
+                    patient=user_name,
+                    missed=tuple(missed_meds),
+                ),
+                priority=PRIORITY_CAREGIVER,
+            ))
+    return outbound
 
-                if sent_any:
-                    updates["caregiver_alert_log.missed_dose"] = today_key
 
-            summary_due = now.hour >= DAILY_SUMMARY_HOUR
-            summary_message = (
-                f"Daily summary: {user_name} missed {missed_count} medication"
-                f"{'s' if missed_count != 1 else ''} today: {', '.join(missed_meds)}."
-            )
-            if summary_due and caregiver_alert_log.get("daily_summary") != today_key:
-                sent_any = False
-                for caregiver in caregivers:
-                    if not _caregiver_wants(caregiver, "daily_summary"):
-                        continue
-                    caregiver_phone = caregiver.get("phone")
-                    if not caregiver_phone:
-                        continue
+def _dispatch_due_reminders(app) -> None:
+    """Polling tick: sends everything due within +/- REMINDER_WINDOW_MINUTES of now."""
+    now = datetime.now(DEFAULT_TIMEZONE)
+    _run_tick(
+        app,
+        now,
+        now - timedelta(minutes=REMINDER_WINDOW_MINUTES),
+        now + timedelta(minutes=REMINDER_WINDOW_MINUTES),
+    )
 
-                    result = twilio_service.send_sms(to=caregiver_phone, body=summary_message)
-                    sent_any = True
-                    app.logger.info(
-                        "Daily caregiver summary for %s to %s (%s) -> %s",
-                        phone,
-                        caregiver.get("name", "Caregiver"),
-                        caregiver_phone,
-                        result.get("status"),
-                    )
 
-                if sent_any:
-                    updates["caregiver_alert_log.daily_summary"] = today_key
+def _reconcile_exact_dispatch(app) -> None:
+    """Safety sweep for exact mode: catches anything the timer missed, never sends early."""
+    now = datetime.now(DEFAULT_TIMEZONE)
+    _run_tick(app, now, now - timedelta(minutes=REMINDER_WINDOW_MINUTES), now, trigger="reconcile")
+
 
-            if updates:
-                users.update_one({"_id": user["_id"]}, {"$set": updates})
+def _fire_exact(app, user_ids: Set[Any], now: datetime) -> None:
+    """Sends the doses the exact-time dispatcher found due at `now`."""
+    now = now.astimezone(DEFAULT_TIMEZONE)
+    _run_tick(
+        app,
+        now,
+        now - timedelta(minutes=REMINDER_WINDOW_MINUTES),
+        now,
+        user_ids=user_ids,
+        check_caregivers=False,
+        trigger="exact",
+    )
 
 
-def _dispatch_due_reminders(app) -> None:
-    with app.app_context():
-        now = datetime.now(DEFAULT_TIMEZONE)
-        window_start = now - timedelta(minutes=REMINDER_WINDOW_MINUTES)
-        window_end = now + timedelta(minutes=REMINDER_WINDOW_MINUTES)
+def _run_tick(
+    app,
+    now: datetime,
+    window_start: datetime,
+    window_end: datetime,
+    user_ids: Optional[Set[Any]] = None,
+    check_caregivers: bool = True,
+    trigger: str = "poll",
+) -> None:
+    """
+    One scheduler tick. Every candidate user is read once and evaluated for due
+    reminders, missed doses, caregiver alerts and the daily summary; the resulting
+    sends go out together and the state changes are written in bulk afterwards.
+    Ticks are serialized within the process so the timer and the sweep never overlap.
+    While the provider circuit is open there is nothing to send with, so direct-send
+    ticks are skipped. The skipped window, and that of any tick whose sends the
+    breaker parked, is remembered: the first full tick after recovery widens its
+    window back to it (at most REMINDER_CATCH_UP_MINUTES), so doses that came due
+    during the outage are still reminded. With the outbox enabled ticks keep running
+    and the outbox holds the sends.
+    """
+    global _catch_up_since
+
+    with _tick_lock, app.app_context():
+        if not OUTBOX_ENABLED and twilio_service.breaker.is_open():
+            TICKS_SKIPPED.inc(reason="circuit_open")
+            _catch_up_since = min(_catch_up_since or window_start, window_start)
+            app.logger.warning(
+                "Skipping %s tick: messaging provider circuit is open for another %.0fs.",
+                trigger, twilio_service.breaker.retry_after(),
+            )
+            return
+
+        # exact-time ticks only see the users they fire for, so only full sweeps catch up
+        if _catch_up_since is not None and user_ids is None:
+            catch_up_start = max(_catch_up_since, now - timedelta(minutes=REMINDER_CATCH_UP_MINUTES))
+            if catch_up_start < window_start:
+                app.logger.info("Catching up reminders the provider outage held back since %s.", catch_up_start)
+                window_start = catch_up_start
+            _catch_up_since = None
+
+        started = time.perf_counter()
         today_key = now.strftime("%Y-%m-%d")
 
-        cursor = users.find({"paused": {"$ne": True}})
+        bulk = _BulkUpdater(app, "Scheduler tick")
+        touched: Dict[Any, Dict[str, Any]] = {}
+        outbound: List[OutboundMessage] = []
+
+        if user_ids is not None:
+            cursor = users.find({"_id": {"$in": list(user_ids)}, "paused": {"$ne": True}}, DISPATCH_VIEW)
+        else:
+            cursor = _find_tick_users(now, window_start, window_end)
+
         for user in cursor:
-            phone = user.get("phone")
-            if not phone:
+            if not user.get("phone"):
+                if user.get("next_due_at") is not None or user.get("next_missed_check_at") is not None:
+                    bulk.add(user["_id"], {"$set": {"next_due_at": None, "next_missed_check_at": None}})
                 continue
 
             meds: List[Dict[str, Any]] = deepcopy(user.get("medications", []))
-            updated = False
-            tz = _get_timezone(user.get("timezone"))
-
-            for med in meds:
-                if not _med_is_scheduled_today(med, now):
-                    continue
-
-                reminder_log: Dict[str, Any] = med.get("reminder_log", {})
-                for time_str in med.get("times", []):
-                    med_dt = _parse_med_time(now, time_str, tz)
-                    if not med_dt:
-                        continue
-                    if reminder_log.get(time_str) == today_key:
-                        continue
-                    if not (window_start <= med_dt <= window_end):
-                        continue
-
-                    message = _build_message(user, med, time_str)
-                    result = twilio_service.send_sms(to=phone, body=message)
+            USERS_SCANNED.inc()
+            DOSES_EVALUATED.inc(sum(len(med.get("times", [])) for med in meds))
+            touched[user["_id"]] = {
+                "user": user, "meds": meds, "updates": {}, "alerts": {}, "positions": set(),
+                "alert_log": dict(user.get("caregiver_alert_log") or {}),
+            }
+
+            reminders = _plan_reminders(user, meds, now, window_start, window_end, today_key)
+            reminded = {message.context.med_index for message in reminders}
+            outbound.extend(reminders)
+            if check_caregivers:
+                outbound.extend(_plan_caregiver_alerts(user, meds, reminded, now, today_key))
+
+        SCAN_DURATION.observe(time.perf_counter() - started, trigger=trigger)
+
+        # a claimed send goes out from this worker only, even if partitions overlap.
+        # doses are claimed one by one before they are coalesced in both modes: the
+        # outbox key of a combined message depends on what it holds, so two workers
+        # with overlapping sets would otherwise both enqueue one
+        owned = claim(message.context.claim_key for message in outbound)
+        outbound = [message for message in outbound if message.context.claim_key in owned]
+        outbound = _coalesce_reminders(outbound, touched)
+        if OUTBOX_ENABLED:
+            results = _enqueue_outbound(app, outbound, today_key)
+        else:
+            # caregiver alerts still wait in the outbox for their digest window
+            direct: List[OutboundMessage] = []
+            held: List[OutboundMessage] = []
+            for message in outbound:
+                (held if CAREGIVER_DIGEST and message.context.kind != "reminder" else direct).append(message)
+            results = twilio_service.send_many(direct) + _enqueue_outbound(app, held, today_key)
+
+        # reminder_log and caregiver_alert_log are only marked once the provider
+        # confirmed the send (or the outbox took it), so failures are retried on the next tick
+        failed_keys = set()
+        delivered_keys = set()
+        alert_keys = {
+            part.claim_key
+            for m in outbound if m.context.kind != "reminder"
+            for part in m.context.parts or (m.context,)
+        }
+        delivered_alert_keys = set()
+        for message, result in results:
+            send: _Send = message.context
+            status = result.get("status", "error")
+            if status == "parked" and send.kind == "reminder":
+                _catch_up_since = min(_catch_up_since or window_start, window_start)
+            delivered = status in DELIVERED_STATUSES or status == "queued"
+
+            if send.kind == "reminder":
+                REMINDERS_SENT.inc(status=status)
+                state = touched[send.user_id]
+                for dose in send.parts or (send,):
+                    if delivered and dose.due_at is not None:
+                        DISPATCH_LAG.observe(
+                            (datetime.now(pytz.utc) - dose.due_at).total_seconds(), trigger=trigger
+                        )
+                    med = state["meds"][dose.med_index]
                     app.logger.info(
                         "Reminder for %s (%s) at %s -> %s",
-                        phone,
+                        message.to,
                         med.get("name"),
-                        time_str,
+                        dose.time_str,
                         result.get("status"),
                     )
-
-                    reminder_log[time_str] = today_key
-                    med["reminder_log"] = reminder_log
+                    if not delivered:
+                        failed_keys.add(dose.claim_key)
+                        continue
+                    delivered_keys.add(dose.claim_key)
+                    # positional updates, since the tick only read a projection of each med
+                    med.setdefault("reminder_log", {})[dose.time_str] = today_key
                     med["status"] = "pending"
-                    med["last_reminder_at"] = datetime.utcnow()
-                    updated = True
-
-            if updated:
-                users.update_one({"_id": user["_id"]}, {"$set": {"medications": meds}})
-        
-        # After sending reminders, check for missed meds and alert caregivers
-        _check_missed_medications_and_alert_caregivers(app)
+                    state["positions"].add(dose.med_index)
+                    prefix = f"medications.{dose.med_index}"
+                    state["updates"][f"{prefix}.reminder_log.{dose.time_str}"] = today_key
+                    state["updates"][f"{prefix}.status"] = "pending"
+                    state["updates"][f"{prefix}.last_reminder_at"] = datetime.utcnow()
+            else:
+                CAREGIVER_ALERTS.inc(kind=send.kind, status=status)
+                for part in send.parts or (send,):
+                    state = touched[part.user_id]
+                    app.logger.info(
+                        "%s for %s to %s (%s) -> %s",
+                        "Missed-dose caregiver alert" if send.kind == "missed_dose" else "Daily caregiver summary",
+                        state["user"].get("phone"),
+                        part.caregiver_name,
+                        message.to,
+                        result.get("status"),
+                    )
+                    # the alert log is marked once any caregiver received that kind
+                    if delivered:
+                        state["alerts"][f"caregiver_alert_log.{send.kind}"] = today_key
+                        state["alert_log"][send.kind] = today_key
+                        delivered_alert_keys.add(part.claim_key)
+
+        for user_id, state in touched.items():
+            user = state["user"]
+            # the positional paths come from this tick's read, so they only apply while
+            # those array slots still hold the same medicines; a concurrent rewrite of
+            # the array leaves the update unmatched instead of landing on another one
+            guards = {f"medications.{i}.name": state["meds"][i].get("name") for i in state["positions"]}
+            if state["updates"]:
+                bulk.add(user_id, {"$set": state["updates"]}, match=guards)
+            if state["alerts"]:
+                bulk.add(user_id, {"$set": state["alerts"]})
+
+            schedule = {**user, "medications": state["meds"], "caregiver_alert_log": state["alert_log"]}
+            schedule_updates = {}
+            next_due = compute_next_due_at(schedule, now)
+            if not _same_instant(user.get("next_due_at"), next_due):
+                schedule_updates["next_due_at"] = next_due
+            next_check = compute_next_missed_check_at(schedule, now)
+            if not _same_instant(user.get("next_missed_check_at"), next_check):
+                schedule_updates["next_missed_check_at"] = next_check
+            if schedule_updates:
+                # only replaces the values this tick read, never a newer refresh_next_due_at
+                bulk.add(user_id, {"$set": schedule_updates}, match={
+                    **guards,
+                    "next_due_at": user.get("next_due_at"),
+                    "next_missed_check_at": user.get("next_missed_check_at"),
+                })
+
+        # done before the bulk write, so a failed write cannot lead to a second send
+        complete(delivered_keys | delivered_alert_keys)
+        bulk.flush()
+        release(failed_keys | (alert_keys - delivered_alert_keys))
+
+        TICK_DURATION.observe(time.perf_counter() - started, trigger=trigger)
+        LAST_TICK.set(time.time(), trigger=trigger)
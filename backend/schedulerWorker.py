@@ -0,0 +1,52 @@
+import logging
+import os
+import signal
+import threading
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from backend.metrics import metrics_bp
+from backend.scheduler import _shutdown_scheduler, start_scheduler
+
+# schedulerWorker.py
+# runs the reminder scheduler on its own, without the web api.
+# start one process per partition, for example with three workers:
+#   SCHEDULER_PARTITION_COUNT=3 SCHEDULER_PARTITION_INDEX=0 python -m backend.schedulerWorker
+#   SCHEDULER_PARTITION_COUNT=3 SCHEDULER_PARTITION_INDEX=1 python -m backend.schedulerWorker
+#   SCHEDULER_PARTITION_COUNT=3 SCHEDULER_PARTITION_INDEX=2 python -m backend.schedulerWorker
+# all of them can point at the same mongod; dose claims stop two workers from
+# sending the same reminder while the partition count is being changed.
+# set SCHEDULER_METRICS_PORT to expose /metrics for this worker.
+
+METRICS_PORT = os.getenv("SCHEDULER_METRICS_PORT")
+
+app = Flask(__name__)
+app.register_blueprint(metrics_bp)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    app.logger.setLevel(logging.INFO)
+    stopped = threading.Event()
+
+    def _stop(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    server = None
+    if METRICS_PORT:
+        server = make_server("0.0.0.0", int(METRICS_PORT), app)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+
+    start_scheduler(app)
+    stopped.wait()
+    _shutdown_scheduler(app)
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@
 Unit tests for the current simple medication parsing stub.
 """
 import unittest
-from backend.aiParsing import aiParseMedicine
+from unittest.mock import patch
+
+from backend.aiParsing import PARSES, aiParseMedicine, aiParseMedicines, ruleParseMedicine
 
 
 class TestAIParsing(unittest.TestCase):
@@ -11,13 +13,13 @@ class TestAIParsing(unittest.TestCase):
     def test_parse_name_time_day(self):
         result = aiParseMedicine("vitamind 7:41pm friday")
         self.assertEqual(result["medicine_name"], "vitamind")
-        self.assertEqual(result["time"], "7:41pm")
+        self.assertEqual(result["time"], "19:41")
         self.assertEqual(result["day"], "friday")
 
     def test_parse_name_and_time_only(self):
         result = aiParseMedicine("aspirin 9am")
         self.assertEqual(result["medicine_name"], "aspirin")
-        self.assertEqual(result["time"], "9am")
+        self.assertEqual(result["time"], "09:00")
         self.assertEqual(result["day"], "")
 
     def test_parse_requires_at_least_two_tokens(self):
@@ -25,5 +27,71 @@ class TestAIParsing(unittest.TestCase):
             aiParseMedicine("aspirin") 
 
 
+
+class TestRuleParsing(unittest.TestCase):
+    """Test cases for the rule-based fast path"""
+
+    def test_common_grammar(self):
+        self.assertEqual(ruleParseMedicine("vitamin d 8 am monday"), {
+            "medicine_name": "vitamin d", "time": "08:00", "times": ["08:00"], "day": "monday",
+        })
+        self.assertEqual(ruleParseMedicine("tylenol at 16:30 on tue")["time"], "16:30")
+        self.assertEqual(ruleParseMedicine("Metformin 500mg 8am and 8:30 PM")["times"], ["08:00", "20:30"])
+        # times come out as 24h "HH:MM", which is what the logging stack reads
+        self.assertEqual(ruleParseMedicine("aspirin 12am and 12 p.m.")["times"], ["00:00", "12:00"])
+
+    def test_unclear_messages_are_left_to_the_model(self):
+        for text in (
+            "i will take vitamin a on thursday at 8 00",
+            "aspirin 8",
+            "aspirin 13pm",
+            "aspirin 8am monday friday",
+            "8am aspirin 9pm tylenol",
+            "vitamin d in the morning",
+        ):
+            self.assertIsNone(ruleParseMedicine(text), text)
+
+    @patch("backend.aiParsing.AI_PARSE_CACHE_ENABLED", False)
+    @patch("backend.aiParsing._llmParseMedicine")
+    def test_falls_back_to_model(self, mock_llm):
+        mock_llm.return_value = {"medicine_name": "vitamin a", "time": "8:00", "day": "thursday"}
+        llm_parses = PARSES.value(path="llm")
+
+        self.assertEqual(aiParseMedicine("aspirin 9am")["medicine_name"], "aspirin")
+        mock_llm.assert_not_called()
+        self.assertEqual(aiParseMedicine("i take vitamin a thursdays at 8")["time"], "8:00")
+        self.assertEqual(PARSES.value(path="llm"), llm_parses + 1)
+
+
+
+class TestBatchParsing(unittest.TestCase):
+    """Test cases for messages naming several medicines"""
+
+    def test_comma_separated_parts_are_read_locally(self):
+        entries = aiParseMedicines("metformin 8am and 8pm, lisinopril 9am monday")
+        self.assertEqual([(e["medicine_name"], e["times"], e["days"]) for e in entries],
+                         [("metformin", ["08:00", "20:00"], []), ("lisinopril", ["09:00"], ["monday"])])
+
+    @patch("backend.aiParsing.AI_PARSE_CACHE_ENABLED", False)
+    @patch("backend.aiParsing._askModel")
+    def test_model_answer_is_validated_as_a_whole(self, mock_model):
+        mock_model.return_value = {"medications": [
+            {"medicine_name": "Metformin", "times": ["8 AM", "8 pm"], "days": []},
+            {"medicine_name": "lisinopril", "time": "9am", "day": "Monday"},
+        ]}
+        entries = aiParseMedicines("metformin with breakfast and dinner, lisinopril in the morning")
+        self.assertEqual(entries[0]["times"], ["08:00", "20:00"])
+        self.assertEqual((entries[1]["times"], entries[1]["day"]), (["09:00"], "monday"))
+        self.assertEqual(mock_model.call_count, 1)
+
+        mock_model.return_value = {"medications": [{"medicine_name": "metformin", "times": ["8am"]},
+                                                   {"medicine_name": "", "times": ["9am"]}]}
+        self.assertIsNone(aiParseMedicines("metformin with breakfast, something in the morning"))
+
+        # a time the schedule cannot read rejects the batch
+        mock_model.return_value = {"medications": [{"medicine_name": "lisinopril", "times": ["morning"]}]}
+        self.assertIsNone(aiParseMedicines("lisinopril in the morning"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,174 @@
+"""
+Smoke tests for the scheduler tick benchmark and its in-memory store.
+"""
+import io
+import time
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import patch
+
+import pytz
+from aiohttp import web
+
+from backend import aiParsing
+from backend.benchmarks import parsing
+from backend.benchmarks.memoryStore import MemoryCollection
+from backend.benchmarks.openaiStandIn import OpenAIStandIn
+from backend.benchmarks.parseCorpus import generate_corpus
+from backend.benchmarks.schedulerTick import main
+from backend.benchmarks.twilioStandIn import TwilioStandIn, start_in_thread
+from backend.notifications import OutboundMessage, TwilioConfig, TwilioNotificationService
+from backend.projections import DISPATCH_VIEW
+
+
+class TestMemoryStore(unittest.TestCase):
+    """Test cases for the mongo stand-in used by benchmarks"""
+
+    def setUp(self):
+        self.users = MemoryCollection()
+        self.users.insert_many([
+            {"_id": 1, "phone": "+1", "next_due_at": datetime(2025, 1, 1, 13, 0), "partition_hash": 4,
+             "caregivers": [{"name": "Ann", "phone": "+2"}],
+             "medications": [{"name": "A", "times": ["08:00"], "reminder_log": {"08:00": "x"}}]},
+            {"_id": 2, "phone": "+3", "paused": True, "next_due_at": None, "partition_hash": 5},
+        ])
+
+    def test_query_operators(self):
+        due_by = pytz.utc.localize(datetime(2025, 1, 1, 14, 0))
+        self.assertEqual([d["_id"] for d in self.users.find({"next_due_at": {"$lte": due_by}})], [1])
+        self.assertEqual([d["_id"] for d in self.users.find({"paused": {"$ne": True}})], [1])
+        self.assertEqual([d["_id"] for d in self.users.find({"caregivers.0": {"$exists": True}})], [1])
+        self.assertEqual([d["_id"] for d in self.users.find({"partition_hash": {"$mod": [2, 1]}})], [2])
+
+    def test_projection_drops_unrequested_fields(self):
+        doc = self.users.find_one({"_id": 1}, {"medications.name": 1})
+        self.assertEqual(doc, {"_id": 1, "medications": [{"name": "A"}]})
+
+    def test_positional_set(self):
+        self.users.update_one({"_id": 1}, {"$set": {"medications.0.reminder_log.08:00": "y"}})
+        doc = self.users.find_one({"_id": 1}, DISPATCH_VIEW)
+        self.assertEqual(doc["medications"][0]["reminder_log"], {"08:00": "y"})
+
+
+class TestSchedulerTickBenchmark(unittest.TestCase):
+    """Test cases for the benchmark harness"""
+
+    def test_report_is_machine_readable(self):
+        with redirect_stdout(io.StringIO()):
+            report = main(["--users", "50", "--ticks", "2", "--due-share", "1.0"])
+
+        result = report["results"][0]
+        self.assertEqual(result["users"], 50)
+        self.assertEqual(set(result["latency_ms"]), {"p50", "p90", "p99", "max"})
+        self.assertGreater(result["first_tick"]["messages_sent"], 0)
+        self.assertGreater(result["first_tick"]["docs_read"], 0)
+        self.assertEqual(result["steady_tick"]["messages_sent"], 0)
+
+
+class TestTwilioStandIn(unittest.TestCase):
+    """Test cases for the local twilio stand-in"""
+
+    def _service(self, base_url, status_callback=None):
+        service = TwilioNotificationService()
+        service.config = TwilioConfig(
+            account_sid="AC123", auth_token="secret", from_number="whatsapp:+14155238886",
+            enabled=True, base_url=base_url, status_callback=status_callback,
+        )
+        return service
+
+    def _serve(self, stand_in):
+        base_url, stop = start_in_thread(stand_in)
+        self.addCleanup(stop)
+        return base_url
+
+    def test_twilio_client_sends_through_stand_in(self):
+        stand_in = TwilioStandIn()
+        result = self._service(self._serve(stand_in)).send_sms(to="+17034532810", body="hi")
+
+        self.assertEqual(result["status"], "sent")
+        self.assertEqual(stand_in.messages[0]["to"], "whatsapp:+17034532810")
+        self.assertEqual(stand_in.messages[0]["sid"], result["sid"])
+
+    def test_rate_limit_answers_429_and_errors_answer_500(self):
+        stand_in = TwilioStandIn(rate=1, burst=1)
+        service = self._service(self._serve(stand_in))
+        with patch("backend.notifications.RATE_LIMIT_RETRIES", 0):
+            results = service.send_many(
+                [OutboundMessage(to="+1703453281%d" % i, body="hi") for i in range(3)], concurrency=1
+            )
+        self.assertEqual(stand_in.stats["throttled"], 2)
+        self.assertEqual(results[0][1]["status"], "sent")
+        self.assertEqual(results[1][1]["http_status"], 429)
+
+        stand_in.rate, stand_in.error_rate = 0, 1.0
+        self.assertEqual(service.send_sms(to="+17034532810", body="hi")["status"], "error")
+        self.assertEqual(stand_in.stats["errors"], 1)
+
+    def test_status_callbacks_are_posted(self):
+        statuses = []
+
+        async def receive(request):
+            statuses.append((await request.post())["MessageStatus"])
+            return web.Response()
+
+        receiver = web.Application()
+        receiver.router.add_post("/status", receive)
+        callback_url = self._serve_app(receiver) + "/status"
+
+        stand_in = TwilioStandIn(callback_delay_ms=1)
+        self._service(self._serve(stand_in), status_callback=callback_url).send_sms(to="+1", body="hi")
+
+        deadline = time.monotonic() + 5
+        while len(statuses) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(statuses, ["queued", "sent", "delivered"])
+
+    def _serve_app(self, app):
+        holder = TwilioStandIn()
+        holder.app = app
+        return self._serve(holder)
+
+
+class TestParsingBenchmark(unittest.TestCase):
+    """Test cases for the openai stand-in and the parsing benchmark"""
+
+    def _client(self, stand_in):
+        from openai import OpenAI
+
+        base_url, stop = start_in_thread(stand_in)
+        self.addCleanup(stop)
+        return OpenAI(api_key="test", base_url=f"{base_url}/v1", max_retries=0)
+
+    def test_corpus_is_reproducible(self):
+        first = list(generate_corpus(50, seed=3))
+        self.assertEqual(first, list(generate_corpus(50, seed=3)))
+        self.assertEqual({item["style"] for item in generate_corpus(300)}, {"terse", "sentence", "batch"})
+
+    @patch("backend.aiParsing.AI_PARSE_CACHE_ENABLED", False)
+    def test_prose_wrapped_answers_take_the_recovery_path(self):
+        text = "remind me to take zoloft at 9pm"
+        expected = [{"medicine_name": "zoloft", "times": ["21:00"], "day": ""}]
+        stand_in = OpenAIStandIn(answers={text: expected}, malformed_rate=1.0)
+        recovered = aiParsing.MODEL_ANSWERS.value(format="recovered")
+
+        with patch.object(aiParsing, "ai_client", self._client(stand_in)), redirect_stdout(io.StringIO()):
+            result = aiParsing.aiParseMedicine(text)
+
+        self.assertTrue(parsing.matches(result, expected))
+        self.assertEqual(aiParsing.MODEL_ANSWERS.value(format="recovered"), recovered + 1)
+        self.assertEqual(stand_in.stats["malformed"], 1)
+
+    def test_report_is_machine_readable(self):
+        with redirect_stdout(io.StringIO()):
+            report = parsing.main(["--count", "60", "--latency", "fixed:0", "--batch", "--malformed-rate", "0.5"])
+
+        result = report["results"]
+        self.assertEqual(result["messages"], 60)
+        self.assertGreater(result["accuracy"], 0.9)
+        self.assertEqual(set(result["paths"]), {"rule", "model"})
+        self.assertGreater(result["model_answers"]["recovered"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Unit tests for edit/add command handling.
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from backend.commandLogic import EASTERN_TZ, commandLogic, medTaken, mergeEntries
+from backend.loggingStack import med_is_scheduled_today, medcineLoggingLogic
+
+
+class TestMedicationCommands(unittest.TestCase):
+    """Test cases for applying parsed medicines in one update"""
+
+    def setUp(self):
+        for patcher in (
+            patch("backend.commandLogic.refresh_next_due_at"),
+            patch("backend.aiParsing.AI_PARSE_CACHE_ENABLED", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch("backend.commandLogic.users")
+    def test_add_pushes_every_medicine_at_once(self, mock_users):
+        mock_users.update_one.return_value.modified_count = 1
+
+        reply = commandLogic("whatsapp:+1555", "add metformin 8am and 8pm, lisinopril 9am monday")
+
+        mock_users.update_one.assert_called_once()
+        query, update = mock_users.update_one.call_args[0]
+        self.assertEqual(query, {"phone": "+1555"})
+        added = update["$push"]["medications"]["$each"]
+        self.assertEqual([(m["name"], m["times"], m["day"]) for m in added],
+                         [("metformin", ["08:00", "20:00"], ""), ("lisinopril", ["09:00"], "monday")])
+        self.assertEqual([(m["frequency"], m["days"]) for m in added], [("Daily", []), ("Weekly", ["Mon"])])
+        self.assertEqual(reply, "Added 2 new medicines: metformin at 08:00, 20:00; lisinopril at 09:00 monday.")
+
+    @patch("backend.commandLogic.users")
+    def test_edit_changes_all_medicines_or_none(self, mock_users):
+        mock_users.update_one.return_value.modified_count = 0
+
+        reply = commandLogic("+1555", "edit metformin 9am, vitamin b12 7:30pm")
+
+        (query, update), kwargs = mock_users.update_one.call_args
+        self.assertEqual(len(query["$and"]), 2)
+        self.assertEqual(update["$set"]["medications.$[m1].times"], ["19:30"])
+        self.assertEqual(kwargs["array_filters"][1], {"m1.name": {"$regex": "^vitamin\\ b12$", "$options": "i"}})
+        self.assertIn("Nothing was changed", reply)
+
+    @patch("backend.commandLogic.users")
+    @patch("backend.aiParsing._llmParseMedicines")
+    def test_unclear_batches_take_one_model_call(self, mock_llm, mock_users):
+        mock_llm.return_value = [
+            {"medicine_name": "metformin", "time": "8:00", "times": ["8:00"], "day": "", "days": []},
+            {"medicine_name": "lisinopril", "time": "21:00", "times": ["21:00"], "day": "", "days": []},
+        ]
+        mock_users.update_one.return_value.modified_count = 1
+
+        commandLogic("+1555", "add metformin with breakfast and lisinopril at night")
+
+        mock_llm.assert_called_once()
+        self.assertEqual(len(mock_users.update_one.call_args[0][1]["$push"]["medications"]["$each"]), 2)
+
+    def test_merge_entries_folds_repeated_names(self):
+        merged = mergeEntries([
+            {"medicine_name": "a", "time": "8am", "times": ["8am"], "day": ""},
+            {"medicine_name": "a", "time": "8pm", "times": ["8pm"], "day": "monday"},
+            {"medicine_name": "a", "time": "8pm", "times": ["8pm"], "day": "friday", "days": ["friday"]},
+        ])
+        self.assertEqual(merged, [
+            {"medicine_name": "a", "times": ["8am", "8pm"], "days": ["monday", "friday"], "day": "monday"},
+        ])
+
+    @patch("backend.commandLogic.users")
+    @patch("backend.aiParsing._llmParseMedicines")
+    def test_every_day_of_an_entry_is_kept(self, mock_llm, mock_users):
+        """'metformin 8am monday and friday' is a weekly medicine on both days"""
+        mock_llm.return_value = [{"medicine_name": "metformin", "time": "08:00", "times": ["08:00"],
+                                  "day": "monday", "days": ["monday", "friday"]}]
+        mock_users.update_one.return_value.modified_count = 1
+
+        reply = commandLogic("+1555", "add metformin 8am monday and friday")
+
+        (added,) = mock_users.update_one.call_args[0][1]["$push"]["medications"]["$each"]
+        self.assertEqual((added["frequency"], added["days"]), ("Weekly", ["Mon", "Fri"]))
+        self.assertTrue(med_is_scheduled_today(added, datetime(2025, 11, 21)))  # a friday
+        self.assertFalse(med_is_scheduled_today(added, datetime(2025, 11, 19)))
+        self.assertEqual(reply, "Added new medicine: metformin at 08:00 monday, friday.")
+
+    @patch("backend.loggingStack.users_collection")
+    @patch("backend.commandLogic.users")
+    def test_rule_parsed_add_shows_up_in_the_stack(self, mock_users, mock_stack_users):
+        """Times from the fast path are stored in the "HH:MM" form the stack reads"""
+        mock_users.update_one.return_value.modified_count = 1
+        commandLogic("+1555", "add aspirin 8:30 pm")
+        (added,) = mock_users.update_one.call_args[0][1]["$push"]["medications"]["$each"]
+
+        mock_stack_users.find_one.return_value = {"_id": "u1", "name": "John", "medications": [added]}
+        stack = medcineLoggingLogic("+1555", now=EASTERN_TZ.localize(datetime(2025, 11, 16, 19, 0)))
+
+        self.assertEqual([(m["medicine_name"], m["time"]) for m in stack], [("aspirin", "20:30")])
+
+
+class TestMedTaken(unittest.TestCase):
+    """Test cases for logging a dose by its stack position"""
+
+    def setUp(self):
+        soon = (datetime.now(EASTERN_TZ) + timedelta(minutes=30)).strftime("%H:%M")
+        self.user = {"_id": "u1", "name": "John", "medications": [
+            {"name": "A", "times": [soon], "status": "pending"},
+            {"name": "B", "times": [soon], "status": "pending"},
+        ]}
+
+    @patch("backend.commandLogic.users")
+    @patch("backend.loggingStack.users_collection")
+    def test_new_stack_comes_from_the_updated_document(self, mock_stack_users, mock_users):
+        mock_stack_users.find_one.return_value = self.user
+        after = {**self.user, "medications": [dict(self.user["medications"][0], status="taken"),
+                                              self.user["medications"][1]]}
+        mock_users.find_one_and_update.return_value = after
+
+        reply = medTaken("+1555", 1)
+
+        mock_stack_users.find_one.assert_called_once()
+        query = mock_users.find_one_and_update.call_args[0][0]
+        self.assertEqual(query["medications"]["$elemMatch"]["name"], "A")
+        self.assertTrue(reply.startswith("Logged A!"))
+        self.assertIn("1. B at", reply)
+
+    @patch("backend.commandLogic.users")
+    @patch("backend.loggingStack.users_collection")
+    def test_dose_logged_elsewhere_is_reported(self, mock_stack_users, mock_users):
+        mock_stack_users.find_one.return_value = self.user
+        mock_users.find_one_and_update.return_value = None
+
+        self.assertEqual(medTaken("+1555", 1), "Failed to log A")
+
+
+if __name__ == "__main__":
+    unittest.main()
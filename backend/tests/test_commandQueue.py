@@ -0,0 +1,119 @@
+"""
+Unit tests for the asynchronous webhook mode.
+"""
+import threading
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from backend import commandLogic
+from backend.commandQueue import CommandQueue
+
+SLOW_TEXT = "add i will take vitamin a on thursday at 8 00"
+
+
+class TestCommandQueue(unittest.TestCase):
+    """Test cases for queued commands and their out-of-band replies"""
+
+    def setUp(self):
+        patcher = patch("backend.commandQueue.twilio_service")
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+
+    def test_reply_is_sent_through_the_notification_service(self):
+        command_queue = CommandQueue(lambda phone, text: f"done: {text}", workers=2)
+        self.assertTrue(command_queue.submit("+15550001111", "add x"))
+        command_queue.join()
+
+        ((message,),) = self.service.send_many.call_args[0]
+        self.assertEqual((message.to, message.body), ("+15550001111", "done: add x"))
+
+    def test_handler_errors_still_get_a_reply(self):
+        def fail(phone, text):
+            raise RuntimeError("boom")
+
+        command_queue = CommandQueue(fail, workers=1)
+        command_queue.submit("+1", "add x")
+        command_queue.join()
+        self.assertIn("went wrong", self.service.send_many.call_args[0][0][0].body)
+
+    def test_parked_reply_is_retried(self):
+        """A reply the breaker parks is sent again once the circuit lets it through"""
+        statuses = iter(["parked", "sent"])
+        sent = threading.Event()
+
+        def send_many(messages):
+            status = next(statuses)
+            if status == "sent":
+                sent.set()
+            return [(m, {"status": status, "retry_after": 0.0}) for m in messages]
+
+        self.service.send_many.side_effect = send_many
+        with patch("backend.commandQueue.WEBHOOK_REPLY_RETRY_SECONDS", 0.01):
+            command_queue = CommandQueue(lambda phone, text: "ok", workers=1)
+            command_queue.submit("+1", "add x")
+            self.assertTrue(sent.wait(5))
+        first, second = (call[0][0][0] for call in self.service.send_many.call_args_list)
+        self.assertEqual(first.context, second.context)
+
+    @patch("backend.commandQueue.OUTBOX_ENABLED", True)
+    @patch("backend.commandQueue.enqueue")
+    def test_reply_goes_through_the_outbox_when_enabled(self, mock_enqueue):
+        command_queue = CommandQueue(lambda phone, text: "ok", workers=1)
+        command_queue.submit("+1", "add x")
+        command_queue.join()
+
+        self.service.send_many.assert_not_called()
+        (message,), kwargs = mock_enqueue.call_args
+        self.assertEqual((message[0].to, message[0].body, kwargs["kind"]), ("+1", "ok", "reply"))
+        self.assertTrue(message[0].context.startswith("reply:"))
+
+    def test_full_queue_is_refused(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block(phone, text):
+            started.set()
+            return release.wait(5) and "ok"
+
+        command_queue = CommandQueue(block, workers=1, max_size=1)
+        self.addCleanup(release.set)
+        # the first is taken by the worker, the second waits in the queue
+        self.assertTrue(command_queue.submit("+1", "a"))
+        self.assertTrue(started.wait(5))
+        self.assertTrue(command_queue.submit("+1", "b"))
+        self.assertFalse(command_queue.submit("+1", "c"))
+
+
+class TestAsyncWebhook(unittest.TestCase):
+    """Test cases for the webhook in async mode"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(commandLogic.textD)
+        self.client = app.test_client()
+
+    def test_fast_commands_are_recognised(self):
+        self.assertTrue(commandLogic.answersInline("3"))
+        self.assertTrue(commandLogic.answersInline("pause"))
+        self.assertTrue(commandLogic.answersInline("add aspirin 9am"))
+        self.assertFalse(commandLogic.answersInline(SLOW_TEXT))
+
+    @patch("backend.commandLogic.WEBHOOK_ASYNC", True)
+    @patch("backend.commandLogic.commandLogic", return_value="Reminders paused")
+    @patch("backend.commandLogic.command_queue")
+    def test_slow_commands_are_acknowledged_empty(self, mock_queue, mock_logic):
+        mock_queue.submit.return_value = True
+        response = self.client.post("/api/sms/handle", data={"From": "whatsapp:+1", "Body": SLOW_TEXT})
+        self.assertEqual(response.data, b"<Response></Response>")
+        mock_queue.submit.assert_called_once_with("whatsapp:+1", SLOW_TEXT)
+        mock_logic.assert_not_called()
+
+        response = self.client.post("/api/sms/handle", data={"From": "whatsapp:+1", "Body": "pause"})
+        self.assertIn(b"<Message>Reminders paused</Message>", response.data)
+        self.assertEqual(mock_queue.submit.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit tests for exact-time dispatch.
+"""
+import unittest
+from datetime import datetime, timedelta
+import pytz
+
+from backend.exactDispatch import ExactDispatcher
+from backend.scheduleIndex import ScheduleIndex
+
+
+def _expand(user, now):
+    # test users carry absolute ISO instants as their medication times
+    for med in user["medications"]:
+        for time_str in med["times"]:
+            yield datetime.fromisoformat(time_str), med["name"], time_str
+
+
+def _user(user_id, due_at):
+    return {"_id": user_id, "phone": "+15550001111",
+            "medications": [{"name": "A", "times": [due_at.isoformat()]}]}
+
+
+class TestExactDispatcher(unittest.TestCase):
+    """Test cases for ExactDispatcher"""
+
+    def setUp(self):
+        self.now = datetime.now(pytz.utc).replace(microsecond=0)
+        self.index = ScheduleIndex(_expand)
+        self.fired = []
+        self.dispatcher = ExactDispatcher(
+            self.index, fire=lambda user_ids, now: self.fired.append((user_ids, now))
+        )
+        self.dispatcher._last_fired = self.now
+
+    def _load(self, *users):
+        self.index.load(list(users), self.now)
+
+    def test_next_due_after_uses_heap_order(self):
+        self._load(
+            _user("late", self.now + timedelta(minutes=9)),
+            _user("soon", self.now + timedelta(minutes=2)),
+        )
+        self.assertEqual(self.index.next_due_after(self.now), self.now + timedelta(minutes=2))
+
+    def test_removed_users_are_skipped(self):
+        self._load(
+            _user("gone", self.now + timedelta(minutes=1)),
+            _user("kept", self.now + timedelta(minutes=4)),
+        )
+        self.index.remove("gone")
+        self.assertEqual(self.index.next_due_after(self.now), self.now + timedelta(minutes=4))
+
+    def test_fires_only_doses_due_since_last_round(self):
+        self._load(
+            _user("due", self.now + timedelta(seconds=30)),
+            _user("later", self.now + timedelta(minutes=5)),
+        )
+        self.dispatcher.fire_due(self.now + timedelta(seconds=31))
+        self.assertEqual(self.fired[0][0], {"due"})
+
+        self.dispatcher.fire_due(self.now + timedelta(seconds=40))
+        self.assertEqual(len(self.fired), 1)
+
+    def test_index_changes_wake_the_timer(self):
+        self._load()
+        self.dispatcher._wake.clear()
+        self.index.upsert(
+            _user("new", self.now + timedelta(minutes=1)), self.now
+        )
+        self.assertTrue(self.dispatcher._wake.is_set())
+
+    def test_idle_round_sleeps_without_firing(self):
+        self._load()
+        self.dispatcher._max_sleep = 0.01
+        self.dispatcher.run_once()
+        self.assertEqual(self.fired, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Import-time budget for the web entry point.
+"""
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# generous enough for a busy CI box; a cold import is about 0.4s on a laptop
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+LAZY_MODULES = ("openai", "twilio.rest", "aiohttp", "apscheduler", "backend.scheduler")
+
+
+class TestImportTime(unittest.TestCase):
+    """Cold start of backend.app in a web-only process"""
+
+    @classmethod
+    def setUpClass(cls):
+        env = dict(os.environ, RUN_SCHEDULER="false", PYTHONDONTWRITEBYTECODE="1")
+        env.pop("OPENAI_API_KEY", None)
+        script = (
+            "import sys, backend.app; "
+            f"print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+        )
+        cls.result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120,
+        )
+
+    def test_import_succeeds_without_credentials(self):
+        self.assertEqual(self.result.returncode, 0, self.result.stderr[-2000:])
+
+    def test_heavy_clients_are_not_imported(self):
+        self.assertEqual(self.result.stdout.strip(), "")
+
+    def test_import_time_budget(self):
+        match = re.search(r"import time:\s+\d+ \|\s+(\d+) \| backend\.app$", self.result.stderr, re.M)
+        self.assertIsNotNone(match, "backend.app missing from -X importtime output")
+        self.assertLess(int(match.group(1)) / 1000.0, IMPORT_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
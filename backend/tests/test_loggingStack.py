@@ -0,0 +1,101 @@
+"""
+Unit tests for the logging stack and its caregiver threshold alerts.
+"""
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from backend import loggingStack
+from backend.benchmarks.memoryStore import MemoryCollection
+from backend.loggingStack import EASTERN_TZ, buildMedStack, deliverMissedDoseAlert, medcineLoggingLogic
+
+
+class TestMedStack(unittest.TestCase):
+    """Test cases for building the stack and handing off alerts"""
+
+    def setUp(self):
+        self.now = EASTERN_TZ.localize(datetime(2025, 11, 17, 12, 0))
+        self.user = {
+            "_id": "u1",
+            "name": "John",
+            "caregivers": [
+                {"name": "Ann", "phone": "5550002222", "notify_when": "Both"},
+                {"name": "Bob", "phone": "+15550003333", "notify_when": "Daily summary"},
+            ],
+            "medications": [
+                {"name": "A", "times": ["08:00", "09:00"], "status": "pending"},
+                {"name": "B", "times": ["13:00", "07:00"], "status": "pending"},
+                {"name": "C", "times": ["20:00"], "status": "taken"},
+            ],
+        }
+        patcher = patch.object(loggingStack, "_alert_executor")
+        self.executor = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(loggingStack._pending_alerts.clear)
+
+    def test_stack_orders_missed_then_current_then_later(self):
+        stack = buildMedStack(self.user, "+1555", self.now)
+        self.assertEqual([(m["medicine_name"], m["time"], m["status"]) for m in stack], [
+            ("B", "07:00", "missed"), ("A", "08:00", "missed"), ("A", "09:00", "missed"),
+            ("B", "13:00", "pending"),
+        ])
+        self.assertEqual([m["stack_position"] for m in stack], [1, 2, 3, 4])
+        self.executor.submit.assert_not_called()
+
+    def test_threshold_alert_is_queued_once(self):
+        medcineLoggingLogic("+1555", now=self.now, user=self.user)
+        medcineLoggingLogic("+1555", now=self.now, user=self.user)
+
+        self.executor.submit.assert_called_once()
+        args = self.executor.submit.call_args[0]
+        self.assertEqual(args[0], deliverMissedDoseAlert)
+        self.assertEqual([c["name"] for c in args[3]], ["Ann"])
+        self.assertEqual(args[4], ["B", "A", "A"])
+
+    def test_no_alert_when_already_sent_today(self):
+        self.user["caregiver_alert_log"] = {"missed_threshold": "2025-11-17"}
+        medcineLoggingLogic("+1555", now=self.now, user=self.user)
+        self.executor.submit.assert_not_called()
+
+
+class TestDeliverMissedDoseAlert(unittest.TestCase):
+    """Test cases for the background delivery and its daily bookkeeping"""
+
+    def setUp(self):
+        self.users = MemoryCollection()
+        self.users.insert_one({"_id": "u1", "name": "John"})
+        for target, value in (("users_collection", self.users), ("OUTBOX_ENABLED", False)):
+            patcher = patch.object(loggingStack, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        service = patch.object(loggingStack, "twilio_service")
+        self.service = service.start()
+        self.addCleanup(service.stop)
+        self.caregivers = [{"name": "Ann", "phone": "5550002222"}]
+
+    def _deliver(self):
+        deliverMissedDoseAlert("u1", "John", self.caregivers, ["A", "B", "C"], "2025-11-17")
+
+    def test_sent_once_per_day(self):
+        self.service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+        self._deliver()
+        self._deliver()
+
+        self.service.send_many.assert_called_once()
+        (message,) = self.service.send_many.call_args[0][0]
+        self.assertEqual(message.to, "+15550002222")
+        self.assertIn("missed 3 medications", message.body)
+        self.assertEqual(self.users.find_one({"_id": "u1"})["caregiver_alert_log"]["missed_threshold"],
+                         "2025-11-17")
+
+    def test_undelivered_alert_is_retried_later(self):
+        self.service.send_many.side_effect = lambda messages: [(m, {"status": "error"}) for m in messages]
+        self._deliver()
+        self.assertNotIn("missed_threshold", self.users.find_one({"_id": "u1"}).get("caregiver_alert_log", {}))
+
+        self._deliver()
+        self.assertEqual(self.service.send_many.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
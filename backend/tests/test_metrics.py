@@ -0,0 +1,62 @@
+"""
+Unit tests for the metrics registry and the /metrics endpoint.
+"""
+import unittest
+
+from flask import Flask
+
+from backend.metrics import Registry, metrics_bp
+
+
+class TestRegistry(unittest.TestCase):
+    """Test cases for prometheus text rendering"""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_renders_labelled_samples(self):
+        counter = self.registry.counter("sends_total", "Sends.", ["status"])
+        counter.inc(status="sent")
+        counter.inc(2, status="error")
+
+        text = self.registry.render()
+        self.assertIn("# TYPE sends_total counter", text)
+        self.assertIn('sends_total{status="sent"} 1', text)
+        self.assertIn('sends_total{status="error"} 2', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("lag_seconds", "Lag.", buckets=(1, 5))
+        for value in (0.5, 3, 10):
+            histogram.observe(value)
+
+        text = self.registry.render()
+        self.assertIn('lag_seconds_bucket{le="1"} 1', text)
+        self.assertIn('lag_seconds_bucket{le="5"} 2', text)
+        self.assertIn('lag_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("lag_seconds_sum 13.5", text)
+        self.assertIn("lag_seconds_count 3", text)
+
+    def test_wrong_labels_are_rejected(self):
+        counter = self.registry.counter("sends_total", "Sends.", ["status"])
+        with self.assertRaises(ValueError):
+            counter.inc(kind="sent")
+
+    def test_registering_twice_returns_same_metric(self):
+        first = self.registry.counter("ticks_total", "Ticks.")
+        self.assertIs(self.registry.counter("ticks_total", "Ticks."), first)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Test cases for the scrape endpoint"""
+
+    def test_endpoint_serves_text_format(self):
+        app = Flask(__name__)
+        app.register_blueprint(metrics_bp)
+
+        response = app.test_client().get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+
+
+if __name__ == "__main__":
+    unittest.main()
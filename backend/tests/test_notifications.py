@@ -1,11 +1,22 @@
 """
 Unit tests for the Twilio notification service.
 """
+import asyncio
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 import os
 
-from backend.notifications import TwilioNotificationService
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.notifications import (
+    PRIORITY_CAREGIVER,
+    CircuitBreaker,
+    OutboundMessage,
+    RateLimiter,
+    TwilioNotificationService,
+)
 
 
 class TestTwilioNotificationService(unittest.TestCase):
@@ -58,6 +69,258 @@ class TestTwilioNotificationService(unittest.TestCase):
         with self.assertRaises(ValueError):
             service.send_sms(to="+17034532810", body="")
 
+    def test_send_many_keeps_order_and_reports_errors(self):
+        """Batch sends return one result per message in input order"""
+        with patch.dict(os.environ, {}, clear=True):
+            service = TwilioNotificationService()
+
+        messages = [
+            OutboundMessage(to="+17034532810", body="one", context=1),
+            OutboundMessage(to="", body="two", context=2),
+            OutboundMessage(to="+17034532811", body="three", context=3),
+        ]
+        results = service.send_many(messages, concurrency=3)
+
+        self.assertEqual([message.context for message, _ in results], [1, 2, 3])
+        self.assertEqual(
+            [result["status"] for _, result in results], ["mocked", "error", "mocked"]
+        )
+
+    def test_send_many_runs_sends_concurrently(self):
+        """Slow sends overlap instead of running back to back"""
+        with patch.dict(os.environ, {}, clear=True):
+            service = TwilioNotificationService()
+
+        def slow_send(*, to, body):
+            time.sleep(0.1)
+            return {"status": "sent"}
+
+        service.send_sms = slow_send
+        messages = [OutboundMessage(to="+1703453281%d" % i, body="hi") for i in range(8)]
+
+        started = time.monotonic()
+        results = service.send_many(messages, concurrency=8)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(results), 8)
+        self.assertLess(elapsed, 0.5)
+
+
+class TestRateLimiting(unittest.TestCase):
+    """Test cases for per-sender send shaping"""
+
+    def test_bucket_spreads_sends_instead_of_dropping(self):
+        """Sends past the burst wait for tokens rather than failing"""
+        limiter = RateLimiter("+1", rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # two from the burst, four more at 50/s
+        self.assertGreaterEqual(time.monotonic() - started, 0.07)
+
+    def test_cancelled_waiter_gives_up_its_place(self):
+        """A waiter cancelled mid-wait does not block the senders queued behind it"""
+        limiter = RateLimiter("+1", rate=20, burst=1)
+        limiter.acquire()
+
+        async def scenario():
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            return await asyncio.wait_for(limiter.acquire_async(), timeout=2)
+
+        self.assertLess(asyncio.run(scenario()), 2)
+        self.assertEqual(limiter._queue, [])
+
+    def test_reminders_go_ahead_of_caregiver_messages(self):
+        """A batch is handed to the limiter in priority order"""
+        with patch.dict(os.environ, {}, clear=True):
+            service = TwilioNotificationService()
+        sent = []
+
+        def record(*, to, body):
+            sent.append(body)
+            return {"status": "mocked"}
+
+        service.send_sms = record
+        messages = [
+            OutboundMessage(to="+1", body="summary", priority=PRIORITY_CAREGIVER),
+            OutboundMessage(to="+2", body="reminder"),
+        ]
+        results = service.send_many(messages, concurrency=1)
+
+        self.assertEqual(sent, ["reminder", "summary"])
+        self.assertEqual([message.body for message, _ in results], ["summary", "reminder"])
+
+    def test_throttled_sends_are_retried(self):
+        """A 429 pauses the sender and retries instead of reporting an error"""
+        with patch.dict(os.environ, {"TWILIO_FROM_NUMBER": "+10"}, clear=True), \
+                patch("backend.notifications.RATE_PER_SECOND", 100), \
+                patch("backend.notifications.RATE_LIMIT_PENALTY_SECONDS", 0.01):
+            service = TwilioNotificationService()
+            replies = [{"status": "error", "http_status": 429}, {"status": "sent", "sid": "SM1"}]
+            service.send_sms = lambda *, to, body: replies.pop(0)
+
+            results = service.send_many([OutboundMessage(to="+1", body="hi")])
+
+        self.assertEqual(results[0][1]["status"], "sent")
+        self.assertIsNotNone(service.limiter())
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the provider circuit breaker"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(
+            window_seconds=60, min_calls=4, error_rate=0.5, slow_call_seconds=5,
+            slow_call_rate=0.5, open_seconds=30, probes=2, clock=lambda: self.now,
+        )
+
+    def test_opens_on_error_rate_and_recovers_through_probes(self):
+        for status in ("sent", "error", "sent", "error"):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record({"status": status}, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.now = 31
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+        # only `probes` calls go through while half open
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record({"status": "sent"}, 0.1)
+        self.breaker.record({"status": "sent"}, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(4):
+            self.breaker.record({"status": "sent"}, 6.0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.now = 31
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record({"status": "error"}, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_after(), 30)
+
+    def test_rejected_and_throttled_requests_do_not_trip(self):
+        for http_status in (400, 429, 400, 429, 400, 400):
+            self.breaker.record({"status": "error", "http_status": http_status}, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_throttled_or_lost_probes_free_their_slots(self):
+        """A half open circuit never gets stuck refusing every send"""
+        for _ in range(4):
+            self.breaker.record({"status": "error"}, 0.1)
+        self.now = 31
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record({"status": "error", "http_status": 429}, 0.1)
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        # neither probe reports back
+        self.now = 31 + 30
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record({"status": "sent"}, 0.1)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record({"status": "sent"}, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_circuit_parks_sends(self):
+        """Sends are handed back as parked without calling the provider"""
+        with patch.dict(os.environ, {}, clear=True):
+            service = TwilioNotificationService()
+        service.breaker = self.breaker
+        for _ in range(4):
+            self.breaker.record({"status": "error"}, 0.1)
+        service.send_sms = MagicMock()
+
+        ((_, result),) = service.send_many([OutboundMessage(to="+1", body="hi")])
+
+        self.assertEqual(result["status"], "parked")
+        self.assertEqual(result["retry_after"], 30)
+        service.send_sms.assert_not_called()
+
+
+class TestAsyncSend(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the pooled async send path against a local stand-in server"""
+
+    async def asyncSetUp(self):
+        self.requests = []
+        self.transports = set()
+        self.reject = False
+
+        async def create_message(request):
+            form = await request.post()
+            self.requests.append((request.match_info["sid"], request.headers.get("Authorization"), dict(form)))
+            self.transports.add(id(request.transport))
+            if self.reject:
+                return web.json_response({"code": 21211, "message": "Invalid To"}, status=400)
+            return web.json_response({"sid": f"SM{len(self.requests)}"}, status=201)
+
+        app = web.Application()
+        app.router.add_post("/2010-04-01/Accounts/{sid}/Messages.json", create_message)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        env = {
+            "TWILIO_ACCOUNT_SID": "ACxxxx",
+            "TWILIO_AUTH_TOKEN": "secret",
+            "TWILIO_FROM_NUMBER": "whatsapp:+14155238886",
+        }
+        with patch.dict(os.environ, env, clear=True), patch("backend.notifications.Client"):
+            self.service = TwilioNotificationService()
+        self.service.config.base_url = str(self.server.make_url("")).rstrip("/")
+
+    async def asyncTearDown(self):
+        await self.service.aclose()
+        await self.server.close()
+
+    async def test_send_normalizes_and_reuses_connection(self):
+        """Sequential sends go out as whatsapp over a single kept-alive connection"""
+        first = await self.service.send_sms_async(to="17034532810", body="one")
+        second = await self.service.send_sms_async(to="+17034532811", body="two")
+
+        self.assertEqual(first, {"status": "sent", "sid": "SM1"})
+        self.assertEqual(second["sid"], "SM2")
+        sid, auth, form = self.requests[0]
+        self.assertEqual(sid, "ACxxxx")
+        self.assertTrue(auth.startswith("Basic "))
+        self.assertEqual(form, {"To": "whatsapp:+17034532810", "From": "whatsapp:+14155238886", "Body": "one"})
+        self.assertEqual(len(self.transports), 1)
+
+    async def test_provider_errors_are_reported(self):
+        """4xx responses come back as error results instead of raising"""
+        self.reject = True
+        result = await self.service.send_sms_async(to="+17034532810", body="one")
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["http_status"], 400)
+        self.assertEqual(result["error"], "Invalid To")
+
+    async def test_send_many_async_keeps_order(self):
+        """Batch async sends return one result per message in input order"""
+        messages = [
+            OutboundMessage(to="+1703453281%d" % i, body="hi", context=i) for i in range(5)
+        ] + [OutboundMessage(to="", body="hi", context=5)]
+        results = await self.service.send_many_async(messages, concurrency=3)
+
+        self.assertEqual([message.context for message, _ in results], list(range(6)))
+        self.assertEqual([result["status"] for _, result in results], ["sent"] * 5 + ["error"])
+
+    async def test_mock_mode(self):
+        """Mock mode never touches the network"""
+        self.service.config.enabled = False
+        result = await self.service.send_sms_async(to="+17034532810", body="one")
+        self.assertEqual(result, {"status": "mocked"})
+        self.assertEqual(self.requests, [])
+
 
 if __name__ == "__main__":
     unittest.main()
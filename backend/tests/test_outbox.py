@@ -0,0 +1,129 @@
+"""
+Unit tests for the durable outbox.
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from backend import outbox
+from backend.benchmarks.memoryStore import MemoryCollection
+from backend.notifications import PRIORITY_CAREGIVER, OutboundMessage
+
+
+class TestOutbox(unittest.TestCase):
+    """Test cases for enqueueing and delivering outbox messages"""
+
+    def setUp(self):
+        self.collection = MemoryCollection()
+        patcher = patch.object(outbox, "outbox", self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        service = patch.object(outbox, "twilio_service")
+        self.service = service.start()
+        self.service.breaker.is_open.return_value = False
+        self.addCleanup(service.stop)
+
+    def _reply(self, *statuses):
+        self.service.send_many.side_effect = lambda messages: [
+            (message, {"status": status}) for message, status in zip(messages, statuses)
+        ]
+
+    def test_enqueue_is_idempotent_per_key(self):
+        message = OutboundMessage(to="+15550001111", body="Take A", context="reminder:u1:A:08:00:2025-01-01")
+        self.assertEqual(outbox.enqueue([message, message], kind="reminder"), {message.context})
+        outbox.enqueue([message], kind="reminder")
+
+        self.assertEqual(self.collection.count_documents({}), 1)
+        self.assertEqual(self.collection.find_one({})["status"], outbox.PENDING)
+
+    def test_delivered_messages_are_marked_sent(self):
+        outbox.enqueue([OutboundMessage(to="+1", body="hi", context="k1")])
+        self._reply("sent")
+
+        self.assertEqual(outbox.deliver_batch(), 1)
+        doc = self.collection.find_one({"_id": "k1"})
+        self.assertEqual(doc["status"], outbox.SENT)
+        self.assertIsNone(doc["lease"])
+        self.assertEqual(outbox.deliver_batch(), 0)
+
+    def test_reminders_are_leased_ahead_of_caregiver_messages(self):
+        outbox.enqueue([OutboundMessage(to="+2", body="digest", context="d1", priority=PRIORITY_CAREGIVER)],
+                       kind="missed_dose")
+        outbox.enqueue([OutboundMessage(to="+1", body="take A", context="r1")], kind="reminder")
+        self._reply("sent")
+
+        outbox.deliver_batch(batch_size=1)
+        (leased,) = self.service.send_many.call_args[0][0]
+        self.assertEqual(leased.context[0]["_id"], "r1")
+
+    def test_digest_parts_are_sent_together_when_the_first_is_due(self):
+        def alert(key, patient):
+            return OutboundMessage(to="+2", body=f"Alert: {patient} missed A", priority=PRIORITY_CAREGIVER,
+                                   context=outbox.DigestPart(key, "missed_dose:+2:2025-01-01", patient, ("A (08:00)",)))
+
+        outbox.enqueue([alert("john", "John")], kind="missed_dose")
+        # a later alert for the same caregiver is still inside its window
+        outbox.enqueue([alert("mary", "Mary")], kind="missed_dose", delay_seconds=300)
+        self._reply("sent")
+
+        self.assertEqual(outbox.deliver_batch(), 2)
+        (message,) = self.service.send_many.call_args[0][0]
+        self.assertIn("- John missed 1 medication: A (08:00)", message.body)
+        self.assertIn("- Mary missed 1 medication: A (08:00)", message.body)
+        self.assertEqual({doc["status"] for doc in self.collection.find({})}, {outbox.SENT})
+
+    def test_parked_sends_keep_their_attempts(self):
+        outbox.enqueue([OutboundMessage(to="+1", body="hi", context="k1")])
+        self.service.send_many.side_effect = lambda messages: [
+            (message, {"status": "parked", "retry_after": 30}) for message in messages
+        ]
+        now = datetime.utcnow()
+
+        outbox.deliver_batch(now)
+        doc = self.collection.find_one({"_id": "k1"})
+        self.assertEqual((doc["status"], doc["attempts"]), (outbox.PENDING, 0))
+        self.assertAlmostEqual(doc["next_attempt_at"], now + timedelta(seconds=30), delta=timedelta(seconds=1))
+
+    def test_open_circuit_leases_nothing(self):
+        outbox.enqueue([OutboundMessage(to="+1", body="hi", context="k1")])
+        self.service.breaker.is_open.return_value = True
+
+        self.assertEqual(outbox.deliver_batch(), 0)
+        self.service.send_many.assert_not_called()
+        self.assertEqual(self.collection.find_one({"_id": "k1"})["status"], outbox.PENDING)
+
+    def test_failures_back_off_then_go_to_dead_letters(self):
+        outbox.enqueue([OutboundMessage(to="+1", body="hi", context="k1")])
+        self._reply("error")
+        now = datetime.utcnow()
+
+        outbox.deliver_batch(now)
+        doc = self.collection.find_one({"_id": "k1"})
+        self.assertEqual((doc["status"], doc["attempts"]), (outbox.PENDING, 1))
+        self.assertGreater(doc["next_attempt_at"], now)
+        # not due again until the backoff has passed
+        self.assertEqual(outbox.deliver_batch(now), 0)
+
+        for attempt in range(2, outbox.OUTBOX_MAX_ATTEMPTS + 1):
+            now += timedelta(seconds=outbox.OUTBOX_BACKOFF_MAX_SECONDS + 1)
+            outbox.deliver_batch(now)
+        self.assertEqual(self.collection.find_one({"_id": "k1"})["status"], outbox.DEAD)
+
+        self.assertEqual(outbox.requeue_dead(), 1)
+        self.assertEqual(self.collection.find_one({"_id": "k1"})["attempts"], 0)
+
+    def test_expired_lease_is_picked_up_again(self):
+        outbox.enqueue([OutboundMessage(to="+1", body="hi", context="k1")])
+        now = datetime.utcnow()
+        # a worker leased the message and died before settling it
+        outbox._lease_batch(now, 10)
+        self._reply("sent")
+
+        self.assertEqual(outbox.deliver_batch(now), 0)
+        later = now + timedelta(seconds=outbox.OUTBOX_LEASE_SECONDS + 1)
+        self.assertEqual(outbox.deliver_batch(later), 1)
+        self.assertEqual(self.collection.find_one({"_id": "k1"})["status"], outbox.SENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
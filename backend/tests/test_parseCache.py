@@ -0,0 +1,86 @@
+"""
+Unit tests for the AI parse cache.
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from backend.benchmarks.memoryStore import MemoryCollection
+from backend.parseCache import CACHE_LOOKUPS, ParseCache, normalize_text
+from backend import aiParsing
+
+PARSED = {"medicine_name": "vitamin a", "time": "8:00", "day": "thursday"}
+
+
+class TestParseCache(unittest.TestCase):
+    """Test cases for the in-process and shared cache tiers"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = ParseCache(max_size=2, ttl_seconds=60, clock=lambda: self.now)
+
+    def test_near_identical_texts_share_an_entry(self):
+        self.assertEqual(normalize_text("  Vitamin A,  8:00 on Thursday! "), "vitamin a 8:00 on thursday")
+        self.cache.put("vitamin a 8:00 on thursday", PARSED)
+        self.assertEqual(self.cache.get("Vitamin A, 8:00 on Thursday!"), PARSED)
+
+    def test_entries_expire_and_least_recent_is_evicted(self):
+        self.cache.put("a", PARSED)
+        self.cache.put("b", PARSED)
+        self.cache.get("a")
+        self.cache.put("c", PARSED)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+
+        self.now = 61
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_shared_tier_fills_other_workers(self):
+        collection = MemoryCollection()
+        ParseCache(collection=collection).put("vitamin a 8:00 thursday", PARSED)
+        other = ParseCache(collection=collection)
+        hits = CACHE_LOOKUPS.value(tier="mongo", result="hit")
+
+        self.assertEqual(other.get("vitamin a 8:00 thursday"), PARSED)
+        self.assertEqual(CACHE_LOOKUPS.value(tier="mongo", result="hit"), hits + 1)
+        # answered from memory the second time
+        self.assertEqual(other.get("vitamin a 8:00 thursday"), PARSED)
+        self.assertEqual(CACHE_LOOKUPS.value(tier="mongo", result="hit"), hits + 1)
+
+        collection.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        self.assertIsNone(ParseCache(collection=collection).get("vitamin a 8:00 thursday"))
+
+
+class TestParseCaching(unittest.TestCase):
+    """Test cases for caching in front of the model"""
+
+    def setUp(self):
+        patcher = patch.object(aiParsing, "parse_cache", ParseCache())
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("backend.aiParsing._llmParseMedicine")
+    def test_model_is_asked_once_per_text(self, mock_llm):
+        mock_llm.return_value = dict(PARSED)
+        text = "i will take vitamin a on thursday at 8 00"
+
+        self.assertEqual(aiParsing.aiParseMedicine(text), PARSED)
+        self.assertEqual(aiParsing.aiParseMedicine(text.upper()), PARSED)
+        self.assertEqual(mock_llm.call_count, 1)
+
+    @patch("backend.aiParsing._llmParseMedicine")
+    def test_failed_parses_are_not_cached(self, mock_llm):
+        text = "i will take vitamin a on thursday at 8 00"
+        for answer in (
+            None,
+            {"medicine_name": "vitamin a", "time": None, "day": None},
+            {"medicine_name": "vitamin a", "time": "morning", "day": "thursday"},
+        ):
+            mock_llm.return_value = answer
+            self.assertIsNone(aiParsing.aiParseMedicine(text))
+        self.assertIsNone(self.cache.get(text))
+        self.assertEqual(mock_llm.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
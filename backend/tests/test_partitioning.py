@@ -0,0 +1,77 @@
+"""
+Unit tests for scheduler partitioning and dose claims.
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pymongo.errors import BulkWriteError
+
+from backend import partitioning
+from backend.partitioning import WORKER_ID, claim, complete, owns_user, partition_filter, partition_hash
+
+
+class TestPartitioning(unittest.TestCase):
+    """Test cases for hash partitioning of users"""
+
+    def test_hash_ignores_phone_formatting(self):
+        self.assertEqual(partition_hash("+1 (703) 453-2810"), partition_hash("whatsapp:+17034532810"))
+
+    def test_unpartitioned_worker_owns_everyone(self):
+        self.assertEqual(partition_filter(), {})
+        self.assertTrue(owns_user({"phone": "+17034532810"}))
+
+    def test_each_user_has_exactly_one_owner(self):
+        phones = [f"+1703453{i:04d}" for i in range(200)]
+        owners = []
+        for index in range(3):
+            with patch.object(partitioning, "PARTITION_COUNT", 3), \
+                    patch.object(partitioning, "PARTITION_INDEX", index):
+                owners.append({phone for phone in phones if owns_user({"phone": phone})})
+                self.assertEqual(
+                    partition_filter(), {"partition_hash": {"$mod": [3, index]}}
+                )
+
+        self.assertEqual(set().union(*owners), set(phones))
+        self.assertEqual(sum(len(owned) for owned in owners), len(phones))
+        self.assertTrue(all(owned for owned in owners))
+
+
+class TestDoseClaims(unittest.TestCase):
+    """Test cases for claiming sends across workers"""
+
+    @patch("backend.partitioning.dose_claims")
+    def test_claims_all_new_keys(self, mock_claims):
+        self.assertEqual(claim(["a", "b"]), {"a", "b"})
+        self.assertEqual(len(mock_claims.insert_many.call_args[0][0]), 2)
+
+    @patch("backend.partitioning.dose_claims")
+    def test_keys_held_by_live_worker_are_skipped(self, mock_claims):
+        mock_claims.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}],
+        })
+        mock_claims.update_one.return_value = MagicMock(modified_count=0)
+
+        self.assertEqual(claim(["a", "b"]), {"a"})
+
+    @patch("backend.partitioning.dose_claims")
+    def test_expired_claim_is_taken_over(self, mock_claims):
+        mock_claims.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}],
+        })
+        mock_claims.update_one.return_value = MagicMock(modified_count=1)
+
+        self.assertEqual(claim(["a"]), {"a"})
+        # a claim whose send was already delivered is never taken over
+        self.assertEqual(mock_claims.update_one.call_args[0][0]["done"], {"$ne": True})
+
+    @patch("backend.partitioning.dose_claims")
+    def test_complete_marks_own_claims_done(self, mock_claims):
+        complete(["a", "b"])
+        query, update = mock_claims.update_many.call_args[0]
+        self.assertEqual(query["_id"], {"$in": ["a", "b"]})
+        self.assertEqual(query["owner"], WORKER_ID)
+        self.assertTrue(update["$set"]["done"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Unit tests for the in-memory schedule index.
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytz
+
+from backend.scheduleIndex import ScheduleIndex
+from backend.scheduler import _index_check_at, _index_entries
+
+
+class TestScheduleIndex(unittest.TestCase):
+    """Test cases for ScheduleIndex"""
+
+    def setUp(self):
+        self.tz = pytz.timezone("US/Eastern")
+        self.now = self.tz.localize(datetime(2025, 11, 16, 8, 58, 0))
+        self.window = (self.now - timedelta(minutes=5), self.now + timedelta(minutes=5))
+        self.index = ScheduleIndex(_index_entries, tz=self.tz, check_at=_index_check_at)
+        self.user = {
+            "_id": "u1",
+            "phone": "+15550001111",
+            "medications": [{"name": "Vitamin D", "times": ["09:00"]}],
+        }
+
+    def _due(self, now=None):
+        return self.index.due(*self.window, now or self.now)
+
+    def test_load_indexes_upcoming_doses_by_minute(self):
+        self.index.load([self.user], self.now)
+        due = self._due()
+        self.assertEqual(len(due), 1)
+        self.assertEqual(due[0].phone, "+15550001111")
+        self.assertEqual(due[0].medicine_name, "Vitamin D")
+        self.assertEqual(due[0].time, "09:00")
+
+    def test_insert_change_adds_user(self):
+        self.index.load([], self.now)
+        self.index.apply_change(
+            {"operationType": "insert", "documentKey": {"_id": "u1"}, "fullDocument": self.user},
+            self.now,
+        )
+        self.assertEqual(self.index.user_ids_due(*self.window, self.now), {"u1"})
+
+    def test_edit_moves_dose_out_of_window(self):
+        self.index.load([self.user], self.now)
+        edited = dict(self.user, medications=[{"name": "Vitamin D", "times": ["20:00"]}])
+        self.index.apply_change(
+            {"operationType": "update", "documentKey": {"_id": "u1"}, "fullDocument": edited},
+            self.now,
+        )
+        self.assertEqual(self._due(), [])
+
+    def test_pause_and_resume(self):
+        self.index.load([self.user], self.now)
+        self.index.apply_change(
+            {"operationType": "update", "documentKey": {"_id": "u1"},
+             "fullDocument": dict(self.user, paused=True)},
+            self.now,
+        )
+        self.assertEqual(self._due(), [])
+        self.index.apply_change(
+            {"operationType": "update", "documentKey": {"_id": "u1"},
+             "fullDocument": dict(self.user, paused=False)},
+            self.now,
+        )
+        self.assertEqual(len(self._due()), 1)
+
+    def test_delete_removes_user(self):
+        self.index.load([self.user], self.now)
+        self.index.apply_change({"operationType": "delete", "documentKey": {"_id": "u1"}}, self.now)
+        self.assertEqual(self._due(), [])
+        self.assertEqual(len(self.index), 0)
+
+    def test_sent_reminder_drops_dose(self):
+        self.index.load([self.user], self.now)
+        logged = dict(self.user, medications=[
+            {"name": "Vitamin D", "times": ["09:00"], "reminder_log": {"09:00": "2025-11-16"}}
+        ])
+        self.index.upsert(logged, self.now)
+        self.assertEqual(self._due(), [])
+
+    def test_rollover_reexpands_next_day(self):
+        logged = dict(self.user, medications=[
+            {"name": "Vitamin D", "times": ["09:00"], "reminder_log": {"09:00": "2025-11-16"}}
+        ])
+        self.index.load([logged], self.now)
+        tomorrow = self.now + timedelta(days=1)
+        due = self.index.due(tomorrow - timedelta(minutes=5), tomorrow + timedelta(minutes=5), tomorrow)
+        self.assertEqual(len(due), 1)
+
+    def test_caregiver_checks_are_looked_up_by_instant(self):
+        checked = dict(self.user, _id="u2", next_missed_check_at=datetime(2025, 11, 16, 13, 55))
+        later = dict(self.user, _id="u3", next_missed_check_at=datetime(2025, 11, 16, 14, 30))
+        self.index.load([self.user, checked, later], self.now)
+        self.assertEqual(self.index.user_ids_checking(self.now), {"u2"})
+
+        self.index.upsert(dict(checked, next_missed_check_at=None), self.now)
+        self.assertEqual(self.index.user_ids_checking(self.now + timedelta(hours=1)), {"u3"})
+
+    def test_heap_is_only_kept_for_exact_dispatch(self):
+        self.index.load([self.user], self.now)
+        for _ in range(5):
+            self.index.upsert(self.user, self.now)
+        self.assertEqual(self.index._heap, [])
+
+    @patch("backend.scheduleIndex.HEAP_COMPACT_MIN", 4)
+    def test_heap_is_compacted_as_users_change(self):
+        self.index.track_next_due()
+        self.index.load([self.user, dict(self.user, _id="u2")], self.now)
+        for _ in range(50):
+            self.index.upsert(self.user, self.now)
+        self.assertLessEqual(len(self.index._heap), 2 * len(self.index))
+        self.assertEqual(self.index.next_due_after(self.now), self.window[1] - timedelta(minutes=3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,16 +2,31 @@
 Unit tests for the medication reminder scheduler.
 """
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
 import pytz
+from pymongo.errors import BulkWriteError
 
+from backend.benchmarks.memoryStore import MemoryCollection
+from backend.outbox import deliver_batch
 from backend.scheduler import (
     _parse_med_time,
     _build_message,
     _get_timezone,
     _med_is_scheduled_today,
     _caregiver_wants,
+    compute_next_due_at,
+    compute_next_missed_check_at,
+    _BulkUpdater,
+    _dispatch_due_reminders,
+    _plan_caregiver_alerts,
+    _run_tick,
+    CAREGIVER_DIGEST_SECONDS,
     DEFAULT_TIMEZONE,
+    DISPATCH_LAG,
+    REMINDERS_SENT,
+    TICKS_SKIPPED,
+    USERS_SCANNED,
 )
 
 class TestScheduler(unittest.TestCase):
@@ -92,6 +107,463 @@ class TestScheduler(unittest.TestCase):
         self.assertTrue(_caregiver_wants({"notify_when": "Both"}, "missed_dose"))
         self.assertTrue(_caregiver_wants({"notify_when": "Both"}, "daily_summary"))
 
+    def test_next_due_at_picks_earliest_upcoming_dose(self):
+        user = {"medications": [
+            {"name": "A", "times": ["21:00"]},
+            {"name": "B", "times": ["07:00", "13:30"]},
+        ]}
+        result = compute_next_due_at(user, self.now)
+        self.assertEqual(result, self.tz.localize(datetime(2025, 11, 16, 13, 30)).astimezone(pytz.utc))
+
+    def test_next_due_at_skips_doses_already_reminded_today(self):
+        user = {"medications": [
+            {"name": "A", "times": ["09:02"], "reminder_log": {"09:02": "2025-11-16"}},
+        ]}
+        result = compute_next_due_at(user, self.now)
+        self.assertEqual(result, self.tz.localize(datetime(2025, 11, 17, 9, 2)).astimezone(pytz.utc))
+
+    def test_next_due_at_keeps_dose_still_inside_window(self):
+        user = {"medications": [{"name": "A", "times": ["08:58"]}]}
+        result = compute_next_due_at(user, self.now)
+        self.assertEqual(result, self.tz.localize(datetime(2025, 11, 16, 8, 58)).astimezone(pytz.utc))
+
+    def test_next_due_at_uses_next_weekly_day(self):
+        user = {"medications": [{"name": "A", "times": ["08:00"], "frequency": "Weekly", "days": ["Wed"]}]}
+        result = compute_next_due_at(user, self.now)
+        self.assertEqual(result, self.tz.localize(datetime(2025, 11, 19, 8, 0)).astimezone(pytz.utc))
+
+    def test_next_due_at_none_without_scheduled_doses(self):
+        user = {"medications": [{"name": "A", "times": [], "frequency": "As needed"}]}
+        self.assertIsNone(compute_next_due_at(user, self.now))
+
+
+class TestBulkUpdater(unittest.TestCase):
+    """Test cases for batched scheduler state updates"""
+
+    def setUp(self):
+        self.app = MagicMock()
+
+    @patch("backend.scheduler.users")
+    def test_flushes_every_flush_size_operations(self, mock_users):
+        mock_users.bulk_write.return_value.matched_count = 2
+        bulk = _BulkUpdater(self.app, "Test", flush_size=2)
+        for key in ("a", "b", "c"):
+            bulk.add(key, {"$set": {"x": 1}})
+        self.assertEqual(mock_users.bulk_write.call_count, 1)
+
+        bulk.flush()
+        self.assertEqual(mock_users.bulk_write.call_count, 2)
+        self.assertEqual(len(mock_users.bulk_write.call_args[0][0]), 1)
+
+    @patch("backend.scheduler.users")
+    def test_unordered_partial_failure_is_reported_per_user(self, mock_users):
+        mock_users.bulk_write.side_effect = BulkWriteError({
+            "nMatched": 2,
+            "writeErrors": [{"index": 1, "errmsg": "boom"}],
+        })
+        bulk = _BulkUpdater(self.app, "Test", flush_size=10, ordered=False)
+        for key in ("a", "b", "c"):
+            bulk.add(key, {"$set": {"x": 1}})
+        bulk.flush()
+
+        self.assertEqual(bulk.failed, {"b": "boom"})
+        self.assertEqual(bulk.written, 2)
+
+    @patch("backend.scheduler.users")
+    def test_ordered_failure_marks_remaining_users_failed(self, mock_users):
+        mock_users.bulk_write.side_effect = BulkWriteError({
+            "nMatched": 1,
+            "writeErrors": [{"index": 1, "errmsg": "boom"}],
+        })
+        bulk = _BulkUpdater(self.app, "Test", flush_size=10, ordered=True)
+        for key in ("a", "b", "c"):
+            bulk.add(key, {"$set": {"x": 1}})
+        bulk.flush()
+
+        self.assertEqual(set(bulk.failed), {"b", "c"})
+
+
+class TestDispatchDueReminders(unittest.TestCase):
+    """Test cases for the reminder dispatch tick"""
+
+    def setUp(self):
+        self.app = MagicMock()
+        self.time_str = datetime.now(DEFAULT_TIMEZONE).strftime("%H:%M")
+        self.user = {
+            "_id": "u1",
+            "name": "John",
+            "phone": "+15550001111",
+            "medications": [
+                {"name": "A", "dosage": "5mg", "times": [self.time_str]},
+                {"name": "B", "dosage": "10mg", "times": [self.time_str]},
+            ],
+        }
+
+    def _run(self, mock_users, mock_service, statuses, coalesce=False):
+        mock_users.find.return_value = [self.user]
+        mock_users.bulk_write.return_value.matched_count = 1
+        mock_service.breaker.is_open.return_value = False
+        mock_service.send_many.side_effect = lambda messages: [
+            (message, {"status": status}) for message, status in zip(messages, statuses)
+        ]
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.REMINDER_COALESCE", coalesce), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete") as self.mock_complete, \
+                patch("backend.scheduler.release") as self.mock_release:
+            _dispatch_due_reminders(self.app)
+        ops = mock_users.bulk_write.call_args[0][0]
+        return ops[0]._doc["$set"]
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_reminder_log_only_marked_after_confirmed_send(self, mock_users, mock_service):
+        updates = self._run(mock_users, mock_service, ["sent", "error"])
+
+        self.assertEqual(len(mock_service.send_many.call_args[0][0]), 2)
+        today_key = datetime.now(DEFAULT_TIMEZONE).strftime("%Y-%m-%d")
+        self.assertEqual(updates[f"medications.0.reminder_log.{self.time_str}"], today_key)
+        self.assertEqual(updates["medications.0.status"], "pending")
+        self.assertFalse(any(key.startswith("medications.1") for key in updates))
+        (completed,) = self.mock_complete.call_args[0]
+        self.assertEqual(completed, {f"reminder:u1:A:{self.time_str}:{today_key}"})
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_doses_due_together_are_coalesced(self, mock_users, mock_service):
+        updates = self._run(mock_users, mock_service, ["sent"], coalesce=True)
+
+        (message,) = mock_service.send_many.call_args[0][0]
+        self.assertIn("A (5mg)", message.body)
+        self.assertIn("B (10mg)", message.body)
+        today_key = datetime.now(DEFAULT_TIMEZONE).strftime("%Y-%m-%d")
+        self.assertEqual(updates[f"medications.0.reminder_log.{self.time_str}"], today_key)
+        self.assertEqual(updates[f"medications.1.reminder_log.{self.time_str}"], today_key)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_failed_coalesced_send_releases_every_dose(self, mock_users, mock_service):
+        updates = self._run(mock_users, mock_service, ["error"], coalesce=True)
+        self.assertFalse(any(key.startswith("medications") for key in updates))
+        released = self.mock_release.call_args[0][0]
+        self.assertEqual(len(released), 2)
+        self.assertTrue(all(key.startswith("reminder:u1:") for key in released))
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_failed_sends_leave_medications_untouched(self, mock_users, mock_service):
+        updates = self._run(mock_users, mock_service, ["error", "error"])
+        self.assertFalse(any(key.startswith("medications") for key in updates))
+        self.assertIsNotNone(updates["next_due_at"])
+        self.assertEqual(len(self.mock_release.call_args[0][0]), 2)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_writes_only_apply_to_the_document_the_tick_read(self, mock_users, mock_service):
+        """A medications array rewritten meanwhile is not written into by position"""
+        self.user["next_due_at"] = datetime(2025, 11, 16, 14, 0)
+        self._run(mock_users, mock_service, ["sent", "error"])
+
+        dose_op, schedule_op = mock_users.bulk_write.call_args[0][0]
+        self.assertEqual(dose_op._filter, {"_id": "u1", "medications.0.name": "A"})
+        self.assertEqual(schedule_op._filter, {
+            "_id": "u1", "medications.0.name": "A",
+            "next_due_at": datetime(2025, 11, 16, 14, 0), "next_missed_check_at": None,
+        })
+        self.assertIn("next_due_at", schedule_op._doc["$set"])
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_tick_records_metrics(self, mock_users, mock_service):
+        sent, errors = REMINDERS_SENT.value(status="sent"), REMINDERS_SENT.value(status="error")
+        scanned = USERS_SCANNED.value()
+        lagged = DISPATCH_LAG.count(trigger="poll")
+
+        self._run(mock_users, mock_service, ["sent", "error"])
+
+        self.assertEqual(REMINDERS_SENT.value(status="sent"), sent + 1)
+        self.assertEqual(REMINDERS_SENT.value(status="error"), errors + 1)
+        self.assertEqual(USERS_SCANNED.value(), scanned + 1)
+        # only the delivered reminder has a send time to measure lag against
+        self.assertEqual(DISPATCH_LAG.count(trigger="poll"), lagged + 1)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_outbox_mode_enqueues_instead_of_sending(self, mock_users, mock_service):
+        mock_users.find.return_value = [self.user]
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.OUTBOX_ENABLED", True), \
+                patch("backend.scheduler.enqueue") as mock_enqueue, \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete") as mock_complete, \
+                patch("backend.scheduler.release"):
+            _dispatch_due_reminders(self.app)
+
+        mock_service.send_many.assert_not_called()
+        # each dose is claimed (and marked done once enqueued) on its own
+        completed = mock_complete.call_args[0][0]
+        self.assertEqual(len(completed), 2)
+        self.assertTrue(all(key.startswith("reminder:u1:") for key in completed))
+        (queued,) = mock_enqueue.call_args[0][0]
+        self.assertTrue(queued.context.startswith("reminders:u1:"))
+        updates = mock_users.bulk_write.call_args[0][0][0]._doc["$set"]
+        self.assertIn(f"medications.1.reminder_log.{self.time_str}", updates)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_outbox_mode_coalesces_only_doses_this_worker_claimed(self, mock_users, mock_service):
+        """An overlapping worker holding dose B cannot get B enqueued twice under another key"""
+        mock_users.find.return_value = [self.user]
+        dose_a = lambda keys: {key for key in keys if ":A:" in key}
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.OUTBOX_ENABLED", True), \
+                patch("backend.scheduler.enqueue") as mock_enqueue, \
+                patch("backend.scheduler.claim", side_effect=dose_a), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            _dispatch_due_reminders(self.app)
+
+        (queued,) = mock_enqueue.call_args[0][0]
+        self.assertTrue(queued.context.startswith("reminder:u1:A:"))
+        updates = mock_users.bulk_write.call_args[0][0][0]._doc["$set"]
+        self.assertNotIn(f"medications.1.reminder_log.{self.time_str}", updates)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_doses_claimed_elsewhere_are_not_sent(self, mock_users, mock_service):
+        mock_users.find.return_value = [self.user]
+        mock_service.breaker.is_open.return_value = False
+        mock_service.send_many.return_value = []
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.claim", return_value=set()), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            _dispatch_due_reminders(self.app)
+        mock_service.send_many.assert_called_once_with([])
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_open_circuit_skips_the_tick(self, mock_users, mock_service):
+        mock_service.breaker.is_open.return_value = True
+        mock_service.breaker.retry_after.return_value = 12.0
+        skipped = TICKS_SKIPPED.value(reason="circuit_open")
+
+        _dispatch_due_reminders(self.app)
+
+        mock_users.find.assert_not_called()
+        mock_service.send_many.assert_not_called()
+        self.assertEqual(TICKS_SKIPPED.value(reason="circuit_open"), skipped + 1)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_first_tick_after_an_outage_catches_up(self, mock_users, mock_service):
+        """A dose whose window passed while the circuit was open is still reminded"""
+        tz = DEFAULT_TIMEZONE
+        self.user["medications"] = [{"name": "A", "times": ["09:30"]}]
+        mock_users.find.return_value = [self.user]
+        mock_users.bulk_write.return_value.matched_count = 1
+        mock_service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+        outage = tz.localize(datetime(2025, 11, 16, 9, 30))
+        recovered = tz.localize(datetime(2025, 11, 16, 10, 0))
+
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler._catch_up_since", None), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            mock_service.breaker.is_open.return_value = True
+            _run_tick(self.app, outage, outage - timedelta(minutes=5), outage + timedelta(minutes=5))
+            mock_service.breaker.is_open.return_value = False
+            _run_tick(self.app, recovered, recovered - timedelta(minutes=5), recovered + timedelta(minutes=5))
+            # the catch-up is used up by the first full tick
+            _run_tick(self.app, recovered, recovered - timedelta(minutes=5), recovered + timedelta(minutes=5))
+
+        sent = [m for call in mock_service.send_many.call_args_list for m in call[0][0]]
+        self.assertEqual([m.context.time_str for m in sent], ["09:30"])
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_catch_up_older_than_the_index_queries_next_due_at(self, mock_users, mock_service):
+        """With the schedule index, a catch-up reaching past its floor is looked up in Mongo"""
+        tz = DEFAULT_TIMEZONE
+        self.user["medications"] = [{"name": "A", "times": ["09:30"]}]
+        mock_users.find.return_value = [self.user]
+        mock_users.bulk_write.return_value.matched_count = 1
+        mock_service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+        index = MagicMock(ready=True)
+        # the index has already dropped the 09:30 dose, it is outside its window
+        index.user_ids_due.return_value = set()
+        index.user_ids_checking.return_value = set()
+        outage = tz.localize(datetime(2025, 11, 16, 9, 30))
+        recovered = tz.localize(datetime(2025, 11, 16, 10, 0))
+
+        with patch("backend.scheduler._schedule_index", index), \
+                patch("backend.scheduler._catch_up_since", None), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            mock_service.breaker.is_open.return_value = True
+            _run_tick(self.app, outage, outage - timedelta(minutes=5), outage + timedelta(minutes=5))
+            mock_service.breaker.is_open.return_value = False
+            _run_tick(self.app, recovered, recovered - timedelta(minutes=5), recovered + timedelta(minutes=5))
+
+        index.user_ids_due.assert_not_called()
+        query = mock_users.find.call_args[0][0]
+        self.assertEqual(query["$or"][0], {"next_due_at": {"$lte": recovered + timedelta(minutes=5)}})
+        sent = [m for call in mock_service.send_many.call_args_list for m in call[0][0]]
+        self.assertEqual([m.context.time_str for m in sent], ["09:30"])
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_parked_reminders_are_caught_up(self, mock_users, mock_service):
+        """Reminders the breaker parked mid-tick are planned again once it closes"""
+        tz = DEFAULT_TIMEZONE
+        self.user["medications"] = [{"name": "A", "times": ["09:30"]}]
+        mock_users.find.return_value = [self.user]
+        mock_users.bulk_write.return_value.matched_count = 1
+        mock_service.breaker.is_open.return_value = False
+        statuses = iter(["parked", "sent"])
+        mock_service.send_many.side_effect = lambda messages: [(m, {"status": next(statuses)}) for m in messages]
+        first = tz.localize(datetime(2025, 11, 16, 9, 30))
+        later = tz.localize(datetime(2025, 11, 16, 9, 50))
+
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler._catch_up_since", None), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release") as mock_release:
+            _run_tick(self.app, first, first - timedelta(minutes=5), first + timedelta(minutes=5))
+            self.assertEqual(len(mock_release.call_args[0][0]), 1)
+            _run_tick(self.app, later, later - timedelta(minutes=5), later + timedelta(minutes=5))
+
+        self.assertEqual(mock_service.send_many.call_count, 2)
+        updates = mock_users.bulk_write.call_args[0][0][0]._doc["$set"]
+        self.assertEqual(updates["medications.0.reminder_log.09:30"], "2025-11-16")
+
+
+class TestPlanCaregiverAlerts(unittest.TestCase):
+    """Test cases for missed-dose evaluation inside the tick"""
+
+    def setUp(self):
+        self.tz = pytz.timezone("US/Eastern")
+        self.now = self.tz.localize(datetime(2025, 11, 16, 20, 30, 0))
+        self.user = {
+            "_id": "u1",
+            "name": "John",
+            "phone": "+15550001111",
+            "caregivers": [
+                {"name": "Ann", "phone": "+15550002222", "notify_when": "Both"},
+                {"name": "Bob", "phone": "+15550003333", "notify_when": "On missed dose"},
+            ],
+            "medications": [
+                {"name": "A", "times": ["08:00"], "status": "pending"},
+                {"name": "B", "times": ["09:00"], "status": "taken"},
+            ],
+        }
+
+    def test_missed_dose_alerts_and_summary_are_planned(self):
+        outbound = _plan_caregiver_alerts(self.user, self.user["medications"], set(), self.now, "2025-11-16")
+        kinds = sorted((message.context.kind, message.to) for message in outbound)
+        self.assertEqual(kinds, [
+            ("daily_summary", "+15550002222"),
+            ("missed_dose", "+15550002222"),
+            ("missed_dose", "+15550003333"),
+        ])
+        self.assertIn("A (08:00)", outbound[0].body)
+        self.assertNotIn("B (09:00)", outbound[0].body)
+
+    def test_nothing_planned_once_alerts_were_sent_today(self):
+        user = dict(self.user, caregiver_alert_log={
+            "missed_dose": "2025-11-16", "daily_summary": "2025-11-16",
+        })
+        self.assertEqual(_plan_caregiver_alerts(user, user["medications"], set(), self.now, "2025-11-16"), [])
+
+    def test_medication_reminded_this_tick_counts_as_pending(self):
+        outbound = _plan_caregiver_alerts(self.user, self.user["medications"], {1}, self.now, "2025-11-16")
+        self.assertIn("B (09:00)", outbound[0].body)
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_caregiver_of_several_patients_gets_one_digest(self, mock_users, mock_service):
+        """Alerts for one caregiver phone raised in separate ticks go out as one message"""
+        # Ann is saved with a whatsapp prefix on one patient and without a + on the other
+        mary = dict(self.user, _id="u2", name="Mary", caregivers=[
+            {"name": "Ann", "phone": "whatsapp:+15550002222", "notify_when": "Both"},
+        ])
+        john = dict(self.user, caregivers=[
+            self.user["caregivers"][1],
+            dict(self.user["caregivers"][0], phone="15550002222"),
+        ])
+        mock_service.breaker.is_open.return_value = False
+        mock_service.send_many.return_value = []
+        with patch("backend.outbox.outbox", MemoryCollection()), \
+                patch("backend.outbox.twilio_service") as outbox_service, \
+                patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            for user, minutes in ((john, 0), (mary, 2)):
+                mock_users.find.return_value = [user]
+                tick_at = self.now + timedelta(minutes=minutes)
+                _run_tick(MagicMock(), tick_at, tick_at, tick_at)
+
+            outbox_service.breaker.is_open.return_value = False
+            outbox_service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+            self.assertEqual(deliver_batch(), 0)
+            deliver_batch(datetime.utcnow() + timedelta(seconds=CAREGIVER_DIGEST_SECONDS + 1))
+
+        mock_service.send_many.assert_called_with([])
+        sent = outbox_service.send_many.call_args[0][0]
+        self.assertEqual(sorted(message.to for message in sent), ["+15550002222", "+15550002222", "+15550003333"])
+        digest = next(m for m in sent if m.to == "+15550002222" and m.context[0]["kind"] == "missed_dose")
+        self.assertIn("John missed 1 medication: A (08:00)", digest.body)
+        self.assertIn("Mary missed 1 medication: A (08:00)", digest.body)
+        bob = next(m for m in sent if m.to == "+15550003333")
+        self.assertTrue(bob.body.startswith("Alert: John missed 1 medication"))
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_tick_moves_the_missed_check_past_the_alert(self, mock_users, mock_service):
+        mock_users.find.return_value = [self.user]
+        mock_service.breaker.is_open.return_value = False
+        mock_service.send_many.side_effect = lambda messages: [(m, {"status": "sent"}) for m in messages]
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.enqueue"), \
+                patch("backend.scheduler.claim", side_effect=set), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            _run_tick(MagicMock(), self.now, self.now, self.now)
+
+        query = mock_users.find.call_args[0][0]
+        self.assertIn({"next_missed_check_at": {"$lte": self.now}}, query["$or"])
+        updates = mock_users.bulk_write.call_args[0][0][-1]._doc["$set"]
+        self.assertEqual(updates["next_missed_check_at"],
+                         self.tz.localize(datetime(2025, 11, 17, 8, 3)).astimezone(pytz.utc))
+
+    @patch("backend.scheduler.twilio_service")
+    @patch("backend.scheduler.users")
+    def test_outbox_digest_only_covers_patients_this_worker_claimed(self, mock_users, mock_service):
+        """A patient whose alert another worker holds is left out of the digest"""
+        mary = dict(self.user, _id="u2", name="Mary", phone="+15550004444", caregivers=[
+            self.user["caregivers"][0],
+        ])
+        mock_users.find.return_value = [self.user, mary]
+        mary_only = lambda keys: {key for key in keys if ":u2:" in key}
+        with patch("backend.scheduler._schedule_index", None), \
+                patch("backend.scheduler.OUTBOX_ENABLED", True), \
+                patch("backend.scheduler.enqueue") as mock_enqueue, \
+                patch("backend.scheduler.claim", side_effect=mary_only), \
+                patch("backend.scheduler.complete"), \
+                patch("backend.scheduler.release"):
+            _run_tick(MagicMock(), self.now, self.now, self.now)
+
+        queued = [message for call in mock_enqueue.call_args_list for message in call[0][0]]
+        self.assertEqual(
+            sorted(message.context.key for message in queued),
+            ["daily_summary:u2:2025-11-16:+15550002222", "missed_dose:u2:2025-11-16:+15550002222"],
+        )
+        self.assertNotIn("John", " ".join(message.body for message in queued))
+
 
 if __name__ == "__main__":
     unittest.main()